@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='credit_balance',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_credit_balance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='credits_reserved',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='running_tasks',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+    ]
@@ -4,6 +4,11 @@ from django.contrib.auth.models import User
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     credits = models.IntegerField(default=1000)
+    # Saldo do extrato de créditos, mantido por billing.ledger
+    credit_balance = models.IntegerField(default=0, editable=False)
+    # Créditos reservados e tarefas em execução (ver billing.credits)
+    credits_reserved = models.IntegerField(default=0, editable=False)
+    running_tasks = models.IntegerField(default=0, editable=False)
     plan = models.CharField(max_length=50, default='Free')
     avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -0,0 +1,177 @@
+"""Consumo de créditos pelas tarefas.
+
+Uma tarefa reserva créditos antes de executar (reserve), debita o que usou ao
+terminar (commit) ou devolve a reserva se falhar (refund). Cada passo é um
+UPDATE condicional com F(): a reserva só acontece se o saldo disponível
+(credit_balance - credits_reserved) cobre o valor e se o usuário ainda não
+atingiu Plan.max_concurrent_tasks, então execuções simultâneas não perdem
+atualizações nem deixam o saldo negativo.
+
+O débito atualiza Profile.credit_balance diretamente e grava a
+CreditTransaction com bulk_create (sem o sinal do billing.ledger), na mesma
+transação. Dentro de um bloco batch() as transações de várias tarefas são
+gravadas juntas ao final.
+"""
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.db import OperationalError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from accounts.models import Profile
+from tasks.models import Task
+from .models import CreditTransaction, Plan, Subscription
+
+# Tentativas quando o SQLite responde "database is locked" e espera máxima entre elas
+MAX_ATTEMPTS = 12
+MAX_BACKOFF = 0.5
+
+_local = threading.local()
+
+
+class CreditError(Exception):
+    pass
+
+
+class InsufficientCredits(CreditError):
+    pass
+
+
+class ConcurrencyLimitReached(CreditError):
+    pass
+
+
+def _retry_on_lock(func):
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            return func()
+        except OperationalError as e:
+            if 'locked' not in str(e) or attempt == MAX_ATTEMPTS - 1:
+                raise
+            time.sleep(random.uniform(0, min(MAX_BACKOFF, 0.01 * 2 ** attempt)))
+
+
+def max_concurrent_tasks(user):
+    """Limite do plano da assinatura ativa, ou o padrão de Plan sem assinatura"""
+    limit = (Subscription.objects.filter(user=user, is_active=True)
+             .values_list('plan__max_concurrent_tasks', flat=True).first())
+    if limit is None:
+        limit = Plan._meta.get_field('max_concurrent_tasks').default
+    return limit
+
+
+@contextmanager
+def batch():
+    """Agrupa as CreditTransaction dos débitos do bloco em um único bulk_create"""
+    if getattr(_local, 'pending', None) is not None:
+        # Já dentro de um lote
+        yield
+        return
+    _local.pending = []
+    try:
+        with transaction.atomic():
+            yield
+            CreditTransaction.objects.bulk_create(_local.pending)
+    finally:
+        _local.pending = None
+
+
+def _record(user_id, amount, transaction_type, description):
+    _local.pending.append(CreditTransaction(
+        user_id=user_id, amount=amount, transaction_type=transaction_type, description=description))
+
+
+def reserve(task, amount, user=None):
+    """Reserva créditos para a tarefa e a marca como em execução"""
+    if amount <= 0:
+        raise ValueError('A reserva precisa ser positiva.')
+    user = user or task.created_by
+    limit = max_concurrent_tasks(user)
+
+    def run():
+        with transaction.atomic():
+            claimed = Task.objects.filter(pk=task.pk, credits_reserved=0).exclude(status='in_progress').update(
+                credits_reserved=amount, status='in_progress')
+            if not claimed:
+                raise CreditError('A tarefa já está em execução.')
+            reserved = Profile.objects.filter(
+                user=user,
+                credit_balance__gte=F('credits_reserved') + amount,
+                running_tasks__lt=limit,
+            ).update(credits_reserved=F('credits_reserved') + amount, running_tasks=F('running_tasks') + 1)
+            if not reserved:
+                profile = Profile.objects.filter(user=user).values('running_tasks').first()
+                if profile and profile['running_tasks'] >= limit:
+                    raise ConcurrencyLimitReached(f'Limite de {limit} tarefas simultâneas atingido.')
+                raise InsufficientCredits('Créditos insuficientes.')
+
+    _retry_on_lock(run)
+    task.credits_reserved = amount
+    task.status = 'in_progress'
+    return task
+
+
+def commit(task, used, user=None):
+    """Debita os créditos usados (até o valor reservado) e conclui a tarefa"""
+    user_id = user.pk if user else task.created_by_id
+    reserved = task.credits_reserved
+    if reserved <= 0:
+        raise CreditError('A tarefa não tem reserva em aberto.')
+    if not 0 <= used <= reserved:
+        raise ValueError(f'Uso de {used} créditos fora da reserva de {reserved}.')
+    now = timezone.now()
+
+    def run():
+        with batch():
+            # Compare-and-swap na reserva: só um commit/refund vence
+            finished = Task.objects.filter(pk=task.pk, credits_reserved=reserved).update(
+                credits_reserved=0, credits_used=F('credits_used') + used, status='completed', completed_at=now)
+            if not finished:
+                raise CreditError('A reserva da tarefa já foi encerrada.')
+            Profile.objects.filter(user_id=user_id).update(
+                credit_balance=F('credit_balance') - used,
+                credits_reserved=F('credits_reserved') - reserved,
+                running_tasks=F('running_tasks') - 1,
+            )
+            if used:
+                _record(user_id, used, 'usage', f'Tarefa #{task.pk}: {task.title}'[:200])
+
+    _retry_on_lock(run)
+    task.credits_reserved = 0
+    task.credits_used += used
+    task.status = 'completed'
+    task.completed_at = now
+    return task
+
+
+def refund(task, user=None):
+    """Devolve a reserva de uma tarefa que falhou, sem debitar nada"""
+    user_id = user.pk if user else task.created_by_id
+    reserved = task.credits_reserved
+    if reserved <= 0:
+        raise CreditError('A tarefa não tem reserva em aberto.')
+
+    def run():
+        with transaction.atomic():
+            released = Task.objects.filter(pk=task.pk, credits_reserved=reserved).update(
+                credits_reserved=0, status='failed')
+            if not released:
+                raise CreditError('A reserva da tarefa já foi encerrada.')
+            Profile.objects.filter(user_id=user_id).update(
+                credits_reserved=F('credits_reserved') - reserved,
+                running_tasks=F('running_tasks') - 1,
+            )
+
+    _retry_on_lock(run)
+    task.credits_reserved = 0
+    task.status = 'failed'
+    return task
+
+
+def available(user):
+    """Créditos que ainda podem ser reservados"""
+    row = Profile.objects.filter(user=user).values_list('credit_balance', 'credits_reserved').first()
+    return row[0] - row[1] if row else 0
@@ -0,0 +1,83 @@
+"""Saldo de créditos mantido junto com o extrato.
+
+Profile.credit_balance guarda o total corrente das CreditTransaction do
+usuário. Cada transação gravada ou removida soma a sua diferença ao saldo com
+um UPDATE atômico (F()), na mesma transação quando chamada dentro de um
+transaction.atomic, como em record(). reconcile() recalcula todos os saldos
+com uma única agregação por usuário.
+"""
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+
+from accounts.models import Profile
+from .models import CreditTransaction
+
+
+def apply_delta(user_id, delta):
+    if delta:
+        Profile.objects.filter(user_id=user_id).update(credit_balance=F('credit_balance') + delta)
+
+
+def transaction_saved(credit_transaction, created):
+    current = credit_transaction.signed_amount
+    previous = 0 if created else getattr(credit_transaction, '_loaded_signed_amount', current)
+    apply_delta(credit_transaction.user_id, current - previous)
+    credit_transaction._loaded_signed_amount = current
+
+
+def transaction_deleted(credit_transaction):
+    signed = getattr(credit_transaction, '_loaded_signed_amount', credit_transaction.signed_amount)
+    apply_delta(credit_transaction.user_id, -signed)
+
+
+def record(user, amount, transaction_type, description):
+    """Grava uma transação e atualiza o saldo de forma atômica"""
+    with transaction.atomic():
+        return CreditTransaction.objects.create(
+            user=user, amount=amount, transaction_type=transaction_type, description=description)
+
+
+def signed_amount_expression():
+    """Expressão SQL equivalente a CreditTransaction.signed_amount"""
+    return Case(
+        *[When(transaction_type=t, then=F('amount') * sign) for t, sign in CreditTransaction.SIGNS.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def expected_balances(user_ids=None):
+    """{user_id: saldo} calculado do extrato, em uma única consulta"""
+    transactions = CreditTransaction.objects.order_by()
+    if user_ids is not None:
+        transactions = transactions.filter(user_id__in=user_ids)
+    rows = transactions.values('user_id').annotate(balance=Sum(signed_amount_expression()))
+    return {row['user_id']: row['balance'] for row in rows}
+
+
+def balance(user):
+    """Saldo atual do usuário (do Profile, ou do extrato se ele não tiver perfil)"""
+    value = Profile.objects.filter(user=user).values_list('credit_balance', flat=True).first()
+    if value is None:
+        value = expected_balances([user.pk]).get(user.pk, 0)
+    return value
+
+
+def reconcile(batch_size=1000, dry_run=False):
+    """Recalcula o saldo de todos os perfis; retorna os user_ids divergentes"""
+    expected = expected_balances()
+    mismatched = []
+    changed = []
+    profiles = Profile.objects.only('id', 'user_id', 'credit_balance')
+    for profile in profiles.iterator(chunk_size=batch_size):
+        value = expected.get(profile.user_id, 0)
+        if profile.credit_balance != value:
+            mismatched.append(profile.user_id)
+            profile.credit_balance = value
+            changed.append(profile)
+        if not dry_run and len(changed) >= batch_size:
+            Profile.objects.bulk_update(changed, ['credit_balance'])
+            changed = []
+    if not dry_run and changed:
+        Profile.objects.bulk_update(changed, ['credit_balance'])
+    return mismatched
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from billing import ledger
+
+class Command(BaseCommand):
+    help = 'Recompute Profile.credit_balance from the credit transaction ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true',
+                            help='Only report users whose balance is out of date')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        mismatched = ledger.reconcile(batch_size=options['batch_size'], dry_run=options['verify'])
+        if options['verify']:
+            if mismatched:
+                self.stdout.write(self.style.WARNING(f'{len(mismatched)} balances out of date: {mismatched[:20]}'))
+            else:
+                self.stdout.write(self.style.SUCCESS('All credit balances are consistent'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Credit balances reconciled ({len(mismatched)} users updated)'))
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:58
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+
+SIGNS = {'purchase': 1, 'bonus': 1, 'refund': 1, 'usage': -1}
+
+
+def fill_credit_balances(apps, schema_editor):
+    CreditTransaction = apps.get_model('billing', 'CreditTransaction')
+    Profile = apps.get_model('accounts', 'Profile')
+    signed = Case(
+        *[When(transaction_type=t, then=F('amount') * sign) for t, sign in SIGNS.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    rows = CreditTransaction.objects.order_by().values('user_id').annotate(balance=Sum(signed))
+    balances = {row['user_id']: row['balance'] for row in rows}
+    profiles = list(Profile.objects.filter(user_id__in=balances))
+    for profile in profiles:
+        profile.credit_balance = balances[profile.user_id]
+    Profile.objects.bulk_update(profiles, ['credit_balance'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_credit_balance'),
+        ('billing', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='credittransaction',
+            index=models.Index(fields=['user', '-created_at'], name='credit_tx_user_created_idx'),
+        ),
+        migrations.RunPython(fill_credit_balances, migrations.RunPython.noop),
+    ]
@@ -48,6 +48,26 @@ class CreditTransaction(models.Model):
     
     def __str__(self):
         return f'{self.user.username} - {self.transaction_type} - {self.amount}'
+    
+    # Efeito de cada tipo no saldo; reembolsos devolvem créditos
+    SIGNS = {'purchase': 1, 'bonus': 1, 'refund': 1, 'usage': -1}
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Guardar o efeito carregado para corrigir o saldo se a transação mudar
+        if 'amount' in instance.__dict__ and 'transaction_type' in instance.__dict__:
+            instance._loaded_signed_amount = instance.signed_amount
+        return instance
+    
+    @property
+    def signed_amount(self):
+        return self.SIGNS.get(self.transaction_type, 0) * self.amount
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='credit_tx_user_created_idx'),
+        ]
 
 class Invoice(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
@@ -0,0 +1,16 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import CreditTransaction
+from . import ledger
+
+
+@receiver(post_save, sender=CreditTransaction)
+def update_balance_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    ledger.transaction_saved(instance, created)
+
+
+@receiver(post_delete, sender=CreditTransaction)
+def update_balance_on_delete(sender, instance, **kwargs):
+    ledger.transaction_deleted(instance)
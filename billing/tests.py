@@ -1,3 +1,172 @@
-from django.test import TestCase
+import random
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import Profile
+from tasks.models import Task
+from . import credits, ledger
+from .models import CreditTransaction, Plan, Subscription
+
+
+class LedgerTests(TestCase):
+    """Profile.credit_balance acompanha o extrato a cada transação gravada, editada ou removida"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cliente', password='senha123')
+        Profile.objects.create(user=cls.user)
+
+    def balance(self):
+        return Profile.objects.get(user=self.user).credit_balance
+
+    def test_signs(self):
+        # Reembolso devolve créditos ao saldo
+        cases = [('purchase', 50, 50), ('bonus', 10, 60), ('usage', 20, 40), ('refund', 5, 45)]
+        for transaction_type, amount, expected in cases:
+            with self.subTest(transaction_type=transaction_type):
+                ledger.record(self.user, amount, transaction_type, 'Teste')
+                self.assertEqual(self.balance(), expected)
+        self.assertEqual(ledger.expected_balances(), {self.user.pk: 45})
+
+    def test_edit_and_delete(self):
+        purchase = ledger.record(self.user, 30, 'purchase', 'Compra')
+        usage = ledger.record(self.user, 10, 'usage', 'Uso')
+        self.assertEqual(self.balance(), 20)
+
+        usage.amount = 5
+        usage.save()
+        self.assertEqual(self.balance(), 25)
+        # Trocar o tipo troca o sinal
+        loaded = CreditTransaction.objects.get(pk=usage.pk)
+        loaded.transaction_type = 'refund'
+        loaded.save()
+        self.assertEqual(self.balance(), 35)
+
+        CreditTransaction.objects.get(pk=purchase.pk).delete()
+        self.assertEqual(self.balance(), 5)
+        CreditTransaction.objects.all().delete()
+        self.assertEqual(self.balance(), 0)
+        self.assertEqual(ledger.reconcile(dry_run=True), [])
+
+    def test_balance_without_profile(self):
+        other = User.objects.create_user('sem_perfil')
+        ledger.record(other, 7, 'bonus', 'Bônus')
+        self.assertEqual(ledger.balance(other), 7)
+
+    def test_reconcile_command(self):
+        ledger.record(self.user, 30, 'purchase', 'Compra')
+        Profile.objects.filter(user=self.user).update(credit_balance=99)
+        out = StringIO()
+        call_command('reconcile_credit_balances', '--verify', stdout=out)
+        self.assertIn('1 balances out of date', out.getvalue())
+        self.assertEqual(self.balance(), 99)
+        call_command('reconcile_credit_balances', stdout=StringIO())
+        self.assertEqual(self.balance(), 30)
+
+    def test_billing_home(self):
+        ledger.record(self.user, 30, 'purchase', 'Compra de créditos')
+        ledger.record(self.user, 4, 'usage', 'Tarefa')
+        self.client.login(username='cliente', password='senha123')
+        response = self.client.get(reverse('billing:home'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['credit_balance'], 26)
+        self.assertEqual([t.description for t in response.context['credit_transactions']],
+                         ['Tarefa', 'Compra de créditos'])
+        self.assertContains(response, 'Compra de créditos')
+
+
+class ConcurrentCreditTests(TransactionTestCase):
+    """Tarefas simultâneas não podem deixar o saldo negativo nem divergir do histórico"""
+
+    THREADS = 16
+    TASKS_PER_THREAD = 5
+    MAX_CONCURRENT = 4
+
+    def setUp(self):
+        self.user = User.objects.create(username='cliente')
+        Profile.objects.create(user=self.user)
+        plan = Plan.objects.create(name='Básico', price=10, credits_per_month=100,
+                                   max_concurrent_tasks=self.MAX_CONCURRENT)
+        now = timezone.now()
+        Subscription.objects.create(user=self.user, plan=plan, start_date=now, end_date=now + timedelta(days=30))
+        ledger.record(self.user, 100, 'bonus', 'Créditos iniciais')
+        self.tasks = [
+            Task.objects.create(title=f'Tarefa {i}', description='Descrição', created_by=self.user)
+            for i in range(self.THREADS * self.TASKS_PER_THREAD)
+        ]
+
+    def test_balance_never_goes_negative(self):
+        lock = threading.Lock()
+        barrier = threading.Barrier(self.THREADS)
+        used = []
+        rejected = []
+        balances = []
+        errors = []
+        running = [0]
+        peak = [0]
+
+        def worker(tasks):
+            rng = random.Random(tasks[0].pk)
+            try:
+                barrier.wait()
+                for task in tasks:
+                    try:
+                        credits.reserve(task, rng.randint(1, 10), user=self.user)
+                    except credits.CreditError:
+                        rejected.append(task.pk)
+                        continue
+                    with lock:
+                        running[0] += 1
+                        peak[0] = max(peak[0], running[0])
+                    balances.append(credits._retry_on_lock(
+                        lambda: Profile.objects.values_list('credit_balance', flat=True).get(user=self.user)))
+                    time.sleep(0.001)
+                    with lock:
+                        running[0] -= 1
+                    if rng.random() < 0.2:
+                        credits.refund(task, user=self.user)
+                    else:
+                        amount = rng.randint(0, task.credits_reserved)
+                        credits.commit(task, amount, user=self.user)
+                        used.append(amount)
+            except Exception as e:
+                errors.append(e)
+                raise
+            finally:
+                connection.close()
+
+        chunks = [self.tasks[i::self.THREADS] for i in range(self.THREADS)]
+        threads = [threading.Thread(target=worker, args=(chunk,)) for chunk in chunks]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        profile = Profile.objects.get(user=self.user)
+        self.assertEqual(profile.credit_balance, 100 - sum(used))
+        self.assertGreaterEqual(min(balances + [profile.credit_balance]), 0)
+        self.assertEqual(profile.credits_reserved, 0)
+        self.assertEqual(profile.running_tasks, 0)
+        self.assertEqual(ledger.reconcile(dry_run=True), [])
+        self.assertLessEqual(peak[0], self.MAX_CONCURRENT)
+        self.assertEqual(len(used) + len(rejected) + Task.objects.filter(status='failed').count(),
+                         len(self.tasks))
+        self.assertEqual(sum(Task.objects.values_list('credits_used', flat=True)), sum(used))
+
+    def test_commit_and_refund_settle_once(self):
+        task = credits.reserve(self.tasks[0], 10, user=self.user)
+        stale = Task.objects.get(pk=task.pk)
+        credits.commit(task, 4, user=self.user)
+        with self.assertRaises(credits.CreditError):
+            credits.refund(stale, user=self.user)
+        self.assertEqual(credits.available(self.user), 96)
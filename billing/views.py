@@ -1,31 +1,29 @@
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
+from accounts.models import Profile
+from . import ledger
 from .models import Plan, Subscription, CreditTransaction
 
 @login_required
 def billing_home(request):
     # Get user's current plan
-    try:
-        subscription = Subscription.objects.get(user=request.user, is_active=True)
-        current_plan = subscription.plan
-    except Subscription.DoesNotExist:
-        current_plan = None
+    subscription = Subscription.objects.filter(user=request.user, is_active=True).select_related('plan').first()
+    current_plan = subscription.plan if subscription else None
     
-    # Get credit balance
-    credit_transactions = CreditTransaction.objects.filter(user=request.user).order_by('-created_at')
+    # Saldo mantido em Profile.credit_balance (ver billing.ledger)
+    user_profile = Profile.objects.filter(user=request.user).first()
+    credit_balance = user_profile.credit_balance if user_profile else ledger.balance(request.user)
     
-    # Calculate credit balance
-    credit_balance = 0
-    for transaction in credit_transactions:
-        if transaction.transaction_type in ['purchase', 'bonus']:
-            credit_balance += transaction.amount
-        elif transaction.transaction_type == 'usage':
-            credit_balance -= transaction.amount
+    # Últimas transações
+    credit_transactions = list(CreditTransaction.objects.filter(user=request.user).order_by('-created_at')[:10])
     
     return render(request, 'billing/home.html', {
+        'subscription': subscription,
         'current_plan': current_plan,
+        'user_profile': user_profile,
         'credit_balance': credit_balance,
-        'credit_transactions': credit_transactions[:10]
+        'credit_transactions': credit_transactions,
+        'transactions': credit_transactions,
     })
 
 def plans(request):
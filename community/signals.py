@@ -0,0 +1,14 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from local_businesses import fragments
+from .models import Event, UseCase
+
+
+@receiver(post_save, sender=UseCase)
+@receiver(post_delete, sender=UseCase)
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+@receiver(m2m_changed, sender=Event.attendees.through)
+def invalidate_community(sender, **kwargs):
+    fragments.invalidate('community')
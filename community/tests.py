@@ -1,3 +1,54 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Event, UseCase
+
+
+class CommunityFragmentTests(TestCase):
+    """Listas da comunidade em fragmentos cacheados até a próxima alteração"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('autora', first_name='Ana')
+        UseCase.objects.create(title='Atendimento automático', description='Descrição', category='suporte',
+                               created_by=cls.user)
+        Event.objects.create(title='Encontro mensal', description='Descrição', location='Centro',
+                             event_date=timezone.now() + timedelta(days=7), created_by=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.urls = [reverse('community:home'), reverse('community:use_cases'), reverse('community:events')]
+
+    def test_warm_pages_do_not_query_the_lists(self):
+        cases = zip(self.urls, ['Encontro mensal', 'Atendimento automático', 'Encontro mensal'])
+        for url, text in cases:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, text)
+                with self.assertNumQueries(0):
+                    cached = self.client.get(url)
+                self.assertEqual(cached.content, response.content)
+
+    def test_author_is_rendered_without_extra_queries(self):
+        for url in self.urls[1:]:
+            with self.subTest(url=url), self.assertNumQueries(1):
+                self.assertContains(self.client.get(url), 'Ana')
 
-# Create your tests here.
+    def test_changes_refresh_the_fragments(self):
+        for url in self.urls:
+            self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            UseCase.objects.create(title='Agenda integrada', description='Descrição', category='vendas',
+                                   created_by=self.user)
+            Event.objects.filter(title='Encontro mensal').get().delete()
+        for url in self.urls[:2]:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'Agenda integrada')
+        for url in (self.urls[0], self.urls[2]):
+            with self.subTest(url=url):
+                self.assertNotContains(self.client.get(url), 'Encontro mensal')
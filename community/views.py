@@ -1,6 +1,9 @@
 from django.shortcuts import render
 from .models import UseCase, Event
 
+# Os templates renderizam as listas dentro de {% cache %} com a versão 'community'
+# (ver community.signals); as consultas só rodam quando o fragmento não está no cache
+
 def community_home(request):
     use_cases = UseCase.objects.all().order_by('-created_at')[:6]
     events = Event.objects.all().order_by('event_date')[:3]
@@ -10,9 +13,9 @@ def community_home(request):
     })
 
 def use_cases(request):
-    use_cases = UseCase.objects.all().order_by('-created_at')
+    use_cases = UseCase.objects.select_related('created_by').order_by('-created_at')
     return render(request, 'community/use_cases.html', {'use_cases': use_cases})
 
 def events(request):
-    events = Event.objects.all().order_by('event_date')
+    events = Event.objects.select_related('created_by').order_by('event_date')
     return render(request, 'community/events.html', {'events': events})
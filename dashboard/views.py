@@ -3,28 +3,28 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from accounts.models import Profile
 from tasks.models import Task
+from local_businesses import fragments
 from local_businesses.models import Business, BusinessCategory
-from django.db.models import Avg
 
 def home(request):
     # Obter comércios em destaque (simulação)
-    featured_businesses = Business.objects.filter(is_active=True, businessplan__is_featured=True)[:3]
-    
-    # Adicionar média de avaliações
-    featured_businesses = featured_businesses.annotate(avg_rating=Avg('reviews__rating'))
+    featured_businesses = Business.objects.filter(
+        is_active=True, businessplan__is_featured=True
+    ).select_related('category').with_primary_photo()[:3]
     
     # Obter categorias
     categories = BusinessCategory.objects.all()[:8]
     
     # Obter comércios próximos (simulação)
-    nearby_businesses = Business.objects.filter(is_active=True).annotate(
-        avg_rating=Avg('reviews__rating')
-    ).order_by('-businessplan__is_featured', '-avg_rating')[:6]
+    nearby_businesses = Business.objects.filter(is_active=True).select_related('category').with_primary_photo().order_by(
+        '-businessplan__is_featured', '-avg_rating'
+    )[:6]
     
+    # Versões dos cartões em cache carregadas de uma vez
     context = {
-        'featured_businesses': featured_businesses,
+        'featured_businesses': fragments.attach_versions(featured_businesses),
         'categories': categories,
-        'nearby_businesses': nearby_businesses,
+        'nearby_businesses': fragments.attach_versions(nearby_businesses),
     }
     return render(request, 'dashboard/home.html', context)
 
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import BusinessCategory, Business, BusinessPhoto, BusinessHours, Review, BusinessPlan, Booking
+from .models import BusinessCategory, Business, BusinessPhoto, BusinessHours, Review, BusinessPlan, Booking, QueuedNotification
 
 @admin.register(BusinessCategory)
 class BusinessCategoryAdmin(admin.ModelAdmin):
@@ -42,4 +42,10 @@ class BookingAdmin(admin.ModelAdmin):
     list_display = ('business', 'user', 'service_name', 'booking_date', 'booking_time', 'status')
     list_filter = ('status', 'booking_date', 'created_at')
     raw_id_fields = ('business', 'user')
-    search_fields = ('business__name', 'user__username', 'service_name')
\ No newline at end of file
+    search_fields = ('business__name', 'user__username', 'service_name')
+
+@admin.register(QueuedNotification)
+class QueuedNotificationAdmin(admin.ModelAdmin):
+    list_display = ('business', 'notification_type', 'title', 'created_at', 'processed_at')
+    list_filter = ('notification_type', 'processed_at')
+    raw_id_fields = ('business', 'user')
@@ -0,0 +1,70 @@
+"""Dados do painel administrativo.
+
+Os totais do sistema saem de uma única consulta (uma subconsulta COUNT por
+tabela) e ficam no cache por CACHE_TIMEOUT segundos. A tabela de usuários e
+planos é servida paginada por cursor pelo endpoint JSON admin_users_api, então
+o custo da página não depende do número de usuários.
+"""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Prefetch, Q
+
+from . import pagination
+from .models import Booking, Business, Review
+
+CACHE_KEY = 'admin_dashboard:totals'
+CACHE_TIMEOUT = 60
+
+USERS_PAGE_SIZE = 50
+USERS_ORDERING = ('username', 'id')
+
+TOTALS = {
+    'total_businesses': Business,
+    'total_users': User,
+    'total_reviews': Review,
+    'total_bookings': Booking,
+}
+
+
+def totals():
+    """{'total_businesses': ..., 'total_users': ..., ...}"""
+    result = cache.get(CACHE_KEY)
+    if result is None:
+        quote = connection.ops.quote_name
+        columns = ', '.join(f'(SELECT COUNT(*) FROM {quote(model._meta.db_table)})' for model in TOTALS.values())
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT {columns}')
+            result = dict(zip(TOTALS, cursor.fetchone()))
+        cache.set(CACHE_KEY, result, CACHE_TIMEOUT)
+    return result
+
+
+def users_page(query='', cursor=None, per_page=USERS_PAGE_SIZE):
+    """Página de usuários com seus negócios e planos; levanta pagination.InvalidCursor"""
+    users = User.objects.only('id', 'username', 'first_name', 'last_name', 'email', 'date_joined')
+    if query:
+        users = users.filter(Q(username__istartswith=query) | Q(email__istartswith=query))
+    businesses = Business.objects.select_related('businessplan').only(
+        'id', 'name', 'user_id', 'businessplan__plan_type').order_by('id')
+    users = users.prefetch_related(Prefetch('businesses', queryset=businesses))
+    return pagination.KeysetPaginator(users, USERS_ORDERING, per_page).page(cursor)
+
+
+def serialize_user(user):
+    businesses = []
+    for business in user.businesses.all():
+        plan = getattr(business, 'businessplan', None)
+        businesses.append({
+            'id': business.id,
+            'name': business.name,
+            'plan': plan.plan_type if plan else None,
+            'plan_display': plan.get_plan_type_display() if plan else None,
+        })
+    return {
+        'id': user.id,
+        'name': user.get_full_name() or user.username,
+        'email': user.email,
+        'date_joined': user.date_joined.strftime('%d/%m/%Y'),
+        'businesses': businesses,
+    }
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class LocalBusinessesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'local_businesses'
+
+    def ready(self):
+        from . import signals  # noqa: F401
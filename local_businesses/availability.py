@@ -0,0 +1,156 @@
+"""Horários disponíveis para reserva.
+
+Os TimeSlot de cada dia da semana são expandidos em intervalos concretos de
+`duration` minutos, recortados pelo BusinessHours do dia (dias com is_closed
+não têm horários) e descontados os intervalos ocupados pelas reservas
+pendentes ou confirmadas. Horários com capacidade aceitam reservas
+sobrepostas até somar `capacity` pessoas; os demais, uma reserva por vez.
+
+O resultado é guardado no cache por (negócio, data). Alterações em reservas
+invalidam só a data afetada; alterações em TimeSlot ou BusinessHours trocam a
+versão do negócio, invalidando todas as datas de uma vez. A invalidação
+acontece depois do commit, para que nenhuma consulta simultânea guarde de novo
+a disponibilidade sem a alteração ainda não confirmada.
+"""
+import time as time_module
+from datetime import time, timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Booking
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+# Reservas que ocupam o horário
+BLOCKING_STATUSES = ('pending', 'confirmed')
+
+CACHE_TIMEOUT = 60 * 10
+MAX_RANGE_DAYS = 31
+
+
+def to_minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def from_minutes(minutes):
+    return time(minutes // 60, minutes % 60)
+
+
+def _version_key(business_id):
+    return f'availability_version:{business_id}'
+
+
+def _date_key(business_id, version, day):
+    return f'availability:{business_id}:{version}:{day.isoformat()}'
+
+
+def _version(business_id):
+    return cache.get_or_set(_version_key(business_id), 1, None)
+
+
+def expand_slots(time_slots, hours, day):
+    """Intervalos (início, fim, capacidade), em minutos, oferecidos no dia"""
+    weekday = WEEKDAYS[day.weekday()]
+    day_hours = hours.get(weekday)
+    if day_hours and day_hours.is_closed:
+        return []
+    intervals = {}
+    for slot in time_slots:
+        if slot.day_of_week != weekday or slot.duration <= 0:
+            continue
+        start, end = to_minutes(slot.start_time), to_minutes(slot.end_time)
+        if day_hours:
+            start = max(start, to_minutes(day_hours.open_time))
+            end = min(end, to_minutes(day_hours.close_time))
+        while start + slot.duration <= end:
+            intervals[(start, start + slot.duration)] = slot.capacity
+            start += slot.duration
+    return sorted((start, end, capacity) for (start, end), capacity in intervals.items())
+
+
+def occupancy(busy, start, end):
+    """(reservas, pessoas) de busy, ordenado, que se sobrepõem a [start, end)"""
+    count = people = 0
+    for busy_start, busy_end, busy_people in busy:
+        if busy_start >= end:
+            break
+        if busy_end > start:
+            count += 1
+            people += busy_people
+    return count, people
+
+
+def remaining_capacity(capacity, busy, start, end):
+    """Vagas restantes no intervalo; para horários exclusivos, 1 se livre e 0 se ocupado"""
+    count, people = occupancy(busy, start, end)
+    if capacity is None:
+        return 0 if count else 1
+    return max(capacity - people, 0)
+
+
+def free_intervals(intervals, busy):
+    """Intervalos com vaga: [(início, fim, vagas)]; vagas é None nos exclusivos"""
+    free = []
+    for start, end, capacity in intervals:
+        remaining = remaining_capacity(capacity, busy, start, end)
+        if remaining:
+            free.append((start, end, remaining if capacity is not None else None))
+    return free
+
+
+def busy_intervals(bookings):
+    """{data: [(início, fim, pessoas)]} ordenados, a partir de tuplas (data, horário, duração, pessoas)"""
+    busy = {}
+    for booking_date, booking_time, duration, people in bookings:
+        start = to_minutes(booking_time)
+        busy.setdefault(booking_date, []).append((start, start + max(duration, 1), people))
+    for intervals in busy.values():
+        intervals.sort()
+    return busy
+
+
+def compute(business, days):
+    """Calcula os horários livres das datas, com uma consulta por tabela"""
+    time_slots = list(business.time_slots.filter(is_active=True))
+    hours = {h.day_of_week: h for h in business.hours.all()}
+    bookings = (Booking.objects.filter(business=business, booking_date__in=days, status__in=BLOCKING_STATUSES)
+                .values_list('booking_date', 'booking_time', 'duration', 'number_of_people'))
+    busy = busy_intervals(bookings)
+    return {day: free_intervals(expand_slots(time_slots, hours, day), busy.get(day, [])) for day in days}
+
+
+def available_times(business, start_date, days=1):
+    """{data: [(início, fim, vagas)]} para `days` datas a partir de start_date"""
+    dates = [start_date + timedelta(days=i) for i in range(min(max(days, 1), MAX_RANGE_DAYS))]
+    version = _version(business.pk)
+    keys = {_date_key(business.pk, version, day): day for day in dates}
+    cached = cache.get_many(keys.keys())
+    result = {keys[key]: value for key, value in cached.items()}
+
+    missing = [day for day in dates if day not in result]
+    if missing:
+        computed = compute(business, missing)
+        cache.set_many({_date_key(business.pk, version, day): computed[day] for day in missing}, CACHE_TIMEOUT)
+        result.update(computed)
+
+    return {
+        day: [(from_minutes(start), from_minutes(end), remaining) for start, end, remaining in result[day]]
+        for day in dates
+    }
+
+
+def invalidate_date(business_id, day):
+    transaction.on_commit(lambda: cache.delete(_date_key(business_id, _version(business_id), day)))
+
+
+def _bump(business_id):
+    try:
+        cache.incr(_version_key(business_id))
+    except ValueError:
+        # Versão fora do cache: começar de um valor que não repete as anteriores
+        cache.set(_version_key(business_id), time_module.time_ns(), None)
+
+
+def invalidate_business(business_id):
+    transaction.on_commit(lambda: _bump(business_id))
@@ -0,0 +1,223 @@
+"""Medição das consultas mais frequentes das views de local_businesses.
+
+Usado pelo comando benchmark_indexes: gera uma massa de dados com bulk_create,
+executa cada consulta com e sem os índices compostos (removidos dentro de uma
+transação desfeita ao final) e registra o plano de execução e o tempo.
+throwaway_database() é compartilhado pelos outros benchmarks.
+"""
+import random
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date, time as dt_time, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from billing.models import Plan
+from . import geo
+from .models import (Booking, Business, BusinessCategory, Notification, PlanUpgradeRequest, Review,
+                     TimeSlot)
+
+# Índices avaliados; os demais (chaves estrangeiras, grade) ficam sempre
+INDEXES = [
+    (Business, 'business_listing_idx'),
+    (Notification, 'notification_business_idx'),
+    (Notification, 'notification_unread_idx'),
+    (Booking, 'booking_business_date_idx'),
+    (Booking, 'booking_business_status_idx'),
+    (Review, 'review_business_user_idx'),
+    (PlanUpgradeRequest, 'upgrade_status_idx'),
+    (TimeSlot, 'timeslot_business_active_idx'),
+]
+
+@contextmanager
+def throwaway_database(options=None):
+    """Banco de teste novo, apagado ao sair; options substitui DATABASES['default']['OPTIONS']
+
+    No SQLite o banco fica em arquivo: em memória não haveria disputa entre
+    conexões, e cada thread dos benchmarks concorrentes abre a sua.
+    """
+    settings_dict = connection.settings_dict
+    saved_options, saved_test_name = settings_dict['OPTIONS'], settings_dict['TEST']['NAME']
+    if options is not None:
+        settings_dict['OPTIONS'] = options
+    with tempfile.TemporaryDirectory() as directory:
+        if connection.vendor == 'sqlite':
+            settings_dict['TEST']['NAME'] = str(Path(directory) / 'benchmark.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            settings_dict['OPTIONS'], settings_dict['TEST']['NAME'] = saved_options, saved_test_name
+
+
+DAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+
+def seed(businesses=5000, seed=0, batch_size=2000):
+    """Cria a massa de dados; retorna o total de linhas por modelo"""
+    rng = random.Random(seed)
+    today = date.today()
+
+    categories = BusinessCategory.objects.bulk_create([
+        BusinessCategory(name=f'Categoria {i}', icon='store') for i in range(12)
+    ])
+    plan = Plan.objects.create(name='Benchmark', price=Decimal('0'), credits_per_month=0)
+
+    reviewers = max(100, businesses // 5)
+    User.objects.bulk_create([User(username=f'bench{i}') for i in range(businesses + reviewers)],
+                             batch_size=batch_size)
+    user_ids = list(User.objects.filter(username__startswith='bench').order_by('id').values_list('id', flat=True))
+    owner_ids, reviewer_ids = user_ids[:businesses], user_ids[businesses:]
+
+    rows = []
+    for i, owner_id in enumerate(owner_ids):
+        lat = Decimal(f'{rng.uniform(-30, -5):.6f}')
+        lng = Decimal(f'{rng.uniform(-55, -35):.6f}')
+        grid_row, grid_col = geo.grid_cell(lat, lng)
+        rows.append(Business(
+            user_id=owner_id, name=f'Negócio {i}', description='Benchmark', address=f'Rua {i}',
+            business_type=rng.choice(['commerce', 'service']), category=rng.choice(categories),
+            latitude=lat, longitude=lng, grid_row=grid_row, grid_col=grid_col,
+            avg_rating=round(rng.uniform(0, 5), 2), is_active=rng.random() < 0.9,
+        ))
+    Business.objects.bulk_create(rows, batch_size=batch_size)
+    business_ids = list(Business.objects.order_by('id').values_list('id', flat=True))
+
+    reviews, bookings, notifications, time_slots = [], [], [], []
+    for business_id in business_ids:
+        for user_id in rng.sample(reviewer_ids, rng.randint(0, 10)):
+            reviews.append(Review(business_id=business_id, user_id=user_id, rating=rng.randint(1, 5)))
+        for _ in range(rng.randint(0, 20)):
+            bookings.append(Booking(
+                business_id=business_id, user_id=rng.choice(reviewer_ids), service_name='Serviço',
+                booking_date=today + timedelta(days=rng.randint(-60, 60)),
+                booking_time=dt_time(rng.randint(8, 18), rng.choice([0, 30])),
+                status=rng.choice(['pending', 'confirmed', 'cancelled', 'completed']),
+            ))
+        for _ in range(rng.randint(0, 20)):
+            notifications.append(Notification(
+                business_id=business_id, notification_type='general', title='Benchmark', message='Benchmark',
+                is_read=rng.random() < 0.7,
+            ))
+        for day in DAYS:
+            time_slots.append(TimeSlot(business_id=business_id, day_of_week=day, start_time=dt_time(8),
+                                       end_time=dt_time(18), is_active=rng.random() < 0.9))
+    upgrades = [
+        PlanUpgradeRequest(business_id=rng.choice(business_ids), requested_plan=rng.choice(['pro', 'premium']),
+                           billing_plan=plan, status=rng.choice(['pending'] + ['approved', 'rejected'] * 5))
+        for _ in range(max(10, businesses // 10))
+    ]
+
+    for model, objs in ((Review, reviews), (Booking, bookings), (Notification, notifications),
+                        (TimeSlot, time_slots), (PlanUpgradeRequest, upgrades)):
+        model.objects.bulk_create(objs, batch_size=batch_size)
+
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+    return {
+        'users': len(user_ids), 'businesses': len(business_ids), 'reviews': len(reviews),
+        'bookings': len(bookings), 'notifications': len(notifications), 'time_slots': len(time_slots),
+        'upgrade_requests': len(upgrades),
+    }
+
+
+def sample(seed=0):
+    """Valores usados nos filtros: um negócio com reservas, seu dono, uma categoria"""
+    rng = random.Random(seed)
+    business = rng.choice(list(Business.objects.filter(is_active=True).order_by('id')[:1000]))
+    booking_date = (Booking.objects.filter(business=business).values_list('booking_date', flat=True).first()
+                    or date.today())
+    return {
+        'business': business,
+        'user_id': business.user_id,
+        'category_id': business.category_id,
+        'business_type': business.business_type,
+        'reviewer_id': Review.objects.filter(business=business).values_list('user_id', flat=True).first() or 0,
+        'dates': [booking_date + timedelta(days=i) for i in range(7)],
+    }
+
+
+def hot_queries(s):
+    """[(nome, view, função que executa a consulta)] para os valores de sample()"""
+    business = s['business']
+    listing = Business.objects.filter(is_active=True).order_by('-avg_rating', '-id')
+    return [
+        ('listing', 'business_list', lambda: list(listing[:25])),
+        ('listing_filtered', 'business_list', lambda: list(
+            listing.filter(category_id=s['category_id'], business_type=s['business_type'])[:25])),
+        ('unread_count', 'context_processors.notifications', lambda: Notification.objects.filter(
+            business__user_id=s['user_id'], is_read=False).count()),
+        ('dashboard_unread', 'business_dashboard', lambda: business.notifications.filter(is_read=False).count()),
+        ('dashboard_pending_bookings', 'business_dashboard', lambda: business.bookings.filter(
+            status='pending').count()),
+        ('notifications', 'manage_notifications', lambda: list(business.notifications.all()[:50])),
+        ('bookings', 'manage_bookings', lambda: list(business.bookings.order_by('-booking_date', '-booking_time'))),
+        ('availability', 'get_available_times', lambda: list(Booking.objects.filter(
+            business=business, booking_date__in=s['dates'], status__in=['pending', 'confirmed']))),
+        ('existing_review', 'add_review', lambda: Review.objects.filter(
+            business=business, user_id=s['reviewer_id']).first()),
+        ('pending_upgrades', 'admin_dashboard', lambda: list(PlanUpgradeRequest.objects.filter(
+            status='pending').order_by('-created_at')[:50])),
+        ('time_slots', 'availability', lambda: list(TimeSlot.objects.filter(
+            business=business, is_active=True, day_of_week='monday'))),
+    ]
+
+
+def explain(sql):
+    """Plano de execução de uma consulta já interpolada, em uma linha"""
+    with connection.cursor() as cursor:
+        cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}')
+        return ' / '.join(str(row[-1]) for row in cursor.fetchall())
+
+
+def measure(run, repeat=20):
+    """(mediana em ms, plano da última consulta executada)"""
+    with CaptureQueriesContext(connection) as ctx:
+        run()
+    plan = explain(ctx.captured_queries[-1]['sql'])
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), plan
+
+
+def latency_report(latencies, elapsed):
+    """Vazão e percentis (ms) de uma lista de latências em segundos"""
+    latencies = sorted(latencies)
+    percentiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        'seconds': round(elapsed, 3),
+        'ops_per_second': round(len(latencies) / elapsed, 1) if elapsed else 0,
+        'p50_ms': round(percentiles[49] * 1000, 3),
+        'p95_ms': round(percentiles[94] * 1000, 3),
+        'p99_ms': round(percentiles[98] * 1000, 3),
+    }
+
+
+def run_all(s, repeat=20):
+    return {name: (view,) + measure(run, repeat) for name, view, run in hot_queries(s)}
+
+
+@contextmanager
+def without_indexes():
+    """Remove os índices de INDEXES durante o bloco; a remoção é desfeita ao sair"""
+    with transaction.atomic():
+        # Só o SQL do DROP INDEX do backend: o schema editor do SQLite não
+        # pode ser aberto dentro de uma transação
+        template = connection.SchemaEditorClass.sql_delete_index
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            for model, name in INDEXES:
+                cursor.execute(template % {'name': quote(name), 'table': quote(model._meta.db_table)})
+        yield
+        transaction.set_rollback(True)
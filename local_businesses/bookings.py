@@ -0,0 +1,83 @@
+"""Criação de reservas sem conflito de horário.
+
+A verificação de sobreposição e a gravação acontecem na mesma transação,
+depois de travar a linha do negócio: com SELECT ... FOR UPDATE nos bancos que
+suportam, ou com um UPDATE sem efeito no SQLite, que obtém o lock de escrita
+do banco. Assim duas requisições simultâneas para o mesmo negócio são
+serializadas e não há reserva dupla.
+
+Só se reserva o início de um dos intervalos de availability.expand_slots(); o
+intervalo ocupado (e a duração gravada) é o do horário, não o informado.
+"""
+import random
+import time
+
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.models import F
+
+from . import availability
+from .models import Booking, Business, BusinessHours, TimeSlot
+
+# Tentativas quando o SQLite responde "database is locked"
+MAX_ATTEMPTS = 8
+
+
+class BookingConflict(Exception):
+    pass
+
+
+def _lock_business(business_id):
+    if connection.features.has_select_for_update:
+        list(Business.objects.select_for_update().filter(pk=business_id).values_list('pk'))
+    else:
+        Business.objects.filter(pk=business_id).update(updated_at=F('updated_at'))
+
+
+def check_conflict(booking):
+    """Levanta BookingConflict se o horário não existe ou a reserva ultrapassa a sua capacidade"""
+    if booking.number_of_people < 1:
+        raise BookingConflict('Informe ao menos uma pessoa.')
+    time_slots = list(TimeSlot.objects.filter(business_id=booking.business_id, is_active=True))
+    hours = {h.day_of_week: h for h in BusinessHours.objects.filter(business_id=booking.business_id)}
+    start = availability.to_minutes(booking.booking_time)
+    interval = next((interval for interval in availability.expand_slots(time_slots, hours, booking.booking_date)
+                     if interval[0] == start), None)
+    if interval is None:
+        raise BookingConflict('Este horário não está disponível. Escolha um dos horários oferecidos.')
+    start, end, capacity = interval
+    booking.booking_time = availability.from_minutes(start)
+    booking.duration = end - start
+
+    existing = (Booking.objects.filter(business_id=booking.business_id, booking_date=booking.booking_date,
+                                       status__in=availability.BLOCKING_STATUSES)
+                .exclude(pk=booking.pk)
+                .values_list('booking_date', 'booking_time', 'duration', 'number_of_people'))
+    busy = availability.busy_intervals(existing).get(booking.booking_date, [])
+    count, people = availability.occupancy(busy, start, end)
+
+    if capacity is None:
+        if count:
+            raise BookingConflict('Este horário já está reservado. Escolha outro horário.')
+    elif people + booking.number_of_people > capacity:
+        remaining = max(capacity - people, 0)
+        raise BookingConflict(f'Restam apenas {remaining} vagas neste horário.')
+
+
+def create_booking(booking):
+    """Grava a reserva se houver vaga; levanta BookingConflict caso contrário"""
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                _lock_business(booking.business_id)
+                check_conflict(booking)
+                booking.save()
+            return booking
+        except IntegrityError:
+            raise BookingConflict('Este horário já está reservado. Escolha outro horário.')
+        except OperationalError as e:
+            if 'locked' not in str(e) or attempt == MAX_ATTEMPTS - 1:
+                raise
+            # A transação foi desfeita; tentar de novo como nova reserva
+            booking.pk = None
+            booking._state.adding = True
+            time.sleep(random.uniform(0, 0.01 * 2 ** attempt))
@@ -0,0 +1,98 @@
+"""GET condicional (ETag/Last-Modified) para as páginas públicas dos negócios.
+
+O validador sai de uma única consulta, sem renderizar nada: no detalhe, o
+maior updated_at entre o negócio, suas fotos, horários e avaliações; nas
+listagens, o maior updated_at e o total de negócios e de categorias (o filtro
+de categorias lista também as que ainda não têm negócios). Exclusões e alterações feitas com update() (fotos, horários,
+plano, nota média, miniaturas, categoria) tocam Business.updated_at pelos
+sinais, então o validador muda sempre que o HTML mudaria.
+
+Só visitantes anônimos sem mensagens pendentes recebem 304: para usuários
+logados a página tem partes pessoais (menu, notificações, avaliação própria)
+e é marcada como privada. As respostas anônimas saem com
+"Cache-Control: public, max-age=0, must-revalidate" e "Vary: Cookie", para
+que um proxy reverso guarde a página e a revalide a cada acesso.
+"""
+import hashlib
+from functools import wraps
+
+from django.contrib import messages
+from django.db.models import Count, Max, OuterRef, Subquery, Value
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .models import Business, BusinessCategory, BusinessHours, BusinessPhoto, Review
+
+
+def touch_businesses(business_ids):
+    """Marca negócios como alterados quando a mudança não passa por Business.save()"""
+    Business.objects.filter(pk__in=list(business_ids)).update(updated_at=timezone.now())
+
+
+def _latest(model):
+    return Subquery(model.objects.filter(business=OuterRef('pk')).order_by('-updated_at').values('updated_at')[:1])
+
+
+def _etag(*parts):
+    return quote_etag(hashlib.md5(repr(parts).encode()).hexdigest())
+
+
+def detail_validators(request, business_id):
+    """(etag, última alteração) da página de detalhes, ou None se o negócio não existe"""
+    row = (Business.objects.filter(pk=business_id, is_active=True)
+           .annotate(photos_at=_latest(BusinessPhoto), hours_at=_latest(BusinessHours), reviews_at=_latest(Review))
+           .values_list('updated_at', 'photos_at', 'hours_at', 'reviews_at')
+           .first())
+    if row is None:
+        return None
+    last_modified = max(value for value in row if value is not None)
+    return _etag(business_id, last_modified.isoformat()), last_modified
+
+
+def listing_validators(request):
+    """(etag, última alteração) das listagens; o etag inclui os filtros e o cursor da URL"""
+    categories = BusinessCategory.objects.order_by().values(all=Value(1))
+    row = Business.objects.order_by().aggregate(
+        last_modified=Max('updated_at'), total=Count('id'),
+        categories=Max(Subquery(categories.annotate(total=Count('id')).values('total'))),
+        categories_at=Max(Subquery(categories.annotate(last=Max('updated_at')).values('last'))))
+    if row['last_modified'] is None:
+        return None
+    last_modified = max(value for value in (row['last_modified'], row['categories_at']) if value is not None)
+    etag = _etag(request.get_full_path(), last_modified.isoformat(), row['total'], row['categories'])
+    return etag, last_modified
+
+
+def _is_public(request):
+    return (request.method in ('GET', 'HEAD') and not request.user.is_authenticated
+            and not len(messages.get_messages(request)))
+
+
+def conditional_page(validators):
+    """Responde 304 quando o validador da página não mudou desde a cópia do cliente"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not _is_public(request):
+                response = view(request, *args, **kwargs)
+                patch_cache_control(response, private=True)
+                patch_vary_headers(response, ['Cookie'])
+                return response
+
+            result = validators(request, *args, **kwargs)
+            if result is None:
+                return view(request, *args, **kwargs)
+            etag, last_modified = result
+            timestamp = int(last_modified.timestamp())
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response.headers.setdefault('ETag', etag)
+                response.headers.setdefault('Last-Modified', http_date(timestamp))
+                patch_cache_control(response, public=True, max_age=0, must_revalidate=True)
+            patch_vary_headers(response, ['Cookie'])
+            return response
+        return wrapper
+    return decorator
@@ -1,4 +1,5 @@
 from django.conf import settings
+from . import notifications as notification_counters
 
 
 def google_maps_api_key(request):
@@ -9,16 +10,10 @@ def google_maps_api_key(request):
 
 def notifications(request):
     """Make notifications available in all templates"""
-    if hasattr(request, 'user') and request.user.is_authenticated:
-        # Get notifications for business owners
-        try:
-            # Agora um usuário pode ter múltiplos negócios
-            if hasattr(request.user, 'businesses'):
-                # Contar notificações de todos os negócios do usuário
-                unread_notifications = 0
-                for business in request.user.businesses.all():
-                    unread_notifications += business.notifications.filter(is_read=False).count()
-                return {'unread_notifications': unread_notifications}
-        except:
-            pass
-    return {'unread_notifications': 0}
\ No newline at end of file
+    if not (hasattr(request, 'user') and request.user.is_authenticated):
+        return {'unread_notifications': 0}
+    
+    # Calcular uma única vez por requisição (contador em cache por usuário)
+    if not hasattr(request, '_unread_notifications'):
+        request._unread_notifications = notification_counters.unread_count(request.user)
+    return {'unread_notifications': request._unread_notifications}
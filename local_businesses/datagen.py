@@ -0,0 +1,402 @@
+"""Massa de dados sintética em escala (comando generate_data).
+
+Gera usuários (com Profile), negócios com plano, fotos, horários, grade de
+reservas, avaliações, reservas e notificações em lotes de batch_size negócios,
+uma transação por lote. Nada é acumulado entre lotes além dos ids dos
+usuários, guardados em um array de 8 bytes por usuário, então a memória não
+cresce com o tamanho da massa. Com a mesma semente e os mesmos parâmetros o
+conteúdo gerado é sempre o mesmo.
+
+- Coordenadas: cada negócio cai em uma das CITIES, sorteada pelo peso
+  (população), e parte deles em bairros mais densos dentro da cidade.
+- Avaliações por negócio seguem uma distribuição de Zipf: P(k) ~ 1/(k+1)^s,
+  então a maioria tem poucas ou nenhuma e alguns concentram milhares. As
+  reservas acompanham a popularidade.
+- As fotos apontam para algumas imagens geradas uma vez (PLACEHOLDERS), já com
+  as miniaturas prontas; o armazenamento endereçado por conteúdo faz todas as
+  fotos compartilharem os mesmos arquivos.
+
+Os negócios são gravados com bulk_create (os ids voltam do INSERT). As tabelas
+volumosas usam RowWriter, que grava tuplas com executemany: instanciar e
+preparar um modelo por linha no bulk_create custa mais que o próprio INSERT.
+Nenhum dos dois dispara sinais, então os agregados de avaliação e os
+contadores de BusinessStats são calculados durante a geração e o índice de
+busca é reconstruído ao final.
+"""
+import itertools
+import random
+import time
+from array import array
+from datetime import date, time as dt_time, timedelta
+from decimal import Decimal
+from io import BytesIO
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+from django.utils.text import slugify
+from PIL import Image, ImageDraw
+
+from accounts.models import Profile
+from . import fragments, geo, sample_data, search, thumbnails
+from .models import (Booking, Business, BusinessCategory, BusinessHours, BusinessPhoto, BusinessPlan,
+                     BusinessStats, Notification, Review, TimeSlot)
+
+# (cidade, latitude, longitude, peso, desvio em graus)
+CITIES = [
+    ('São Paulo', -23.5505, -46.6333, 12.3, 0.12),
+    ('Rio de Janeiro', -22.9068, -43.1729, 6.7, 0.10),
+    ('Brasília', -15.7939, -47.8828, 3.0, 0.08),
+    ('Salvador', -12.9714, -38.5014, 2.9, 0.06),
+    ('Fortaleza', -3.7319, -38.5267, 2.7, 0.06),
+    ('Belo Horizonte', -19.9167, -43.9345, 2.5, 0.06),
+    ('Manaus', -3.1190, -60.0217, 2.2, 0.06),
+    ('Curitiba', -25.4284, -49.2733, 1.9, 0.05),
+    ('Recife', -8.0476, -34.8770, 1.6, 0.05),
+    ('Goiânia', -16.6869, -49.2648, 1.5, 0.05),
+    ('Belém', -1.4558, -48.4902, 1.5, 0.05),
+    ('Porto Alegre', -30.0346, -51.2177, 1.4, 0.05),
+    ('São Luís', -2.5307, -44.3068, 1.1, 0.04),
+    ('Maceió', -9.6658, -35.7353, 1.0, 0.04),
+    ('Natal', -5.7945, -35.2110, 0.9, 0.04),
+    ('João Pessoa', -7.1195, -34.8450, 0.8, 0.04),
+    ('Florianópolis', -27.5954, -48.5480, 0.5, 0.04),
+]
+NEIGHBORHOODS_PER_CITY = 8
+NEIGHBORHOOD_SHARE = 0.6
+NEIGHBORHOOD_SPREAD = 0.006
+
+# Prefixos dos nomes por categoria de sample_data.CATEGORIES
+NAME_PREFIXES = {
+    'Restaurantes': ['Restaurante', 'Bistrô', 'Cantina', 'Lanchonete', 'Pizzaria', 'Churrascaria'],
+    'Hotéis': ['Hotel', 'Pousada', 'Hostel', 'Flat'],
+    'Lojas': ['Loja', 'Empório', 'Ateliê', 'Mercado', 'Boutique'],
+    'Serviços': ['Salão', 'Oficina', 'Clínica', 'Estúdio', 'Lavanderia'],
+    'Turismo': ['Passeios', 'Agência', 'Guia', 'Trilhas'],
+}
+SERVICE_CATEGORIES = {'Serviços', 'Turismo'}
+NAME_SUFFIXES = ['do Mar', 'Sol Nascente', 'Central', 'da Praça', 'Bela Vista', 'São Jorge', 'Boa Sorte',
+                 'das Flores', 'Dois Irmãos', 'Estrela', 'do Porto', 'Primavera', 'Jardim', 'Aurora']
+STREETS = ['Rua das Flores', 'Av. Brasil', 'Rua da Aurora', 'Av. Beira Mar', 'Rua XV de Novembro',
+           'Rua do Comércio', 'Av. Getúlio Vargas', 'Rua São José', 'Rua Sete de Setembro', 'Av. Atlântica']
+FIRST_NAMES = ['Ana', 'João', 'Maria', 'Pedro', 'Lucas', 'Juliana', 'Carlos', 'Fernanda', 'Rafael', 'Beatriz',
+               'Gabriel', 'Camila', 'Paulo', 'Larissa', 'Marcos', 'Patrícia']
+LAST_NAMES = ['Silva', 'Souza', 'Oliveira', 'Santos', 'Lima', 'Pereira', 'Costa', 'Ferreira', 'Almeida',
+              'Ribeiro', 'Carvalho', 'Gomes']
+COMMENTS = ['Ótimo atendimento!', 'Voltarei com certeza.', 'Preço justo.', 'Poderia ser melhor.',
+            'Ambiente agradável.', 'Demorou um pouco.', 'Recomendo.', '']
+
+PLAN_WEIGHTS = {'free': 70, 'pro': 20, 'premium': 10}
+# Perfis de notas (pesos de 1 a 5 estrelas): bem avaliado, mediano, mal avaliado
+RATING_PROFILES = [[1, 1, 2, 6, 10], [1, 2, 5, 5, 2], [6, 4, 3, 1, 1]]
+OPENING_DAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday']
+BOOKING_WINDOW_DAYS = 90
+HISTORY_DAYS = 3 * 365
+
+PLACEHOLDERS = 8
+PLACEHOLDER_SIZE = (1200, 800)
+
+DEFAULT_PASSWORD = 'senha123'
+
+
+class RowWriter:
+    """INSERT em lote de tuplas, sem instanciar modelos
+
+    Cada linha traz os valores de fields, na mesma ordem; as demais colunas
+    recebem o default do campo (ou o momento da criação do writer, nos campos
+    auto_now). Valores de data e hora são convertidos para o banco uma vez por
+    valor distinto.
+    """
+
+    def __init__(self, model, fields, batch_size):
+        meta = model._meta
+        self.fields = [meta.get_field(name) for name in fields]
+        now = timezone.now()
+        defaults = {}
+        for field in meta.concrete_fields:
+            if field is meta.auto_field or field in self.fields:
+                continue
+            auto = getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+            value = now if auto else field.get_default()
+            defaults[field] = field.get_db_prep_save(value, connection)
+        self.defaults = tuple(defaults.values())
+        self.converters = [self._converter(field) for field in self.fields]
+
+        quote = connection.ops.quote_name
+        columns = [field.column for field in self.fields] + [field.column for field in defaults]
+        self.sql = (f'INSERT INTO {quote(meta.db_table)} ({", ".join(quote(c) for c in columns)}) '
+                    f'VALUES ({", ".join(["%s"] * len(columns))})')
+        self.batch_size = batch_size
+        self.rows = []
+        self.count = 0
+
+    @staticmethod
+    def _converter(field):
+        if field.get_internal_type() not in ('DateField', 'TimeField', 'DateTimeField', 'JSONField'):
+            return None
+        cache = {}
+
+        def convert(value):
+            key = repr(value)
+            if key not in cache:
+                cache[key] = field.get_db_prep_save(value, connection)
+            return cache[key]
+        return convert
+
+    def add(self, *values):
+        self.rows.append(tuple(convert(value) if convert else value
+                               for convert, value in zip(self.converters, values)) + self.defaults)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            with connection.cursor() as cursor:
+                cursor.executemany(self.sql, self.rows)
+            self.count += len(self.rows)
+            self.rows = []
+
+
+def zipf_sampler(rng, maximum, exponent):
+    """Função que sorteia um inteiro em [0, maximum] com P(k) proporcional a 1/(k+1)^exponent"""
+    population = range(maximum + 1)
+    cum_weights = list(itertools.accumulate((k + 1) ** -exponent for k in population))
+    return lambda: rng.choices(population, cum_weights=cum_weights)[0]
+
+
+def coordinate_sampler(rng):
+    """Função que sorteia (latitude, longitude, cidade) agrupados por cidade e bairro"""
+    weights = [city[3] for city in CITIES]
+    neighborhoods = [
+        [(rng.gauss(lat, spread), rng.gauss(lng, spread)) for _ in range(NEIGHBORHOODS_PER_CITY)]
+        for _, lat, lng, _, spread in CITIES
+    ]
+
+    def sample():
+        index = rng.choices(range(len(CITIES)), weights)[0]
+        name, lat, lng, _, spread = CITIES[index]
+        if rng.random() < NEIGHBORHOOD_SHARE:
+            (lat, lng), spread = rng.choice(neighborhoods[index]), NEIGHBORHOOD_SPREAD
+        return rng.gauss(lat, spread), rng.gauss(lng, spread), name
+    return sample
+
+
+def placeholder_photos(rng, count=PLACEHOLDERS):
+    """[(nome da imagem, larguras das miniaturas)] de imagens geradas e gravadas uma vez"""
+    field = BusinessPhoto._meta.get_field('image')
+    photos = []
+    for i in range(count):
+        image = Image.new('RGB', PLACEHOLDER_SIZE, tuple(rng.randrange(256) for _ in range(3)))
+        draw = ImageDraw.Draw(image)
+        for _ in range(6):
+            x, y = rng.randrange(PLACEHOLDER_SIZE[0]), rng.randrange(PLACEHOLDER_SIZE[1])
+            radius = rng.randint(60, 300)
+            draw.ellipse((x - radius, y - radius, x + radius, y + radius),
+                         fill=tuple(rng.randrange(256) for _ in range(3)))
+        buffer = BytesIO()
+        image.save(buffer, 'JPEG', quality=85)
+        name = field.storage.save(field.generate_filename(None, f'placeholder-{i}.jpg'),
+                                  ContentFile(buffer.getvalue()))
+        photos.append((name, thumbnails.generate(BusinessPhoto(image=name))))
+    return photos
+
+
+def _past(rng, now):
+    # Granularidade de hora: poucos valores distintos para o RowWriter converter
+    return now - timedelta(days=rng.randrange(HISTORY_DAYS), hours=rng.randrange(24))
+
+
+def create_users(count, prefix, rng, batch_size, password=DEFAULT_PASSWORD):
+    """Cria os usuários e seus perfis; retorna os ids em um array compacto, na ordem dos nomes"""
+    # Um único hash (com sal derivado da semente) vale para todos
+    password = make_password(password, salt=f'datagen{rng.randrange(10 ** 9)}')
+    now = timezone.now()
+    users = RowWriter(User, ['username', 'email', 'first_name', 'last_name', 'password', 'date_joined'],
+                      batch_size)
+    profiles = RowWriter(Profile, ['user_id'], batch_size)
+    ids = array('q')
+    for start in range(0, count, batch_size):
+        usernames = [f'{prefix}{i}' for i in range(start, min(start + batch_size, count))]
+        with transaction.atomic():
+            for username in usernames:
+                users.add(username, f'{username}@example.com', rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES),
+                          password, _past(rng, now))
+            users.flush()
+            created = dict(User.objects.filter(username__in=usernames).values_list('username', 'id'))
+            for username in usernames:
+                ids.append(created[username])
+                profiles.add(created[username])
+            profiles.flush()
+    return ids
+
+
+def _business(rng, owner_id, categories, coordinates):
+    category = rng.choice(categories)
+    lat, lng, city = coordinates()
+    lat, lng = Decimal(f'{lat:.6f}'), Decimal(f'{lng:.6f}')
+    grid_row, grid_col = geo.grid_cell(lat, lng)
+    name = f'{rng.choice(NAME_PREFIXES.get(category.name, ["Negócio"]))} {rng.choice(NAME_SUFFIXES)}'
+    domain = slugify(name).replace('-', '')
+    return Business(
+        user_id=owner_id, name=name, category=category,
+        description=f'{name} em {city}. {rng.choice(COMMENTS) or "Venha conhecer."}',
+        business_type='service' if category.name in SERVICE_CATEGORIES else 'commerce',
+        address=f'{rng.choice(STREETS)}, {rng.randint(1, 2000)} - {city}',
+        latitude=lat, longitude=lng, grid_row=grid_row, grid_col=grid_col,
+        phone=f'({rng.randint(11, 99)}) 3{rng.randint(0, 999):03d}-{rng.randint(0, 9999):04d}',
+        whatsapp=f'55{rng.randint(11, 99)}9{rng.randint(0, 99999999):08d}',
+        email=f'contato@{domain}.com.br', website=f'https://www.{domain}.com.br',
+        is_active=rng.random() < 0.95,
+    )
+
+
+def _reviews(rng, business, user_ids, count, now):
+    """[(user_id, nota, comentário, data)] de avaliadores distintos; preenche os agregados em business"""
+    weights = rng.choice(RATING_PROFILES)
+    # Sortear em um range não materializa a lista de usuários
+    reviews = [
+        (user_ids[index], rng.choices((1, 2, 3, 4, 5), weights)[0], rng.choice(COMMENTS), _past(rng, now))
+        for index in rng.sample(range(len(user_ids)), min(count, len(user_ids)))
+    ]
+    business.review_count = len(reviews)
+    business.rating_sum = sum(review[1] for review in reviews)
+    business.avg_rating = business.rating_sum / business.review_count if reviews else 0
+    return reviews
+
+
+def _write_related(rng, writers, business, plan_type, reviews, user_ids, photos, today, now):
+    """Grava as linhas ligadas a um negócio já inserido"""
+    pk = business.pk
+    options = sample_data.plan_options(plan_type)
+    writers[BusinessPlan].add(pk, *options.values())
+
+    photo_count = rng.randint(0, options['max_photos'])
+    for i in range(photo_count):
+        name, widths = rng.choice(photos)
+        writers[BusinessPhoto].add(pk, name, i == 0, widths, now)
+
+    opens = dt_time(rng.choice([6, 7, 8, 9, 10]))
+    closes = dt_time(rng.choice([17, 18, 19, 20, 22]))
+    for day, _ in BusinessHours.DAYS_OF_WEEK:
+        writers[BusinessHours].add(pk, day, opens, closes, day == 'sunday')
+    if business.business_type == 'service':
+        capacity = rng.choice([None, 2, 5])
+        for day in OPENING_DAYS:
+            writers[TimeSlot].add(pk, day, opens, closes, capacity)
+
+    for user_id, rating, comment, created_at in reviews:
+        writers[Review].add(pk, user_id, rating, comment, created_at, created_at)
+    unread = 0
+    # As notificações das avaliações mais recentes
+    for user_id, rating, _, created_at in sorted(reviews, key=lambda review: review[3])[-20:]:
+        is_read = rng.random() < 0.8
+        unread += not is_read
+        writers[Notification].add(pk, user_id, 'review', 'Nova avaliação', f'Avaliação de {rating} estrelas.',
+                                  is_read, created_at)
+
+    bookings = rng.randint(0, 3 + len(reviews) // 2)
+    pending = 0
+    for _ in range(bookings):
+        day = today + timedelta(days=rng.randint(-BOOKING_WINDOW_DAYS, BOOKING_WINDOW_DAYS))
+        if day < today:
+            status = rng.choices(['completed', 'cancelled'], [9, 1])[0]
+        else:
+            status = rng.choices(['pending', 'confirmed', 'cancelled'], [3, 6, 1])[0]
+        pending += status == 'pending'
+        user_id = user_ids[rng.randrange(len(user_ids))]
+        created_at = now - timedelta(days=rng.randint(max(0, (today - day).days), BOOKING_WINDOW_DAYS * 2))
+        writers[Booking].add(pk, user_id, 'Atendimento', day,
+                             dt_time(rng.randint(opens.hour, closes.hour - 1), rng.choice([0, 30])),
+                             rng.randint(1, 4), status, created_at, created_at)
+        if status == 'pending' or rng.random() < 0.1:
+            is_read = status != 'pending' and rng.random() < 0.9
+            unread += not is_read
+            writers[Notification].add(pk, user_id, 'booking', 'Nova reserva', f'Reserva para {day:%d/%m/%Y}.',
+                                      is_read, created_at)
+
+    writers[BusinessStats].add(pk, photo_count, bookings, pending, unread)
+
+
+def _writers(batch_size):
+    return {
+        BusinessPlan: RowWriter(BusinessPlan, ['business', *sample_data.plan_options('free')], batch_size),
+        BusinessPhoto: RowWriter(BusinessPhoto, ['business', 'image', 'is_primary', 'thumbnail_widths',
+                                                 'thumbnails_generated_at'], batch_size),
+        BusinessHours: RowWriter(BusinessHours, ['business', 'day_of_week', 'open_time', 'close_time', 'is_closed'],
+                                 batch_size),
+        TimeSlot: RowWriter(TimeSlot, ['business', 'day_of_week', 'start_time', 'end_time', 'capacity'], batch_size),
+        Review: RowWriter(Review, ['business', 'user', 'rating', 'comment', 'created_at', 'updated_at'], batch_size),
+        Booking: RowWriter(Booking, ['business', 'user', 'service_name', 'booking_date', 'booking_time',
+                                     'number_of_people', 'status', 'created_at', 'updated_at'], batch_size),
+        Notification: RowWriter(Notification, ['business', 'user', 'notification_type', 'title', 'message',
+                                               'is_read', 'created_at'], batch_size),
+        BusinessStats: RowWriter(BusinessStats, ['business', 'photo_count', 'booking_count', 'pending_booking_count',
+                                                 'unread_notification_count'], batch_size),
+    }
+
+
+# Com DEBUG o Django guardaria o SQL de cada lote em connection.queries
+@override_settings(DEBUG=False)
+def generate(users=100000, businesses=20000, seed=0, batch_size=1000, prefix='gen', max_reviews=2000,
+             zipf_exponent=1.8, placeholders=PLACEHOLDERS, progress=None):
+    """Gera a massa de dados; retorna o total de linhas por modelo
+
+    progress(totais) é chamado ao fim de cada lote.
+    """
+    rng = random.Random(seed)
+    today = date.today()
+    now = timezone.now()
+    started = time.perf_counter()
+
+    categories = []
+    for data in sample_data.CATEGORIES:
+        category, _ = BusinessCategory.objects.get_or_create(name=data['name'], defaults={'icon': data['icon']})
+        categories.append(category)
+    photos = placeholder_photos(rng, placeholders)
+    user_ids = create_users(users, prefix, rng, batch_size)
+
+    writers = _writers(batch_size)
+    names = {BusinessPhoto: 'photos', BusinessHours: 'hours', TimeSlot: 'time_slots', Review: 'reviews',
+             Booking: 'bookings', Notification: 'notifications'}
+
+    def totals(business_count):
+        counts = {'users': len(user_ids), 'businesses': business_count}
+        counts.update((name, writers[model].count) for model, name in names.items())
+        return counts
+
+    if progress:
+        progress(dict(totals(0), seconds=round(time.perf_counter() - started, 1)))
+
+    review_count = zipf_sampler(rng, max_reviews, zipf_exponent)
+    coordinates = coordinate_sampler(rng)
+    plan_types, plan_weights = list(PLAN_WEIGHTS), list(PLAN_WEIGHTS.values())
+    first_id = None
+    for start in range(0, businesses, batch_size):
+        batch = []
+        for i in range(start, min(start + batch_size, businesses)):
+            # Donos em sequência: cada usuário tem no máximo um negócio enquanto houver usuários
+            business = _business(rng, user_ids[i % len(user_ids)], categories, coordinates)
+            reviews = _reviews(rng, business, user_ids, review_count(), now)
+            batch.append((business, rng.choices(plan_types, plan_weights)[0], reviews))
+
+        with transaction.atomic():
+            Business.objects.bulk_create([business for business, _, _ in batch])
+            for business, plan_type, reviews in batch:
+                _write_related(rng, writers, business, plan_type, reviews, user_ids, photos, today, now)
+            for writer in writers.values():
+                writer.flush()
+        first_id = first_id or batch[0][0].pk
+        if progress:
+            progress(dict(totals(start + len(batch)), seconds=round(time.perf_counter() - started, 1)))
+
+    if first_id is not None:
+        with transaction.atomic():
+            search.get_backend().rebuild(
+                Business.objects.filter(pk__gte=first_id).select_related('category').iterator(chunk_size=batch_size))
+        fragments.invalidate('categories')
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    return totals(businesses)
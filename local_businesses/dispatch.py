@@ -0,0 +1,182 @@
+"""Entrega de notificações fora do ciclo da requisição.
+
+As views apenas gravam a notificação na fila (QueuedNotification), uma única
+inserção que participa da transação da requisição. O comando
+process_notifications consome a fila em lotes e entrega cada item pelos canais
+configurados em NOTIFICATION_CHANNELS (in-app, e-mail, ...).
+
+Rajadas do mesmo tipo para o mesmo negócio (ex.: 50 avaliações em um minuto)
+viram uma única notificação de resumo: os itens de DIGEST_TYPES esperam
+NOTIFICATION_DIGEST_WINDOW segundos, contados a partir do mais antigo do
+grupo, antes de serem entregues. Os grupos ainda dentro da janela ficam fora da
+consulta do lote, para não ocuparem o lugar dos itens que já podem sair.
+"""
+import logging
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import send_mass_mail
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import notifications as notification_counters, stats
+from .models import Notification, QueuedNotification
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHANNELS = ['local_businesses.dispatch.InAppChannel']
+DEFAULT_DIGEST_WINDOW = 60
+
+# Tipos agrupados em resumo e o título usado quando há mais de um item
+DIGEST_TYPES = {
+    'review': '{count} novas avaliações',
+    'booking': '{count} novas reservas',
+}
+
+# Itens listados na mensagem do resumo
+DIGEST_PREVIEW = 5
+
+
+def enqueue(business, notification_type, title, message, user=None):
+    """Coloca uma notificação na fila de entrega"""
+    return QueuedNotification.objects.create(
+        business=business,
+        user=user,
+        notification_type=notification_type,
+        title=title,
+        message=message,
+    )
+
+
+class BaseChannel:
+    # Canais atômicos rodam na transação que marca os itens como processados;
+    # os demais, depois do commit, e uma falha neles não devolve itens à fila
+    atomic = False
+
+    def send(self, notifications):
+        raise NotImplementedError
+
+
+class InAppChannel(BaseChannel):
+    """Grava as notificações exibidas no painel do negócio"""
+
+    atomic = True
+
+    def send(self, notifications):
+        Notification.objects.bulk_create(notifications)
+        # bulk_create não dispara post_save; atualizar os contadores de não lidas
+        unread = Counter(n.business_id for n in notifications if not n.is_read)
+        for business_id, count in unread.items():
+            stats.apply_delta(business_id, unread_notification_count=count)
+        business_ids = set(unread)
+        transaction.on_commit(lambda: notification_counters.invalidate_for_businesses(business_ids))
+
+
+class EmailChannel(BaseChannel):
+    """Envia cada notificação por e-mail ao negócio (ou ao dono, se o negócio não tiver e-mail)"""
+
+    def send(self, notifications):
+        messages = []
+        for notification in notifications:
+            business = notification.business
+            recipient = business.email or business.user.email
+            if recipient:
+                messages.append((notification.title, notification.message, None, [recipient]))
+        if messages:
+            send_mass_mail(messages)
+
+
+_channels = None
+
+
+def get_channels():
+    global _channels
+    if _channels is None:
+        paths = getattr(settings, 'NOTIFICATION_CHANNELS', DEFAULT_CHANNELS)
+        _channels = [import_string(path)() for path in paths]
+    return _channels
+
+
+def build_notification(group):
+    """Notificação a entregar para um grupo de itens da fila"""
+    first = group[0]
+    if len(group) == 1:
+        return Notification(business=first.business, user=first.user, notification_type=first.notification_type,
+                            title=first.title, message=first.message)
+    lines = [item.message for item in group[:DIGEST_PREVIEW]]
+    if len(group) > DIGEST_PREVIEW:
+        lines.append(f'... e mais {len(group) - DIGEST_PREVIEW}.')
+    users = {item.user_id for item in group}
+    return Notification(
+        business=first.business,
+        user=first.user if len(users) == 1 else None,
+        notification_type=first.notification_type,
+        title=DIGEST_TYPES[first.notification_type].format(count=len(group)),
+        message='\n'.join(lines),
+    )
+
+
+def _group(items):
+    groups = {}
+    for item in items:
+        if item.notification_type in DIGEST_TYPES:
+            key = (item.business_id, item.notification_type)
+        else:
+            key = item.pk
+        groups.setdefault(key, []).append(item)
+    return list(groups.values())
+
+
+def _deliver_after_commit(channel, notifications):
+    try:
+        channel.send(notifications)
+    except Exception:
+        logger.exception('Falha ao entregar %d notificações por %s', len(notifications), type(channel).__name__)
+
+
+def process_batch(batch_size=1000, flush=False):
+    """Entrega um lote da fila; retorna quantos itens foram processados.
+
+    Com flush, os resumos são entregues sem esperar a janela de agrupamento.
+    """
+    now = timezone.now()
+    window = timedelta(seconds=getattr(settings, 'NOTIFICATION_DIGEST_WINDOW', DEFAULT_DIGEST_WINDOW))
+
+    with transaction.atomic():
+        pending = QueuedNotification.objects.filter(processed_at__isnull=True).select_related('business__user')
+        if not flush:
+            # Resumos só saem quando o item mais antigo do grupo passou da janela
+            ripe = QueuedNotification.objects.filter(
+                processed_at__isnull=True, business_id=OuterRef('business_id'),
+                notification_type=OuterRef('notification_type'), created_at__lte=now - window,
+            )
+            pending = pending.filter(~Q(notification_type__in=DIGEST_TYPES) | Exists(ripe))
+        if connection.features.has_select_for_update_skip_locked:
+            # Vários workers podem consumir a fila sem pegar os mesmos itens
+            pending = pending.select_for_update(skip_locked=True, of=('self',))
+        items = list(pending.order_by('id')[:batch_size])
+
+        processed = []
+        notifications = []
+        for group in _group(items):
+            processed.extend(item.pk for item in group)
+            notifications.append(build_notification(group))
+
+        if not processed:
+            return 0
+        QueuedNotification.objects.filter(pk__in=processed).update(processed_at=now)
+        for channel in get_channels():
+            if channel.atomic:
+                channel.send(notifications)
+            else:
+                transaction.on_commit(lambda channel=channel: _deliver_after_commit(channel, notifications))
+    return len(processed)
+
+
+def purge_processed(older_than):
+    """Remove da fila os itens processados antes de older_than"""
+    deleted, _ = QueuedNotification.objects.filter(processed_at__lt=older_than).delete()
+    return deleted
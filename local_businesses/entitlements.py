@@ -0,0 +1,100 @@
+"""Limites de cada plano e os limites efetivos de um usuário.
+
+PLAN_LIMITS é a única definição dos limites free/pro/premium; apply_plan()
+copia esses valores para um BusinessPlan. Os limites do usuário seguem o
+melhor plano entre os seus negócios e saem de uma única consulta, guardada
+no cache por usuário (invalidada pelos sinais de Business e BusinessPlan) e
+memorizada na requisição.
+"""
+from django.core.cache import cache
+
+from .models import Business
+
+PLAN_LIMITS = {
+    'free': {
+        'max_photos': 1,
+        'max_businesses': 1,
+        'can_show_menu': False,
+        'can_show_website': False,
+        'can_show_whatsapp': False,
+        'is_featured': False,
+    },
+    'pro': {
+        'max_photos': 5,
+        'max_businesses': 3,
+        'can_show_menu': False,
+        'can_show_website': True,
+        'can_show_whatsapp': True,
+        'is_featured': False,
+    },
+    'premium': {
+        'max_photos': 10,
+        'max_businesses': 10,
+        'can_show_menu': True,
+        'can_show_website': True,
+        'can_show_whatsapp': True,
+        'is_featured': True,
+    },
+}
+
+# Do plano mais básico ao mais completo
+PLAN_ORDER = ('free', 'pro', 'premium')
+
+CACHE_TIMEOUT = 60 * 15
+
+
+def apply_plan(business_plan, plan_type):
+    """Define o tipo e os limites do plano (sem salvar)"""
+    business_plan.plan_type = plan_type
+    for field, value in PLAN_LIMITS[plan_type].items():
+        setattr(business_plan, field, value)
+    return business_plan
+
+
+class Entitlements:
+    def __init__(self, plan_type, business_count):
+        self.plan_type = plan_type
+        self.business_count = business_count
+
+    @property
+    def limits(self):
+        return PLAN_LIMITS[self.plan_type]
+
+    @property
+    def max_businesses(self):
+        return self.limits['max_businesses']
+
+    @property
+    def can_add_business(self):
+        return self.business_count < self.max_businesses
+
+
+def _cache_key(user_id):
+    return f'entitlements:{user_id}'
+
+
+def compute(user_id):
+    """(melhor plano, número de negócios) do usuário, em uma consulta"""
+    plan_types = list(Business.objects.filter(user_id=user_id).values_list('businessplan__plan_type', flat=True))
+    best = max((PLAN_ORDER.index(p) for p in plan_types if p in PLAN_ORDER), default=0)
+    return PLAN_ORDER[best], len(plan_types)
+
+
+def for_user(user):
+    key = _cache_key(user.pk)
+    cached = cache.get(key)
+    if cached is None:
+        cached = compute(user.pk)
+        cache.set(key, cached, CACHE_TIMEOUT)
+    return Entitlements(*cached)
+
+
+def for_request(request):
+    """Limites do usuário da requisição, calculados uma vez por requisição"""
+    if not hasattr(request, '_entitlements'):
+        request._entitlements = for_user(request.user)
+    return request._entitlements
+
+
+def invalidate(user_id):
+    cache.delete(_cache_key(user_id))
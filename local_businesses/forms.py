@@ -67,8 +67,8 @@ class BookingForm(forms.ModelForm):
             'service_name': forms.TextInput(attrs={'class': 'form-control'}),
             'booking_date': forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
             'booking_time': forms.TimeInput(attrs={'class': 'form-control', 'type': 'time'}),
-            'duration': forms.NumberInput(attrs={'class': 'form-control'}),
-            'number_of_people': forms.NumberInput(attrs={'class': 'form-control'}),
+            'duration': forms.NumberInput(attrs={'class': 'form-control', 'min': 1}),
+            'number_of_people': forms.NumberInput(attrs={'class': 'form-control', 'min': 1}),
             'special_requests': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
         }
     
@@ -80,11 +80,12 @@ class BookingForm(forms.ModelForm):
 class TimeSlotForm(forms.ModelForm):
     class Meta:
         model = TimeSlot
-        fields = ['day_of_week', 'start_time', 'end_time', 'duration', 'is_active']
+        fields = ['day_of_week', 'start_time', 'end_time', 'duration', 'capacity', 'is_active']
         widgets = {
             'day_of_week': forms.Select(attrs={'class': 'form-control'}),
             'start_time': forms.TimeInput(attrs={'class': 'form-control', 'type': 'time'}),
             'end_time': forms.TimeInput(attrs={'class': 'form-control', 'type': 'time'}),
             'duration': forms.NumberInput(attrs={'class': 'form-control'}),
+            'capacity': forms.NumberInput(attrs={'class': 'form-control', 'min': 1}),
             'is_active': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
         }
\ No newline at end of file
@@ -0,0 +1,78 @@
+"""Versões dos fragmentos de template cacheados nas páginas públicas.
+
+Os templates usam a tag {% cache %} do Django com a versão do objeto entre os
+parâmetros (ex.: cartão e avaliações de um negócio), então invalidar é trocar
+a versão: só os fragmentos daquele objeto deixam de ser encontrados e os
+antigos expiram sozinhos. Os sinais trocam a versão depois do commit, para que
+nenhuma requisição guarde o conteúdo antigo com a versão nova.
+
+Versões de negócio: mudam com o negócio, seu plano, fotos, horários e
+avaliações. Versões globais (sem pk): 'categories' e 'community'.
+
+Cada versão é o time_ns da troca. Uma página lida da réplica nos
+REPLICA_PIN_SECONDS seguintes pode não ter a alteração ainda, então guarda o
+fragmento em uma chave à parte (cache_key); a chave definitiva só é gravada
+depois desse prazo ou por quem lê do primário.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, router, transaction
+
+from .models import Business
+
+# Segundos que um fragmento fica no cache (usado nos templates)
+CACHE_TIMEOUT = 60 * 10
+
+
+def _version_key(kind, pk):
+    return f'fragment_version:{kind}:{pk}'
+
+
+def version(kind, pk=''):
+    # Uma versão nova começa em time_ns para não repetir uma que foi descartada do cache
+    return cache.get_or_set(_version_key(kind, pk), time.time_ns, None)
+
+
+def attach_versions(businesses):
+    """Carrega as versões de vários negócios em uma ida ao cache (atributo cache_version)"""
+    businesses = list(businesses)
+    keys = {_version_key('business', business.pk): business for business in businesses}
+    found = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys.keys() - found.keys()}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    for key, business in keys.items():
+        business.cache_version = found[key]
+    return businesses
+
+
+def _reading_replica():
+    return router.db_for_read(Business) != DEFAULT_DB_ALIAS
+
+
+def cache_key(value):
+    """Versão para a chave do {% cache %}, separada enquanto a réplica pode estar atrasada"""
+    if _reading_replica() and time.time_ns() - value < settings.REPLICA_PIN_SECONDS * 10 ** 9:
+        return f'{value}-replica'
+    return value
+
+
+def _bump(kind, pk):
+    # Sempre um time_ns novo (e não incr): cache_key usa o instante da troca
+    cache.set(_version_key(kind, pk), time.time_ns(), None)
+
+
+def invalidate(kind, pk=''):
+    transaction.on_commit(lambda: _bump(kind, pk))
+
+
+def invalidate_businesses(business_ids):
+    business_ids = list(business_ids)
+
+    def bump():
+        for business_id in business_ids:
+            _bump('business', business_id)
+    transaction.on_commit(bump)
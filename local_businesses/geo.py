@@ -0,0 +1,119 @@
+"""Busca por proximidade sobre Business.latitude/longitude.
+
+Os negócios são distribuídos em uma grade de células fixas (GRID_CELL_DEGREES)
+gravadas em Business.grid_row/grid_col a cada save. Uma consulta por raio
+converte o círculo em um retângulo (bounding box), filtra no SQL pelas células
+e pelas coordenadas do retângulo (usando o índice composto) e só então calcula
+a distância exata (haversine) para os candidatos.
+"""
+import math
+
+from . import pagination
+
+EARTH_RADIUS_KM = 6371.0088
+
+# ~5,5 km de latitude por célula
+GRID_CELL_DEGREES = 0.05
+
+DEFAULT_RADIUS_KM = 10
+MAX_RADIUS_KM = 200
+
+
+def grid_cell(lat, lng):
+    """Retorna a célula (linha, coluna) da grade para uma coordenada"""
+    if lat is None or lng is None:
+        return None, None
+    return (
+        math.floor(float(lat) / GRID_CELL_DEGREES),
+        math.floor(float(lng) / GRID_CELL_DEGREES),
+    )
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Distância em km entre dois pontos na superfície da Terra"""
+    lat1, lng1, lat2, lng2 = map(math.radians, (float(lat1), float(lng1), float(lat2), float(lng2)))
+    dlat = lat2 - lat1
+    dlng = lng2 - lng1
+    a = math.sin(dlat / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(lat, lng, radius_km):
+    """Retângulo (min_lat, max_lat, min_lng, max_lng) que contém o círculo"""
+    lat = float(lat)
+    lng = float(lng)
+    delta_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat = max(-90.0, lat - delta_lat)
+    max_lat = min(90.0, lat + delta_lat)
+
+    # Perto dos polos ou cruzando o antimeridiano, usar toda a faixa de longitude
+    cos_lat = math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    if cos_lat <= 0:
+        return min_lat, max_lat, -180.0, 180.0
+    delta_lng = math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat))
+    if delta_lng >= 180 or lng - delta_lng < -180 or lng + delta_lng > 180:
+        return min_lat, max_lat, -180.0, 180.0
+    return min_lat, max_lat, lng - delta_lng, lng + delta_lng
+
+
+def parse_coordinates(params):
+    """Lê lat/lng de um QueryDict; retorna (lat, lng) ou None se inválidos"""
+    try:
+        lat = float(params.get('lat', ''))
+        lng = float(params.get('lng', ''))
+    except ValueError:
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+    return lat, lng
+
+
+def parse_radius(params):
+    """Lê radius (km) de um QueryDict, limitado a (0, MAX_RADIUS_KM]; DEFAULT_RADIUS_KM se inválido"""
+    try:
+        radius_km = float(params.get('radius', DEFAULT_RADIUS_KM))
+    except ValueError:
+        return DEFAULT_RADIUS_KM
+    if not math.isfinite(radius_km) or radius_km <= 0:
+        return DEFAULT_RADIUS_KM
+    return min(radius_km, MAX_RADIUS_KM)
+
+
+def candidates(queryset, lat, lng, radius_km):
+    """Filtra o queryset pelas células da grade e pelo bounding box do raio"""
+    min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_km)
+    min_row, min_col = grid_cell(min_lat, min_lng)
+    max_row, max_col = grid_cell(max_lat, max_lng)
+    return queryset.filter(
+        grid_row__range=(min_row, max_row),
+        grid_col__range=(min_col, max_col),
+        latitude__range=(min_lat, max_lat),
+        longitude__range=(min_lng, max_lng),
+    )
+
+
+def within_radius(queryset, lat, lng, radius_km=DEFAULT_RADIUS_KM):
+    """Lista [(distância_km, id)] dos negócios dentro do raio, do mais próximo ao mais distante"""
+    rows = candidates(queryset, lat, lng, radius_km).values_list('id', 'latitude', 'longitude')
+    ranked = []
+    for pk, b_lat, b_lng in rows:
+        distance = haversine_km(lat, lng, b_lat, b_lng)
+        if distance <= radius_km:
+            ranked.append((distance, pk))
+    ranked.sort()
+    return ranked
+
+
+def nearest(queryset, lat, lng, k, max_radius_km=MAX_RADIUS_KM):
+    """Os k negócios mais próximos, ampliando o raio de busca até max_radius_km"""
+    radius_km = DEFAULT_RADIUS_KM
+    while True:
+        ranked = within_radius(queryset, lat, lng, radius_km)
+        if len(ranked) >= k or radius_km >= max_radius_km:
+            return ranked[:k]
+        radius_km = min(radius_km * 2, max_radius_km)
+
+
+def load_ranked(queryset, ranked):
+    """Carrega os objetos de uma lista [(distância_km, id)]; cada um recebe distance_km"""
+    return pagination.load_ranked(queryset, ranked, 'distance_km')
@@ -0,0 +1,344 @@
+"""Benchmark de carga das views mais acessadas do marketplace.
+
+Usado pelo comando benchmark_views e pelos testes marcados com 'benchmark'.
+seed() replica os negócios de sample_data em escala, em volta das mesmas
+coordenadas, com planos, horários, grade de reservas, avaliações e reservas.
+Cada cenário (SCENARIOS) é disparado por várias threads, pelo cliente de teste
+do Django no mesmo processo ou por HTTP contra um servidor WSGI local com uma
+thread por conexão, e o relatório traz req/s, percentis de latência e a
+contagem de status por cenário.
+
+O DEBUG fica desligado durante a medição: com ele o Django guarda todas as
+consultas em memória, o que não acontece em produção.
+"""
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter
+from contextlib import contextmanager
+from datetime import date, time as dt_time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+from . import benchmarks, geo, ratings, sample_data, search, stats
+from .models import (Booking, Business, BusinessCategory, BusinessHours, BusinessPlan, Review, TimeSlot)
+
+# Cópias de cada negócio de sample_data
+SCALE = 250
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday']
+SEARCH_TERMS = ['restaurante', 'hotel', 'artesanato', 'guia', 'mar', 'recife']
+CENTER = (-8.0630, -34.8720)
+
+
+def seed(scale=SCALE, seed=0, batch_size=2000):
+    """Cria a massa de dados; retorna o total de linhas por modelo"""
+    rng = random.Random(seed)
+    today = date.today()
+    templates = sample_data.BUSINESSES
+    total = scale * len(templates)
+
+    categories = {}
+    for data in sample_data.CATEGORIES:
+        categories[data['name']], _ = BusinessCategory.objects.get_or_create(
+            name=data['name'], defaults={'icon': data['icon']})
+
+    # Um dono por negócio (o painel mostra os negócios do usuário) e os clientes
+    password = make_password(None)
+    customers = max(100, total // 4)
+    User.objects.bulk_create([User(username=f'load_owner{i}', password=password) for i in range(total)] +
+                             [User(username=f'load_customer{i}', password=password) for i in range(customers)],
+                             batch_size=batch_size)
+    owner_ids = list(User.objects.filter(username__startswith='load_owner').order_by('id').values_list('id', flat=True))
+    customer_ids = list(User.objects.filter(username__startswith='load_customer').values_list('id', flat=True))
+
+    rows = []
+    for i, owner_id in enumerate(owner_ids):
+        data = templates[i % len(templates)]
+        lat = Decimal(f'{data["latitude"] + rng.gauss(0, 0.05):.6f}')
+        lng = Decimal(f'{data["longitude"] + rng.gauss(0, 0.05):.6f}')
+        grid_row, grid_col = geo.grid_cell(lat, lng)
+        rows.append(Business(
+            user_id=owner_id, name=f'{data["name"]} {i // len(templates) + 1}', description=data['description'],
+            business_type=data['business_type'], category=categories[data['category']], address=data['address'],
+            latitude=lat, longitude=lng, grid_row=grid_row, grid_col=grid_col, phone=data['phone'],
+            whatsapp=data['whatsapp'], email=data['email'], website=data['website'],
+        ))
+    Business.objects.bulk_create(rows, batch_size=batch_size)
+    businesses = list(Business.objects.filter(user_id__in=owner_ids).order_by('id').values_list('id', flat=True))
+
+    plans, hours, time_slots, reviews, bookings = [], [], [], [], []
+    for i, business_id in enumerate(businesses):
+        plans.append(BusinessPlan(business_id=business_id,
+                                  **sample_data.plan_options(templates[i % len(templates)]['plan_type'])))
+        for day, _ in BusinessHours.DAYS_OF_WEEK:
+            hours.append(BusinessHours(business_id=business_id, day_of_week=day, open_time=dt_time(8),
+                                       close_time=dt_time(18), is_closed=day == 'sunday'))
+        for day in WEEKDAYS:
+            time_slots.append(TimeSlot(business_id=business_id, day_of_week=day, start_time=dt_time(8),
+                                       end_time=dt_time(18), capacity=rng.choice([None, 2, 5])))
+        for user_id in rng.sample(customer_ids, rng.randint(0, 20)):
+            reviews.append(Review(business_id=business_id, user_id=user_id,
+                                  rating=rng.choices([1, 2, 3, 4, 5], [1, 1, 2, 4, 5])[0], comment='Avaliação'))
+        for _ in range(rng.randint(0, 10)):
+            bookings.append(Booking(
+                business_id=business_id, user_id=rng.choice(customer_ids), service_name='Serviço',
+                booking_date=today + timedelta(days=rng.randint(0, 30)),
+                booking_time=dt_time(rng.randint(8, 17), rng.choice([0, 30])),
+                status=rng.choice(['pending', 'confirmed']),
+            ))
+    for model, objs in ((BusinessPlan, plans), (BusinessHours, hours), (TimeSlot, time_slots),
+                        (Review, reviews), (Booking, bookings)):
+        model.objects.bulk_create(objs, batch_size=batch_size)
+
+    # bulk_create não dispara os sinais: agregados, contadores e índice de busca
+    ratings.rebuild(batch_size=batch_size)
+    stats.rebuild(batch_size=batch_size)
+    search.get_backend().rebuild(Business.objects.select_related('category').iterator(chunk_size=batch_size))
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+    return {
+        'users': len(owner_ids) + len(customer_ids), 'businesses': len(businesses), 'reviews': len(reviews),
+        'bookings': len(bookings), 'time_slots': len(time_slots),
+    }
+
+
+class Context:
+    """Ids usados para montar as requisições dos cenários"""
+
+    def __init__(self):
+        self.businesses = list(Business.objects.filter(is_active=True).values_list('id', 'user_id'))
+        self.category_ids = list(BusinessCategory.objects.values_list('id', flat=True))
+        self.customer_ids = list(User.objects.filter(username__startswith='load_customer').values_list('id', flat=True))
+
+
+def business_list(rng, ctx):
+    params = {}
+    if rng.random() < 0.5:
+        params['category'] = rng.choice(ctx.category_ids)
+    if rng.random() < 0.3:
+        params['type'] = rng.choice(['commerce', 'service'])
+    if rng.random() < 0.3:
+        params['q'] = rng.choice(SEARCH_TERMS)
+    return 'GET', reverse('local_businesses:business_list') + '?' + urllib.parse.urlencode(params), None
+
+
+def nearby_businesses(rng, ctx):
+    params = {
+        'lat': f'{CENTER[0] + rng.gauss(0, 0.05):.5f}',
+        'lng': f'{CENTER[1] + rng.gauss(0, 0.05):.5f}',
+        'radius': rng.choice([2, 5, 10]),
+    }
+    return 'GET', reverse('local_businesses:nearby_businesses') + '?' + urllib.parse.urlencode(params), None
+
+
+def business_detail(rng, ctx):
+    business_id, _ = rng.choice(ctx.businesses)
+    return 'GET', reverse('local_businesses:business_detail', args=[business_id]), None
+
+
+def available_times(rng, ctx):
+    business_id, _ = rng.choice(ctx.businesses)
+    day = date.today() + timedelta(days=rng.randint(1, 30))
+    return 'GET', reverse('local_businesses:available_times', args=[business_id, day.isoformat()]), None
+
+
+def book_service(rng, ctx):
+    business_id, _ = rng.choice(ctx.businesses)
+    data = {
+        'service_name': 'Serviço',
+        'booking_date': (date.today() + timedelta(days=rng.randint(1, 60))).isoformat(),
+        'booking_time': f'{rng.randint(8, 17):02d}:{rng.choice([0, 30]):02d}',
+        'duration': 60,
+        'number_of_people': 1,
+    }
+    return 'POST', reverse('local_businesses:book_service', args=[business_id]), data
+
+
+def business_dashboard(rng, ctx):
+    return 'GET', reverse('local_businesses:business_dashboard'), None
+
+
+# Nome -> (quem faz a requisição, função que monta a requisição)
+SCENARIOS = {
+    'business_list': (None, business_list),
+    'nearby_businesses': (None, nearby_businesses),
+    'business_detail': (None, business_detail),
+    'available_times': ('customer', available_times),
+    'book_service': ('customer', book_service),
+    'business_dashboard': ('owner', business_dashboard),
+}
+
+
+def _session_cookie(user_id):
+    client = Client()
+    client.force_login(User.objects.get(pk=user_id))
+    return client.cookies['sessionid'].value
+
+
+def _users(rng, ctx):
+    return {None: None, 'customer': rng.choice(ctx.customer_ids), 'owner': rng.choice(ctx.businesses)[1]}
+
+
+class ClientDriver:
+    """Requisições pelo cliente de teste, no mesmo processo"""
+
+    def __init__(self, rng, ctx):
+        self.clients = {}
+        for role, user_id in _users(rng, ctx).items():
+            self.clients[role] = Client(raise_request_exception=False)
+            if user_id is not None:
+                self.clients[role].cookies['sessionid'] = _session_cookie(user_id)
+
+    def request(self, role, method, path, data):
+        client = self.clients[role]
+        response = client.post(path, data) if method == 'POST' else client.get(path)
+        return response.status_code
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HTTPDriver:
+    """Requisições HTTP para o servidor WSGI local"""
+
+    def __init__(self, rng, ctx, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(_NoRedirect)
+        # O token CSRF pode ser o próprio segredo do cookie, sem máscara
+        self.csrf_token = get_random_string(32)
+        self.cookies = {}
+        for role, user_id in _users(rng, ctx).items():
+            cookies = {'csrftoken': self.csrf_token}
+            if user_id is not None:
+                cookies['sessionid'] = _session_cookie(user_id)
+            self.cookies[role] = '; '.join(f'{name}={value}' for name, value in cookies.items())
+
+    def request(self, role, method, path, data):
+        body = urllib.parse.urlencode(data).encode() if method == 'POST' else None
+        request = urllib.request.Request(self.base_url + path, data=body, method=method, headers={
+            'Cookie': self.cookies[role], 'X-CSRFToken': self.csrf_token,
+        })
+        try:
+            with self.opener.open(request) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def wsgi_server():
+    """Servidor WSGI local em uma porta livre; retorna a URL base"""
+    httpd = ThreadedWSGIServer(('127.0.0.1', 0), _QuietHandler, allow_reuse_address=False)
+    httpd.set_app(get_wsgi_application())
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f'http://127.0.0.1:{httpd.server_port}'
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+        thread.join()
+
+
+def _worker(name, make_driver, ctx, requests, warmup, seed, results, lock):
+    role, build = SCENARIOS[name]
+    rng = random.Random(seed)
+    latencies, statuses = [], Counter()
+    try:
+        driver = make_driver(rng, ctx)
+        for i in range(warmup + requests):
+            method, path, data = build(rng, ctx)
+            started = time.perf_counter()
+            try:
+                status = driver.request(role, method, path, data)
+            except OSError:
+                status = 'connection error'
+            if i >= warmup:
+                latencies.append(time.perf_counter() - started)
+                statuses[status] += 1
+    finally:
+        connection.close()
+    with lock:
+        results['latencies'].extend(latencies)
+        results['statuses'].update(statuses)
+
+
+def run_scenario(name, make_driver, ctx, threads=4, requests=200, warmup=10, seed=0):
+    """Executa um cenário com `threads` threads e `requests` requisições no total"""
+    results = {'latencies': [], 'statuses': Counter()}
+    lock = threading.Lock()
+    per_thread = [requests // threads + (i < requests % threads) for i in range(threads)]
+    workers = [
+        threading.Thread(target=_worker, args=(name, make_driver, ctx, count, warmup, seed + i, results, lock))
+        for i, count in enumerate(per_thread)
+    ]
+    connection.close()
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    statuses = {str(status): count for status, count in sorted(results['statuses'].items(), key=str)}
+    errors = sum(count for status, count in results['statuses'].items()
+                 if not isinstance(status, int) or status >= 500)
+    return {
+        'scenario': name,
+        'threads': threads,
+        'requests': len(results['latencies']),
+        'errors': errors,
+        'statuses': statuses,
+        **benchmarks.latency_report(results['latencies'], elapsed),
+    }
+
+
+def run(scenarios=None, threads=4, requests=200, warmup=10, seed=0, server=False):
+    """Executa os cenários no banco atual; retorna um relatório por cenário"""
+    ctx = Context()
+    names = scenarios or list(SCENARIOS)
+    with override_settings(DEBUG=False, ALLOWED_HOSTS=['127.0.0.1', 'localhost', 'testserver']):
+        if not server:
+            return [run_scenario(name, ClientDriver, ctx, threads, requests, warmup, seed) for name in names]
+        with wsgi_server() as base_url:
+            def make_driver(rng, ctx):
+                return HTTPDriver(rng, ctx, base_url)
+            return [run_scenario(name, make_driver, ctx, threads, requests, warmup, seed) for name in names]
+
+
+def compare(previous, current):
+    """Variação percentual de req/s e p95 em relação a um relatório anterior, por cenário"""
+    before = {row['scenario']: row for row in previous}
+    changes = {}
+    for row in current:
+        old = before.get(row['scenario'])
+        if old is None:
+            continue
+        changes[row['scenario']] = {
+            key: round((row[key] - old[key]) / old[key] * 100, 1) if old[key] else None
+            for key in ('ops_per_second', 'p95_ms')
+        }
+    return changes
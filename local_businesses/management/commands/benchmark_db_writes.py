@@ -0,0 +1,42 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from local_businesses import write_benchmark
+
+class Command(BaseCommand):
+    help = 'Measure concurrent booking/review/notification writes on throwaway databases, one per profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profile', action='append', choices=list(write_benchmark.PROFILES),
+                            help='Profile to run (repeatable); default: every profile available for this database')
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--operations', type=int, default=200, help='Writes per thread')
+        parser.add_argument('--businesses', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        profiles = options['profile'] or list(write_benchmark.PROFILES)
+        results = []
+        for profile in profiles:
+            if profile in write_benchmark.SQLITE_ONLY and connection.vendor != 'sqlite':
+                self.stdout.write(self.style.WARNING(f'Skipping {profile}: SQLite only'))
+                continue
+            counts, result = write_benchmark.with_profile(
+                profile,
+                lambda: write_benchmark.run(options['threads'], options['operations'], options['seed']),
+                businesses=options['businesses'], seed=options['seed'],
+            )
+            results.append({'profile': profile, **result})
+            outcomes = ', '.join(f'{count} {name}' for name, count in sorted(result['outcomes'].items()))
+            self.stdout.write(
+                f'{profile} ({connection.vendor}): {result["ops_per_second"]} ops/s, '
+                f'p50 {result["p50_ms"]} ms, p95 {result["p95_ms"]} ms, p99 {result["p99_ms"]} ms; {outcomes}'
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'vendor': connection.vendor, 'rows': counts, 'results': results}, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'\nResults written to {options["output"]}'))
@@ -0,0 +1,46 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from local_businesses import benchmarks
+
+class Command(BaseCommand):
+    help = 'Measure the hot local_businesses queries with and without the composite indexes on a throwaway database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--businesses', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        # Nunca medir no banco real: cria e descarta um banco de teste
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            counts = benchmarks.seed(businesses=options['businesses'], seed=options['seed'])
+            self.stdout.write('Seeded ' + ', '.join(f'{count} {name}' for name, count in counts.items()))
+            sample = benchmarks.sample(seed=options['seed'])
+
+            with benchmarks.without_indexes():
+                before = benchmarks.run_all(sample, options['repeat'])
+            after = benchmarks.run_all(sample, options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        results = []
+        for name, (view, before_ms, before_plan) in before.items():
+            _, after_ms, after_plan = after[name]
+            results.append({
+                'query': name, 'view': view,
+                'before_ms': round(before_ms, 3), 'after_ms': round(after_ms, 3),
+                'before_plan': before_plan, 'after_plan': after_plan,
+            })
+            self.stdout.write(f'\n{name} ({view}): {before_ms:.3f} ms -> {after_ms:.3f} ms')
+            self.stdout.write(f'  before: {before_plan}')
+            self.stdout.write(f'  after:  {after_plan}')
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'vendor': connection.vendor, 'rows': counts, 'results': results}, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'\nResults written to {options["output"]}'))
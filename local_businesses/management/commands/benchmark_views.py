@@ -0,0 +1,67 @@
+import json
+import platform
+import subprocess
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from local_businesses import benchmarks, load_test
+
+class Command(BaseCommand):
+    help = 'Load-test the marketplace hot views on a throwaway database and report req/s and latency percentiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', action='append', choices=list(load_test.SCENARIOS),
+                            help='Scenario to run (repeatable); default: all')
+        parser.add_argument('--scale', type=int, default=load_test.SCALE,
+                            help='Copies of each sample business to seed')
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--requests', type=int, default=200, help='Measured requests per scenario')
+        parser.add_argument('--warmup', type=int, default=10, help='Unmeasured requests per thread before measuring')
+        parser.add_argument('--server', action='store_true',
+                            help='Drive a local threaded WSGI server over HTTP instead of the test client')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--compare', help='Previous JSON output to compare req/s and p95 against')
+
+    def handle(self, *args, **options):
+        with benchmarks.throwaway_database():
+            counts = load_test.seed(scale=options['scale'], seed=options['seed'])
+            self.stdout.write('Seeded ' + ', '.join(f'{count} {name}' for name, count in counts.items()))
+            results = load_test.run(options['scenario'], options['threads'], options['requests'],
+                                    options['warmup'], options['seed'], options['server'])
+
+        changes = {}
+        if options['compare']:
+            with open(options['compare']) as f:
+                changes = load_test.compare(json.load(f)['results'], results)
+        for row in results:
+            line = (f'{row["scenario"]}: {row["ops_per_second"]} req/s, p50 {row["p50_ms"]} ms, '
+                    f'p95 {row["p95_ms"]} ms, p99 {row["p99_ms"]} ms, statuses {row["statuses"]}')
+            if row['scenario'] in changes:
+                change = changes[row['scenario']]
+                line += f' (req/s {change["ops_per_second"]:+}%, p95 {change["p95_ms"]:+}%)'
+            self.stdout.write(self.style.ERROR(line) if row['errors'] else line)
+
+        if options['output']:
+            report = {
+                'created_at': timezone.now().isoformat(),
+                'commit': self.commit(),
+                'python': platform.python_version(),
+                'vendor': connection.vendor,
+                'driver': 'wsgi' if options['server'] else 'client',
+                'threads': options['threads'],
+                'rows': counts,
+                'results': results,
+            }
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'\nResults written to {options["output"]}'))
+
+    def commit(self):
+        try:
+            return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                  check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,38 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from local_businesses import datagen
+
+class Command(BaseCommand):
+    help = ('Generate a large synthetic dataset (users, businesses, photos, hours, reviews, bookings, '
+            'notifications) with bulk inserts; the same --seed always produces the same data')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000)
+        parser.add_argument('--businesses', type=int, default=20000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Businesses (and users) written per transaction; bounds memory use')
+        parser.add_argument('--prefix', default='gen', help='Username prefix of the generated users')
+        parser.add_argument('--max-reviews', type=int, default=2000, help='Most reviews a single business gets')
+        parser.add_argument('--zipf-exponent', type=float, default=1.8,
+                            help='Exponent of the review count distribution; higher means fewer reviews')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['businesses'] < 0 or options['batch_size'] < 1:
+            raise CommandError('--users and --batch-size must be positive and --businesses not negative.')
+        if User.objects.filter(username__startswith=options['prefix']).exists():
+            raise CommandError(f'Users starting with "{options["prefix"]}" already exist; pick another --prefix.')
+
+        def progress(counts):
+            if options['verbosity'] >= 1:
+                self.stdout.write(f'{counts["seconds"]}s: ' + ', '.join(
+                    f'{count} {name}' for name, count in counts.items() if name != 'seconds'))
+
+        counts = datagen.generate(
+            users=options['users'], businesses=options['businesses'], seed=options['seed'],
+            batch_size=options['batch_size'], prefix=options['prefix'], max_reviews=options['max_reviews'],
+            zipf_exponent=options['zipf_exponent'], progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            'Generated ' + ', '.join(f'{count} {name}' for name, count in counts.items())))
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from local_businesses import thumbnails
+
+class Command(BaseCommand):
+    help = 'Generate resized WebP/JPEG variants for business photos that do not have them yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--all', action='store_true',
+                            help='Regenerate variants for every photo (backfill), not only pending ones')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep polling for new photos instead of exiting when there are none')
+        parser.add_argument('--interval', type=float, default=5,
+                            help='Seconds between polls when --loop is used')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            self.stdout.write(f'{thumbnails.reset()} photos queued for thumbnail generation')
+
+        total = 0
+        while True:
+            processed = thumbnails.process_batch(batch_size=options['batch_size'])
+            total += processed
+            if processed:
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f'Thumbnails generated for {total} photos'))
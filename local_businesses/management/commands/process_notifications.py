@@ -0,0 +1,38 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from local_businesses import dispatch
+
+class Command(BaseCommand):
+    help = 'Deliver queued notifications through the configured channels'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep polling the queue instead of exiting when it is empty')
+        parser.add_argument('--interval', type=float, default=5,
+                            help='Seconds between polls when --loop is used')
+        parser.add_argument('--flush', action='store_true',
+                            help='Deliver digests without waiting for the coalescing window')
+        parser.add_argument('--purge-days', type=int, default=7,
+                            help='Delete processed queue entries older than this many days')
+
+    def handle(self, *args, **options):
+        purged = dispatch.purge_processed(timezone.now() - timedelta(days=options['purge_days']))
+        if purged:
+            self.stdout.write(f'{purged} processed queue entries purged')
+
+        total = 0
+        while True:
+            processed = dispatch.process_batch(batch_size=options['batch_size'], flush=options['flush'])
+            total += processed
+            if processed:
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f'{total} queued notifications delivered'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from local_businesses import stats
+
+class Command(BaseCommand):
+    help = 'Recompute the BusinessStats counters shown on the business dashboard'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true',
+                            help='Only report businesses whose counters are out of date')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        mismatched = stats.rebuild(batch_size=options['batch_size'], dry_run=options['verify'])
+        if options['verify']:
+            if mismatched:
+                self.stdout.write(self.style.WARNING(f'{len(mismatched)} businesses out of date: {mismatched[:20]}'))
+            else:
+                self.stdout.write(self.style.SUCCESS('All business stats are consistent'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Business stats rebuilt ({len(mismatched)} businesses updated)'))
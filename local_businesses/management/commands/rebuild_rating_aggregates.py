@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from local_businesses import ratings
+
+class Command(BaseCommand):
+    help = 'Rebuild the denormalized review aggregates stored on Business'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true',
+                            help='Only report businesses whose aggregates are out of date')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        mismatched = ratings.rebuild(batch_size=options['batch_size'], dry_run=options['verify'])
+        if options['verify']:
+            if mismatched:
+                self.stdout.write(self.style.WARNING(f'{len(mismatched)} businesses out of date: {mismatched[:20]}'))
+            else:
+                self.stdout.write(self.style.SUCCESS('All rating aggregates are consistent'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Rating aggregates rebuilt ({len(mismatched)} businesses updated)'))
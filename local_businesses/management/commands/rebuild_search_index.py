@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from local_businesses.models import Business
+from local_businesses import search
+
+class Command(BaseCommand):
+    help = 'Rebuild the business full-text search index'
+
+    def handle(self, *args, **options):
+        backend = search.get_backend()
+        businesses = Business.objects.select_related('category').iterator(chunk_size=1000)
+        backend.rebuild(businesses)
+        self.stdout.write(self.style.SUCCESS(f'Search index rebuilt with {backend.__class__.__name__}'))
@@ -0,0 +1,38 @@
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database into the local read replica (REPLICA_SQLITE_PATH)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep copying every --interval seconds')
+        parser.add_argument('--interval', type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        if 'replica' not in connections.settings:
+            raise CommandError('No replica configured; set REPLICA_SQLITE_PATH.')
+        primary, replica = connections['default'], connections['replica']
+        if primary.vendor != 'sqlite' or replica.vendor != 'sqlite':
+            raise CommandError('Only SQLite replicas can be synced; other databases replicate on their own.')
+
+        while True:
+            started = time.monotonic()
+            self.sync(primary, replica.settings_dict['NAME'])
+            self.stdout.write(f'Replica synced in {time.monotonic() - started:.3f}s')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def sync(self, primary, path):
+        # A API de backup copia um retrato consistente e troca o conteúdo da
+        # réplica em uma transação: leitores abertos não veem cópia pela metade
+        primary.ensure_connection()
+        target = sqlite3.connect(path)
+        try:
+            primary.connection.backup(target)
+        finally:
+            target.close()
+            primary.close()
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+from local_businesses import geo
+
+
+def fill_grid_cells(apps, schema_editor):
+    Business = apps.get_model('local_businesses', 'Business')
+    businesses = list(Business.objects.exclude(latitude=None).exclude(longitude=None))
+    for business in businesses:
+        business.grid_row, business.grid_col = geo.grid_cell(business.latitude, business.longitude)
+    Business.objects.bulk_update(businesses, ['grid_row', 'grid_col'], batch_size=500)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('local_businesses', '0004_businessplan_max_businesses_alter_business_user'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='business',
+            name='grid_col',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='business',
+            name='grid_row',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='business',
+            index=models.Index(fields=['grid_row', 'grid_col'], name='business_grid_idx'),
+        ),
+        migrations.RunPython(fill_grid_cells, migrations.RunPython.noop),
+    ]
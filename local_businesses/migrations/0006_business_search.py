@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from local_businesses import search
+
+FTS_TABLE = search.SQLiteFTSBackend.table
+
+
+def create_search_index(apps, schema_editor):
+    Business = apps.get_model('local_businesses', 'Business')
+    BusinessSearchTerm = apps.get_model('local_businesses', 'BusinessSearchTerm')
+    businesses = Business.objects.select_related('category')
+
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"name, description, category, address, "
+            f"tokenize='unicode61 remove_diacritics 2')"
+        )
+        rows = []
+        for business in businesses:
+            fields = search.business_fields(business)
+            rows.append([business.pk] + [search.normalize(fields[c]) for c in search.SQLiteFTSBackend.columns])
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, name, description, category, address) VALUES (%s, %s, %s, %s, %s)",
+                rows,
+            )
+    else:
+        terms = []
+        for business in businesses:
+            weights = {}
+            for field, text in search.business_fields(business).items():
+                for term in search.tokenize(text):
+                    weights[term[:64]] = weights.get(term[:64], 0) + search.FIELD_WEIGHTS[field]
+            terms.extend(BusinessSearchTerm(business_id=business.pk, term=t, weight=w) for t, w in weights.items())
+        BusinessSearchTerm.objects.bulk_create(terms, batch_size=1000)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('local_businesses', '0005_business_grid'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BusinessSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(db_index=True, max_length=64)),
+                ('weight', models.IntegerField(default=1)),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='local_businesses.business')),
+            ],
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
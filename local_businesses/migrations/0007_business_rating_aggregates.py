@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:43
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_rating_aggregates(apps, schema_editor):
+    Business = apps.get_model('local_businesses', 'Business')
+    Review = apps.get_model('local_businesses', 'Review')
+    rows = (Review.objects.order_by().values('business_id')
+            .annotate(count=Count('id'), total=Sum('rating'))
+            .values_list('business_id', 'count', 'total'))
+    businesses = []
+    for business_id, count, total in rows:
+        businesses.append(Business(pk=business_id, review_count=count, rating_sum=total, avg_rating=total / count))
+    Business.objects.bulk_update(businesses, ['review_count', 'rating_sum', 'avg_rating'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('local_businesses', '0006_business_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='business',
+            name='avg_rating',
+            field=models.FloatField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='business',
+            name='rating_sum',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='business',
+            name='review_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_rating_aggregates, migrations.RunPython.noop),
+    ]
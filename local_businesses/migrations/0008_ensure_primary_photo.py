@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:44
+
+from django.db import migrations
+
+
+def ensure_primary_photo(apps, schema_editor):
+    """Negócios com fotos e sem foto principal recebem a mais antiga como principal"""
+    BusinessPhoto = apps.get_model('local_businesses', 'BusinessPhoto')
+    with_primary = BusinessPhoto.objects.filter(is_primary=True).values('business_id')
+    first_photos = {}
+    for photo_id, business_id in (BusinessPhoto.objects.exclude(business_id__in=with_primary)
+                                  .order_by('-id').values_list('id', 'business_id')):
+        first_photos[business_id] = photo_id
+    BusinessPhoto.objects.filter(id__in=list(first_photos.values())).update(is_primary=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('local_businesses', '0007_business_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.RunPython(ensure_primary_photo, migrations.RunPython.noop),
+    ]
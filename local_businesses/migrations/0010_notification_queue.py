@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('local_businesses', '0009_booking_capacity'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueuedNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notification_type', models.CharField(choices=[('booking', 'Nova Reserva'), ('booking_update', 'Atualização de Reserva'), ('review', 'Nova Avaliação'), ('plan_upgrade', 'Solicitação de Upgrade de Plano'), ('plan_upgrade_approved', 'Upgrade de Plano Aprovado'), ('plan_upgrade_rejected', 'Upgrade de Plano Rejeitado'), ('general', 'Geral')], max_length=30)),
+                ('title', models.CharField(max_length=200)),
+                ('message', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='queued_notifications', to='local_businesses.business')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['processed_at', 'id'], name='queued_notification_pending')],
+            },
+        ),
+    ]
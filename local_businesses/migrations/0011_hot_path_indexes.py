@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0001_initial'),
+        ('local_businesses', '0010_notification_queue'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['business', 'status'], name='booking_business_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='business',
+            index=models.Index(fields=['is_active', 'category', 'business_type'], name='business_listing_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['business', '-created_at'], name='notification_business_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['business'], name='notification_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='planupgraderequest',
+            index=models.Index(fields=['status', '-created_at'], name='upgrade_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['business', 'user'], name='review_business_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timeslot',
+            index=models.Index(fields=['business', 'is_active', 'day_of_week'], name='timeslot_business_active_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def fill_business_stats(apps, schema_editor):
+    def get(name):
+        return apps.get_model('local_businesses', name)
+
+    def counts(queryset, **aggregates):
+        rows = queryset.order_by().values('business_id').annotate(**aggregates)
+        return {row.pop('business_id'): row for row in rows}
+
+    sources = [
+        counts(get('BusinessPhoto').objects.all(), photo_count=Count('id')),
+        counts(get('Booking').objects.all(), booking_count=Count('id'),
+               pending_booking_count=Count('id', filter=Q(status='pending'))),
+        counts(get('Notification').objects.filter(is_read=False), unread_notification_count=Count('id')),
+        counts(get('PlanUpgradeRequest').objects.filter(status='pending'), pending_upgrade_count=Count('id')),
+    ]
+    BusinessStats = get('BusinessStats')
+    rows = []
+    for business_id in get('Business').objects.values_list('id', flat=True):
+        values = {}
+        for source in sources:
+            values.update(source.get(business_id, {}))
+        rows.append(BusinessStats(business_id=business_id, **values))
+    BusinessStats.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('local_businesses', '0011_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BusinessStats',
+            fields=[
+                ('business', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='local_businesses.business')),
+                ('photo_count', models.IntegerField(default=0)),
+                ('booking_count', models.IntegerField(default=0)),
+                ('pending_booking_count', models.IntegerField(default=0)),
+                ('unread_notification_count', models.IntegerField(default=0)),
+                ('pending_upgrade_count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(fill_business_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:07
+
+import uploads.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('local_businesses', '0012_business_stats'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='businessphoto',
+            name='image',
+            field=models.ImageField(storage=uploads.storage.get_content_storage, upload_to='business_photos/'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('local_businesses', '0013_content_addressed_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='businessphoto',
+            name='thumbnail_widths',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name='businessphoto',
+            name='thumbnails_generated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='businessphoto',
+            index=models.Index(condition=models.Q(('thumbnails_generated_at__isnull', True)), fields=['id'], name='photo_thumbnails_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:10
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('local_businesses', '0015_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='booking',
+            name='duration',
+            field=models.IntegerField(default=60, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.AlterField(
+            model_name='booking',
+            name='number_of_people',
+            field=models.IntegerField(default=1, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+    ]
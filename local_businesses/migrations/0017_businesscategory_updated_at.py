@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('local_businesses', '0016_booking_positive_values'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='businesscategory',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
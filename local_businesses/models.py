@@ -1,12 +1,16 @@
+from django.core.validators import MinValueValidator
 from django.db import models
 from django.contrib.auth.models import User
 from accounts.models import Profile
 from billing.models import Plan
+from uploads.storage import get_content_storage
+from . import geo
 
 class BusinessCategory(models.Model):
     name = models.CharField(max_length=100)
     icon = models.CharField(max_length=50, blank=True)  # Classe do Font Awesome
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return self.name
@@ -14,6 +18,15 @@ class BusinessCategory(models.Model):
     class Meta:
         verbose_name_plural = "Business Categories"
 
+class BusinessQuerySet(models.QuerySet):
+    def with_primary_photo(self):
+        """Carrega a foto principal de todos os negócios em uma única consulta"""
+        return self.prefetch_related(models.Prefetch(
+            'photos',
+            queryset=BusinessPhoto.objects.filter(is_primary=True),
+            to_attr='primary_photos',
+        ))
+
 class Business(models.Model):
     BUSINESS_TYPES = [
         ('commerce', 'Comércio'),
@@ -32,18 +45,77 @@ class Business(models.Model):
     whatsapp = models.CharField(max_length=20, blank=True)
     email = models.EmailField(blank=True)
     website = models.URLField(blank=True)
+    # Agregados das avaliações, mantidos por local_businesses.ratings
+    review_count = models.IntegerField(default=0, editable=False)
+    rating_sum = models.IntegerField(default=0, editable=False)
+    avg_rating = models.FloatField(default=0, db_index=True, editable=False)
+    # Célula da grade geográfica (ver local_businesses.geo)
+    grid_row = models.IntegerField(null=True, blank=True, editable=False)
+    grid_col = models.IntegerField(null=True, blank=True, editable=False)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = BusinessQuerySet.as_manager()
+    
     def __str__(self):
         return self.name
+    
+    @property
+    def primary_photo(self):
+        """Foto principal; usa o prefetch de with_primary_photo() quando disponível"""
+        if hasattr(self, 'primary_photos'):
+            return self.primary_photos[0] if self.primary_photos else None
+        return self.photos.order_by('-is_primary', 'id').first()
+    
+    # Campos atualizados apenas com UPDATEs atômicos, nunca por save()
+    AGGREGATE_FIELDS = {'review_count', 'rating_sum', 'avg_rating'}
+    
+    def save(self, *args, **kwargs):
+        # Manter a célula da grade em sincronia com as coordenadas
+        self.grid_row, self.grid_col = geo.grid_cell(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'grid_row', 'grid_col'}
+        elif update_fields is None and not self._state.adding and not kwargs.get('force_insert'):
+            # Não sobrescrever agregados alterados por outras requisições
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.AGGREGATE_FIELDS
+            ]
+        super().save(*args, **kwargs)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['grid_row', 'grid_col'], name='business_grid_idx'),
+            # Filtros da listagem (ativo, categoria, tipo)
+            models.Index(fields=['is_active', 'category', 'business_type'], name='business_listing_idx'),
+        ]
+
+class BusinessSearchTerm(models.Model):
+    """Índice invertido usado pela busca quando o banco não tem FTS5 (ver local_businesses.search)"""
+    business = models.ForeignKey(Business, on_delete=models.CASCADE, related_name='search_terms')
+    term = models.CharField(max_length=64, db_index=True)
+    weight = models.IntegerField(default=1)
+    
+    def __str__(self):
+        return f"{self.term} - {self.business_id}"
 
 class BusinessPhoto(models.Model):
     business = models.ForeignKey(Business, on_delete=models.CASCADE, related_name='photos')
-    image = models.ImageField(upload_to='business_photos/')
+    image = models.ImageField(upload_to='business_photos/', storage=get_content_storage)
     is_primary = models.BooleanField(default=False)
+    # Larguras das miniaturas já geradas (ver thumbnails.py); vazio usa a imagem original
+    thumbnail_widths = models.JSONField(default=list, blank=True, editable=False)
+    thumbnails_generated_at = models.DateTimeField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['id'], name='photo_thumbnails_pending_idx',
+                         condition=models.Q(thumbnails_generated_at__isnull=True)),
+        ]
     
     def __str__(self):
         return f"{self.business.name} - Photo"
@@ -64,6 +136,7 @@ class BusinessHours(models.Model):
     open_time = models.TimeField()
     close_time = models.TimeField()
     is_closed = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"{self.business.name} - {self.get_day_of_week_display()}"
@@ -74,9 +147,22 @@ class Review(models.Model):
     rating = models.IntegerField(choices=[(i, i) for i in range(1, 6)])  # 1-5
     comment = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"{self.business.name} - {self.user.username} - {self.rating}"
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['business', 'user'], name='review_business_user_idx'),
+        ]
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Guardar a nota carregada para calcular a diferença ao salvar
+        instance._loaded_rating = instance.__dict__.get('rating')
+        return instance
 
 class BusinessPlan(models.Model):
     PLAN_TYPES = [
@@ -126,8 +212,18 @@ class PlanUpgradeRequest(models.Model):
     def __str__(self):
         return f"{self.business.name} - {self.get_requested_plan_display()} - {self.get_status_display()}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Guardar o status carregado para os contadores de BusinessStats
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+    
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', '-created_at'], name='upgrade_status_idx'),
+        ]
 
 # New model for bookings/reservations
 class Booking(models.Model):
@@ -143,8 +239,8 @@ class Booking(models.Model):
     service_name = models.CharField(max_length=200)  # Name of the service being booked
     booking_date = models.DateField()
     booking_time = models.TimeField()
-    duration = models.IntegerField(default=60)  # Duration in minutes
-    number_of_people = models.IntegerField(default=1)
+    duration = models.IntegerField(default=60, validators=[MinValueValidator(1)])  # Duration in minutes
+    number_of_people = models.IntegerField(default=1, validators=[MinValueValidator(1)])
     special_requests = models.TextField(blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
@@ -153,9 +249,22 @@ class Booking(models.Model):
     def __str__(self):
         return f"Booking for {self.business.name} by {self.user.username}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Guardar a data carregada para invalidar a disponibilidade se ela mudar
+        instance._loaded_booking_date = instance.__dict__.get('booking_date')
+        # e o status, para os contadores de BusinessStats
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+    
     class Meta:
         ordering = ['-booking_date', '-booking_time']
-        unique_together = ['business', 'booking_date', 'booking_time']
+        # Conflitos de horário são verificados por local_businesses.bookings
+        indexes = [
+            models.Index(fields=['business', 'booking_date'], name='booking_business_date_idx'),
+            models.Index(fields=['business', 'status'], name='booking_business_status_idx'),
+        ]
 
 # Model for business time slots
 class TimeSlot(models.Model):
@@ -164,6 +273,7 @@ class TimeSlot(models.Model):
     start_time = models.TimeField()
     end_time = models.TimeField()
     duration = models.IntegerField(default=60)  # Duration in minutes
+    capacity = models.PositiveIntegerField(null=True, blank=True)  # Pessoas por horário; vazio = uma reserva por vez
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -173,6 +283,9 @@ class TimeSlot(models.Model):
     
     class Meta:
         ordering = ['day_of_week', 'start_time']
+        indexes = [
+            models.Index(fields=['business', 'is_active', 'day_of_week'], name='timeslot_business_active_idx'),
+        ]
 
 # Model for notifications
 class Notification(models.Model):
@@ -197,5 +310,50 @@ class Notification(models.Model):
     def __str__(self):
         return f"{self.business.name} - {self.title}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Guardar o is_read carregado para os contadores de BusinessStats
+        instance._loaded_is_read = instance.__dict__.get('is_read')
+        return instance
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['business', '-created_at'], name='notification_business_idx'),
+            # Só as não lidas: é o que o contador e o painel consultam
+            models.Index(fields=['business'], condition=models.Q(is_read=False), name='notification_unread_idx'),
+        ]
+
+
+# Contadores do painel do negócio, mantidos por local_businesses.stats
+class BusinessStats(models.Model):
+    business = models.OneToOneField(Business, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    photo_count = models.IntegerField(default=0)
+    booking_count = models.IntegerField(default=0)
+    pending_booking_count = models.IntegerField(default=0)
+    unread_notification_count = models.IntegerField(default=0)
+    pending_upgrade_count = models.IntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.business_id} - stats"
+
+
+# Fila de notificações a entregar (ver local_businesses/dispatch.py)
+class QueuedNotification(models.Model):
+    business = models.ForeignKey(Business, on_delete=models.CASCADE, related_name='queued_notifications')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    notification_type = models.CharField(max_length=30, choices=Notification.NOTIFICATION_TYPES)
+    title = models.CharField(max_length=200)
+    message = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.business_id} - {self.title}"
+
     class Meta:
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['processed_at', 'id'], name='queued_notification_pending'),
+        ]
\ No newline at end of file
@@ -0,0 +1,50 @@
+"""Contador de notificações não lidas por dono de negócio.
+
+O total fica no cache por usuário: criar uma notificação incrementa o
+contador e marcá-las como lidas o invalida. Em cache miss, uma única consulta
+agregada cobre todos os negócios do usuário.
+"""
+from django.core.cache import cache
+
+from .models import Business, Notification
+
+CACHE_TIMEOUT = 60 * 15
+
+
+def _cache_key(user_id):
+    return f'unread_notifications:{user_id}'
+
+
+def unread_count(user):
+    """Total de notificações não lidas de todos os negócios do usuário"""
+    key = _cache_key(user.pk)
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.filter(business__user_id=user.pk, is_read=False).count()
+        cache.set(key, count, CACHE_TIMEOUT)
+    return count
+
+
+def _owner_id(notification):
+    if Notification.business.field.is_cached(notification):
+        return notification.business.user_id
+    return Business.objects.filter(pk=notification.business_id).values_list('user_id', flat=True).first()
+
+
+def notification_created(notification):
+    if notification.is_read:
+        return
+    try:
+        cache.incr(_cache_key(_owner_id(notification)))
+    except ValueError:
+        # Contador fora do cache; será recalculado na próxima leitura
+        pass
+
+
+def invalidate(user_id):
+    cache.delete(_cache_key(user_id))
+
+
+def invalidate_for_businesses(business_ids):
+    user_ids = Business.objects.filter(pk__in=business_ids).values_list('user_id', flat=True).distinct()
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
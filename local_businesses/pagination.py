@@ -0,0 +1,137 @@
+"""Paginação por cursor (keyset) para as listagens de negócios.
+
+Em vez de OFFSET, o cursor guarda os valores da ordenação do último item da
+página; a próxima página é buscada com um WHERE sobre esses valores, então o
+custo não cresce com a profundidade da página. Os campos da ordenação precisam
+ser não nulos e terminar em uma chave única (normalmente o id).
+
+O cursor vem do cliente: cada valor é validado pelo campo da ordenação antes
+de chegar ao SQL, e qualquer cursor malformado vira InvalidCursor.
+"""
+import base64
+import bisect
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class Page:
+    def __init__(self, object_list, next_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def encode_cursor(values):
+    data = json.dumps(list(values), separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise InvalidCursor(cursor)
+    if not isinstance(values, list):
+        raise InvalidCursor(cursor)
+    return values
+
+
+class KeysetPaginator:
+    """Pagina um queryset por uma ordenação fixa, ex.: ('-avg_rating', '-id')"""
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset.order_by(*ordering)
+        self.ordering = ordering
+        self.per_page = per_page
+
+    def _field(self, name):
+        annotation = self.queryset.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        return self.queryset.model._meta.get_field(name)
+
+    def _clean(self, cursor):
+        values = decode_cursor(cursor)
+        if len(values) != len(self.ordering):
+            raise InvalidCursor(cursor)
+        cleaned = []
+        for field, value in zip(self.ordering, values):
+            if value is None or isinstance(value, (list, dict)):
+                raise InvalidCursor(cursor)
+            try:
+                # to_python e os validadores do campo (inclusive a faixa de inteiros do banco)
+                cleaned.append(self._field(field.lstrip('-')).clean(value, None))
+            except ValidationError:
+                raise InvalidCursor(cursor)
+        return cleaned
+
+    def _after(self, values):
+        # (a, b) depois de (va, vb): a > va OU (a = va E b > vb), respeitando a direção
+        condition = Q()
+        equal = {}
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def page(self, cursor=None):
+        queryset = self.queryset
+        if cursor:
+            queryset = queryset.filter(self._after(self._clean(cursor)))
+        objects = list(queryset[:self.per_page + 1])
+        next_cursor = None
+        if len(objects) > self.per_page:
+            objects = objects[:self.per_page]
+            last = objects[-1]
+            next_cursor = encode_cursor(getattr(last, f.lstrip('-')) for f in self.ordering)
+        return Page(objects, next_cursor)
+
+
+def paginate_ranked(ranked, cursor, per_page):
+    """Pagina uma lista já ordenada de tuplas (chave, id), como a da busca por proximidade"""
+    start = 0
+    if cursor:
+        values = decode_cursor(cursor)
+        # (chave numérica, id)
+        if (len(values) != 2 or not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values)
+                or not isinstance(values[1], int)):
+            raise InvalidCursor(cursor)
+        start = bisect.bisect_right(ranked, tuple(values))
+    items = ranked[start:start + per_page]
+    next_cursor = None
+    if start + per_page < len(ranked):
+        next_cursor = encode_cursor(items[-1])
+    return Page(items, next_cursor)
+
+
+def load_ranked(queryset, ranked, attname):
+    """Carrega os objetos de uma lista [(chave, id)] preservando a ordem.
+
+    A chave de cada item é guardada no atributo attname do objeto.
+    """
+    objects = queryset.in_bulk([pk for _, pk in ranked])
+    result = []
+    for key, pk in ranked:
+        obj = objects.get(pk)
+        if obj is not None:
+            setattr(obj, attname, key)
+            result.append(obj)
+    return result
@@ -0,0 +1,74 @@
+"""Agregados de avaliação denormalizados em Business.
+
+review_count, rating_sum e avg_rating são atualizados com um único UPDATE
+usando expressões F(), então avaliações simultâneas não perdem incrementos.
+rebuild() recalcula tudo em lote a partir da tabela de avaliações.
+"""
+from django.db.models import Case, Count, F, FloatField, Sum, Value, When
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .models import Business, Review
+
+
+def apply_delta(business_id, count_delta, sum_delta):
+    """Soma as diferenças aos agregados do negócio e recalcula a média"""
+    new_count = F('review_count') + count_delta
+    new_sum = F('rating_sum') + sum_delta
+    Business.objects.filter(pk=business_id).update(
+        review_count=new_count,
+        rating_sum=new_sum,
+        avg_rating=Case(
+            When(review_count__gt=-count_delta, then=Cast(new_sum, FloatField()) / new_count),
+            default=Value(0.0),
+            output_field=FloatField(),
+        ),
+        updated_at=timezone.now(),
+    )
+
+
+def review_saved(review, created):
+    if created:
+        apply_delta(review.business_id, 1, review.rating)
+    else:
+        previous = getattr(review, '_loaded_rating', None)
+        if previous is not None and previous != review.rating:
+            apply_delta(review.business_id, 0, review.rating - previous)
+    review._loaded_rating = review.rating
+
+
+def review_deleted(review):
+    rating = getattr(review, '_loaded_rating', None) or review.rating
+    apply_delta(review.business_id, -1, -rating)
+
+
+def expected_aggregates():
+    """{business_id: (review_count, rating_sum)} calculado da tabela de avaliações"""
+    rows = (Review.objects.order_by().values('business_id')
+            .annotate(count=Count('id'), total=Sum('rating'))
+            .values_list('business_id', 'count', 'total'))
+    return {pk: (count, total) for pk, count, total in rows}
+
+
+def rebuild(batch_size=1000, dry_run=False):
+    """Recalcula os agregados de todos os negócios; retorna os ids divergentes"""
+    expected = expected_aggregates()
+    mismatched = []
+    changed = []
+    fields = [*Business.AGGREGATE_FIELDS, 'updated_at']
+    now = timezone.now()
+    businesses = Business.objects.only('id', 'review_count', 'rating_sum', 'avg_rating')
+    for business in businesses.iterator(chunk_size=batch_size):
+        count, total = expected.get(business.pk, (0, 0))
+        average = total / count if count else 0
+        if (business.review_count, business.rating_sum) != (count, total) or abs(business.avg_rating - average) > 1e-9:
+            mismatched.append(business.pk)
+            business.review_count, business.rating_sum, business.avg_rating = count, total, average
+            business.updated_at = now
+            changed.append(business)
+        if not dry_run and len(changed) >= batch_size:
+            Business.objects.bulk_update(changed, fields)
+            changed = []
+    if not dry_run and changed:
+        Business.objects.bulk_update(changed, fields)
+    return mismatched
@@ -0,0 +1,83 @@
+"""Dados de exemplo dos negócios (comando populate_sample_data).
+
+O benchmark das views (load_test.py) replica estes mesmos negócios em escala.
+"""
+
+CATEGORIES = [
+    {'name': 'Restaurantes', 'icon': 'utensils'},
+    {'name': 'Hotéis', 'icon': 'hotel'},
+    {'name': 'Lojas', 'icon': 'store'},
+    {'name': 'Serviços', 'icon': 'concierge-bell'},
+    {'name': 'Turismo', 'icon': 'map-marked-alt'},
+]
+
+BUSINESSES = [
+    {
+        'name': 'Restaurante Sabor do Mar',
+        'category': 'Restaurantes',
+        'description': 'O melhor frutos do mar da região. Especialidade em peixes frescos e frutos do mar.',
+        'business_type': 'commerce',
+        'address': 'Av. Beira Mar, 123 - Centro',
+        'latitude': -8.0633,
+        'longitude': -34.8711,
+        'phone': '(81) 3232-1234',
+        'whatsapp': '5581999991234',
+        'email': 'contato@sabordomar.com',
+        'website': 'https://www.sabordomar.com',
+        'plan_type': 'premium'
+    },
+    {
+        'name': 'Hotel Vista Mar',
+        'category': 'Hotéis',
+        'description': 'Hotel 4 estrelas com vista para o mar. Localizado no centro da cidade.',
+        'business_type': 'commerce',
+        'address': 'Rua das Palmeiras, 456 - Centro',
+        'latitude': -8.0622,
+        'longitude': -34.8722,
+        'phone': '(81) 3333-5678',
+        'whatsapp': '5581999995678',
+        'email': 'reservas@vistamarhotel.com',
+        'website': 'https://www.vistamarhotel.com',
+        'plan_type': 'premium'
+    },
+    {
+        'name': 'Loja de Artesanato Recife',
+        'category': 'Lojas',
+        'description': 'Loja especializada em artesanato local. Produtos feitos por artesãos da região.',
+        'business_type': 'commerce',
+        'address': 'Rua do Bom Jesus, 789 - Recife Antigo',
+        'latitude': -8.0644,
+        'longitude': -34.8733,
+        'phone': '(81) 3434-9012',
+        'whatsapp': '5581999999012',
+        'email': 'contato@artesanatorecife.com',
+        'website': 'https://www.artesanatorecife.com',
+        'plan_type': 'pro'
+    },
+    {
+        'name': 'Guia Turístico Recife',
+        'category': 'Turismo',
+        'description': 'Guias turísticos especializados em mostrar os pontos turísticos da cidade.',
+        'business_type': 'service',
+        'address': 'Rua da Aurora, 321 - Boa Vista',
+        'latitude': -8.0611,
+        'longitude': -34.8744,
+        'phone': '(81) 3535-3456',
+        'whatsapp': '5581999993456',
+        'email': 'info@guiaturisticorecife.com',
+        'website': 'https://www.guiaturisticorecife.com',
+        'plan_type': 'free'
+    },
+]
+
+
+def plan_options(plan_type):
+    """Campos do BusinessPlan de cada tipo de plano"""
+    return {
+        'plan_type': plan_type,
+        'max_photos': 10 if plan_type == 'premium' else (5 if plan_type == 'pro' else 1),
+        'can_show_menu': plan_type == 'premium',
+        'can_show_website': plan_type in ['pro', 'premium'],
+        'can_show_whatsapp': plan_type in ['pro', 'premium'],
+        'is_featured': plan_type == 'premium',
+    }
@@ -0,0 +1,183 @@
+"""Busca textual de negócios.
+
+O índice cobre nome, descrição, categoria e endereço. No SQLite é usada uma
+tabela virtual FTS5 (ranking por bm25); nos demais bancos, um índice invertido
+próprio na tabela BusinessSearchTerm. O backend pode ser trocado pela
+configuração SEARCH_BACKEND (caminho da classe); sem ela, é escolhido pelo
+banco em uso.
+
+O texto é normalizado sem acentos e em minúsculas, então "cafe" encontra
+"Café". O índice é atualizado pelos sinais em local_businesses.signals.
+"""
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Sum
+from django.utils.module_loading import import_string
+
+# Resultados considerados por busca; limita o custo do ranking. Os filtros da
+# listagem vão em search(queryset=...) para valerem antes do limite
+SEARCH_RESULT_LIMIT = 500
+
+# Peso de cada campo no ranking
+FIELD_WEIGHTS = {
+    'name': 10,
+    'category': 5,
+    'address': 2,
+    'description': 1,
+}
+
+STOPWORDS = {
+    'a', 'ao', 'aos', 'as', 'com', 'da', 'das', 'de', 'do', 'dos', 'e', 'em',
+    'na', 'nas', 'no', 'nos', 'o', 'os', 'ou', 'para', 'por', 'um', 'uma',
+}
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def normalize(text):
+    """Remove acentos e converte para minúsculas"""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def tokenize(text):
+    """Divide o texto normalizado em termos, ignorando stopwords"""
+    return [t for t in TOKEN_RE.findall(normalize(text)) if t not in STOPWORDS]
+
+
+def business_fields(business):
+    """Textos indexados de um negócio, por campo"""
+    return {
+        'name': business.name,
+        'description': business.description,
+        'category': business.category.name if business.category_id else '',
+        'address': business.address,
+    }
+
+
+class BaseSearchBackend:
+    def index(self, business):
+        raise NotImplementedError
+
+    def remove(self, business_id):
+        raise NotImplementedError
+
+    def search(self, query, limit=SEARCH_RESULT_LIMIT, queryset=None):
+        """Retorna [(business_id, score)] do mais relevante ao menos relevante
+
+        queryset (de Business) restringe os candidatos antes do limite.
+        """
+        raise NotImplementedError
+
+    def rebuild(self, businesses):
+        for business in businesses:
+            self.index(business)
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """Índice FTS5 do SQLite; o rowid da tabela é o id do negócio"""
+
+    table = 'local_businesses_business_fts'
+    columns = ('name', 'description', 'category', 'address')
+
+    def index(self, business):
+        fields = business_fields(business)
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [business.pk])
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, name, description, category, address) '
+                f'VALUES (%s, %s, %s, %s, %s)',
+                [business.pk] + [normalize(fields[c]) for c in self.columns],
+            )
+
+    def remove(self, business_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [business_id])
+
+    def search(self, query, limit=SEARCH_RESULT_LIMIT, queryset=None):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        # Termos entre aspas evitam que a entrada seja lida como sintaxe FTS
+        match = ' AND '.join(f'"{t}"*' for t in tokens)
+        weights = ', '.join(str(FIELD_WEIGHTS[c]) for c in self.columns)
+        restriction, params = '', []
+        if queryset is not None:
+            sql, params = queryset.order_by().values('id').query.sql_with_params()
+            restriction = f'AND rowid IN ({sql}) '
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, bm25({self.table}, {weights}) AS score FROM {self.table} '
+                f'WHERE {self.table} MATCH %s {restriction}ORDER BY score LIMIT %s',
+                [match, *params, limit],
+            )
+            # bm25 é negativo: quanto menor, mais relevante
+            return [(pk, -score) for pk, score in cursor.fetchall()]
+
+
+class InvertedIndexBackend(BaseSearchBackend):
+    """Índice invertido portável em BusinessSearchTerm"""
+
+    def index(self, business):
+        from .models import BusinessSearchTerm
+
+        weights = {}
+        for field, text in business_fields(business).items():
+            for term in tokenize(text):
+                term = term[:BusinessSearchTerm._meta.get_field('term').max_length]
+                weights[term] = weights.get(term, 0) + FIELD_WEIGHTS[field]
+        BusinessSearchTerm.objects.filter(business_id=business.pk).delete()
+        BusinessSearchTerm.objects.bulk_create([
+            BusinessSearchTerm(business_id=business.pk, term=term, weight=weight)
+            for term, weight in weights.items()
+        ])
+
+    def remove(self, business_id):
+        from .models import BusinessSearchTerm
+
+        BusinessSearchTerm.objects.filter(business_id=business_id).delete()
+
+    def search(self, query, limit=SEARCH_RESULT_LIMIT, queryset=None):
+        from .models import BusinessSearchTerm
+
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        terms = BusinessSearchTerm.objects.all()
+        if queryset is not None:
+            terms = terms.filter(business__in=queryset.order_by().values('id'))
+        scores = None
+        for token in tokens:
+            # Cada termo da consulta casa por prefixo; todos precisam casar
+            rows = (terms.filter(term__startswith=token)
+                    .values('business_id').annotate(score=Sum('weight'))
+                    .values_list('business_id', 'score'))
+            token_scores = dict(rows)
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {pk: scores[pk] + score for pk, score in token_scores.items() if pk in scores}
+            if not scores:
+                return []
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit]
+
+
+_backend = None
+
+
+def get_backend():
+    """Backend configurado em SEARCH_BACKEND ou o padrão do banco em uso"""
+    global _backend
+    if _backend is None:
+        path = getattr(settings, 'SEARCH_BACKEND', None)
+        if path:
+            _backend = import_string(path)()
+        elif connection.vendor == 'sqlite':
+            _backend = SQLiteFTSBackend()
+        else:
+            _backend = InvertedIndexBackend()
+    return _backend
@@ -0,0 +1,167 @@
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from .models import (Booking, Business, BusinessCategory, BusinessHours, BusinessPhoto, BusinessPlan, Notification,
+                     PlanUpgradeRequest, Review, TimeSlot)
+from . import availability, conditional, entitlements, fragments, notifications, ratings, search, stats
+
+
+@receiver(post_save, sender=Business)
+def index_business(sender, instance, created, raw=False, **kwargs):
+    """Atualizar o índice de busca quando um negócio é salvo"""
+    if raw:
+        return
+    search.get_backend().index(instance)
+    if created:
+        stats.business_created(instance)
+        entitlements.invalidate(instance.user_id)
+
+
+@receiver(post_delete, sender=Business)
+def unindex_business(sender, instance, **kwargs):
+    search.get_backend().remove(instance.pk)
+    entitlements.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=BusinessPlan)
+@receiver(post_delete, sender=BusinessPlan)
+def invalidate_entitlements(sender, instance, **kwargs):
+    """Os limites do dono dependem do melhor plano entre os seus negócios"""
+    user_id = Business.objects.filter(pk=instance.business_id).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        entitlements.invalidate(user_id)
+
+
+@receiver(post_save, sender=BusinessCategory)
+def reindex_category(sender, instance, created, raw=False, **kwargs):
+    """O nome da categoria faz parte do índice dos negócios dela"""
+    if raw or created:
+        return
+    search.get_backend().rebuild(instance.business_set.select_related('category'))
+
+
+@receiver(post_save, sender=Review)
+def update_rating_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    ratings.review_saved(instance, created)
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_on_delete(sender, instance, **kwargs):
+    ratings.review_deleted(instance)
+
+
+@receiver(post_save, sender=Notification)
+def count_notification(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        notifications.notification_created(instance)
+    else:
+        notifications.invalidate_for_businesses([instance.business_id])
+    stats.notification_saved(instance, created)
+
+
+@receiver(post_delete, sender=Notification)
+def uncount_notification(sender, instance, **kwargs):
+    notifications.invalidate_for_businesses([instance.business_id])
+    stats.notification_deleted(instance)
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def invalidate_booking_availability(sender, instance, **kwargs):
+    """Reservas alteram apenas a disponibilidade da própria data"""
+    availability.invalidate_date(instance.business_id, instance.booking_date)
+    previous = getattr(instance, '_loaded_booking_date', None)
+    if previous and previous != instance.booking_date:
+        availability.invalidate_date(instance.business_id, previous)
+    instance._loaded_booking_date = instance.booking_date
+
+
+@receiver(post_save, sender=TimeSlot)
+@receiver(post_delete, sender=TimeSlot)
+@receiver(post_save, sender=BusinessHours)
+@receiver(post_delete, sender=BusinessHours)
+def invalidate_schedule_availability(sender, instance, **kwargs):
+    availability.invalidate_business(instance.business_id)
+
+
+@receiver(post_save, sender=Booking)
+def count_booking(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    stats.booking_saved(instance, created)
+
+
+@receiver(post_delete, sender=Booking)
+def uncount_booking(sender, instance, **kwargs):
+    stats.booking_deleted(instance)
+
+
+@receiver(post_save, sender=BusinessPhoto)
+def count_photo(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        stats.apply_delta(instance.business_id, photo_count=1)
+
+
+@receiver(post_delete, sender=BusinessPhoto)
+def uncount_photo(sender, instance, **kwargs):
+    stats.apply_delta(instance.business_id, photo_count=-1)
+
+
+@receiver(post_save, sender=PlanUpgradeRequest)
+def count_upgrade(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    stats.upgrade_saved(instance, created)
+
+
+@receiver(post_delete, sender=PlanUpgradeRequest)
+def uncount_upgrade(sender, instance, **kwargs):
+    stats.upgrade_deleted(instance)
+
+
+@receiver(post_save, sender=Business)
+@receiver(post_delete, sender=Business)
+@receiver(post_save, sender=BusinessPlan)
+@receiver(post_delete, sender=BusinessPlan)
+@receiver(post_save, sender=BusinessPhoto)
+@receiver(post_delete, sender=BusinessPhoto)
+@receiver(post_save, sender=BusinessHours)
+@receiver(post_delete, sender=BusinessHours)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_business_fragments(sender, instance, **kwargs):
+    """Cartão, detalhes e avaliações em cache dependem do negócio e dos objetos ligados a ele"""
+    fragments.invalidate('business', instance.pk if sender is Business else instance.business_id)
+
+
+@receiver(post_save, sender=BusinessPlan)
+@receiver(post_delete, sender=BusinessPlan)
+@receiver(post_save, sender=BusinessPhoto)
+@receiver(post_delete, sender=BusinessPhoto)
+@receiver(post_save, sender=BusinessHours)
+@receiver(post_delete, sender=BusinessHours)
+def touch_business(sender, instance, raw=False, **kwargs):
+    """Plano, fotos e horários aparecem nas listagens: o ETag delas segue Business.updated_at"""
+    if not raw:
+        conditional.touch_businesses([instance.business_id])
+
+
+@receiver(post_save, sender=BusinessCategory)
+def invalidate_category_fragments(sender, instance, created, raw=False, **kwargs):
+    fragments.invalidate('categories')
+    if not created:
+        # O nome da categoria aparece nos cartões dos negócios dela
+        business_ids = list(instance.business_set.values_list('id', flat=True))
+        fragments.invalidate_businesses(business_ids)
+        conditional.touch_businesses(business_ids)
+
+
+@receiver(pre_delete, sender=BusinessCategory)
+def invalidate_deleted_category_fragments(sender, instance, **kwargs):
+    fragments.invalidate('categories')
+    business_ids = list(instance.business_set.values_list('id', flat=True))
+    fragments.invalidate_businesses(business_ids)
+    conditional.touch_businesses(business_ids)
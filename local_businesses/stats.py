@@ -0,0 +1,133 @@
+"""Contadores do painel do negócio em BusinessStats.
+
+Funciona como uma view materializada: cada negócio tem uma linha com os
+totais de fotos, reservas, reservas pendentes, notificações não lidas e
+upgrades pendentes. Os sinais em local_businesses.signals aplicam diferenças
+com F(), sem recontar; rebuild() recalcula tudo a partir das tabelas. As
+avaliações continuam em Business.review_count/avg_rating (local_businesses.ratings).
+"""
+from django.db.models import Count, F, Q
+
+from .models import Booking, Business, BusinessPhoto, BusinessStats, Notification, PlanUpgradeRequest
+
+FIELDS = ('photo_count', 'booking_count', 'pending_booking_count', 'unread_notification_count',
+          'pending_upgrade_count')
+
+
+def apply_delta(business_id, **deltas):
+    """Soma as diferenças aos contadores do negócio, ex.: apply_delta(1, photo_count=1)"""
+    deltas = {field: int(delta) for field, delta in deltas.items() if delta}
+    if deltas:
+        BusinessStats.objects.filter(pk=business_id).update(
+            **{field: F(field) + delta for field, delta in deltas.items()})
+
+
+def business_created(business):
+    BusinessStats.objects.get_or_create(business=business)
+
+
+def _status_delta(previous, current, status):
+    return (current == status) - (previous == status)
+
+
+def booking_saved(booking, created):
+    if created:
+        apply_delta(booking.business_id, booking_count=1, pending_booking_count=booking.status == 'pending')
+    else:
+        previous = getattr(booking, '_loaded_status', None)
+        if previous is not None:
+            apply_delta(booking.business_id,
+                        pending_booking_count=_status_delta(previous, booking.status, 'pending'))
+    booking._loaded_status = booking.status
+
+
+def booking_deleted(booking):
+    status = getattr(booking, '_loaded_status', None) or booking.status
+    apply_delta(booking.business_id, booking_count=-1, pending_booking_count=-(status == 'pending'))
+
+
+def notification_saved(notification, created):
+    previous = True if created else getattr(notification, '_loaded_is_read', None)
+    if previous is not None:
+        apply_delta(notification.business_id,
+                    unread_notification_count=(not notification.is_read) - (not previous))
+    notification._loaded_is_read = notification.is_read
+
+
+def notification_deleted(notification):
+    is_read = getattr(notification, '_loaded_is_read', None)
+    if is_read is None:
+        is_read = notification.is_read
+    apply_delta(notification.business_id, unread_notification_count=-(not is_read))
+
+
+def upgrade_saved(upgrade, created):
+    previous = None if created else getattr(upgrade, '_loaded_status', None)
+    if created or previous is not None:
+        apply_delta(upgrade.business_id,
+                    pending_upgrade_count=_status_delta(previous, upgrade.status, 'pending'))
+    upgrade._loaded_status = upgrade.status
+
+
+def upgrade_deleted(upgrade):
+    status = getattr(upgrade, '_loaded_status', None) or upgrade.status
+    apply_delta(upgrade.business_id, pending_upgrade_count=-(status == 'pending'))
+
+
+def _counts(queryset, **aggregates):
+    rows = queryset.order_by().values('business_id').annotate(**aggregates)
+    return {row.pop('business_id'): row for row in rows}
+
+
+def expected_stats(business_ids=None):
+    """{business_id: {campo: valor}} calculado das tabelas de origem"""
+    scope = {} if business_ids is None else {'business_id__in': business_ids}
+    sources = [
+        _counts(BusinessPhoto.objects.filter(**scope), photo_count=Count('id')),
+        _counts(Booking.objects.filter(**scope), booking_count=Count('id'),
+                pending_booking_count=Count('id', filter=Q(status='pending'))),
+        _counts(Notification.objects.filter(is_read=False, **scope), unread_notification_count=Count('id')),
+        _counts(PlanUpgradeRequest.objects.filter(status='pending', **scope), pending_upgrade_count=Count('id')),
+    ]
+    if business_ids is None:
+        business_ids = Business.objects.values_list('id', flat=True)
+    expected = {}
+    for pk in business_ids:
+        values = dict.fromkeys(FIELDS, 0)
+        for source in sources:
+            values.update(source.get(pk, {}))
+        expected[pk] = values
+    return expected
+
+
+def get_or_rebuild(business):
+    """Linha de estatísticas do negócio, recalculada se ainda não existir"""
+    try:
+        return business.stats
+    except BusinessStats.DoesNotExist:
+        values = expected_stats([business.pk])[business.pk]
+        stats, _ = BusinessStats.objects.update_or_create(business=business, defaults=values)
+        return stats
+
+
+def rebuild(batch_size=1000, dry_run=False):
+    """Recalcula as estatísticas de todos os negócios; retorna os ids divergentes"""
+    expected = expected_stats()
+    current = {stats.pk: stats for stats in BusinessStats.objects.all().iterator(chunk_size=batch_size)}
+    mismatched = []
+    changed = []
+    created = []
+    for pk, values in expected.items():
+        stats = current.get(pk)
+        if stats is None:
+            mismatched.append(pk)
+            created.append(BusinessStats(business_id=pk, **values))
+        elif any(getattr(stats, field) != value for field, value in values.items()):
+            mismatched.append(pk)
+            for field, value in values.items():
+                setattr(stats, field, value)
+            changed.append(stats)
+    if not dry_run:
+        BusinessStats.objects.bulk_create(created, batch_size=batch_size)
+        BusinessStats.objects.bulk_update(changed, list(FIELDS), batch_size=batch_size)
+    return mismatched
@@ -0,0 +1,17 @@
+from django import template
+
+from local_businesses import fragments
+
+register = template.Library()
+
+
+@register.filter
+def business_version(business):
+    """Versão do negócio para a chave do {% cache %}; usa a carregada por attach_versions se houver"""
+    cached = getattr(business, 'cache_version', None)
+    return fragments.cache_key(cached if cached is not None else fragments.version('business', business.pk))
+
+
+@register.simple_tag
+def fragment_version(kind):
+    return fragments.cache_key(fragments.version(kind))
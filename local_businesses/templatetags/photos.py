@@ -0,0 +1,25 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+from local_businesses import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_photo(photo, sizes='100vw', **attrs):
+    """<picture> com as miniaturas WebP/JPEG da foto em srcset; a original enquanto não forem geradas"""
+    attrs.setdefault('loading', 'lazy')
+    attrs.setdefault('decoding', 'async')
+    if not photo.thumbnail_widths:
+        return format_html('<img src="{}"{}>', photo.image.url, flatatt(attrs))
+
+    widths = photo.thumbnail_widths
+    fallback = thumbnails.url(photo, widths[len(widths) // 2], 'jpeg')
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}"{}></picture>',
+        thumbnails.srcset(photo, 'webp'), sizes,
+        fallback, thumbnails.srcset(photo, 'jpeg'), sizes, flatatt(attrs),
+    )
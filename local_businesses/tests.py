@@ -1,3 +1,1386 @@
-from django.test import TestCase
+import logging
+import tempfile
+import threading
+import time as time_module
+from datetime import date, time, timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.template import Context, Template
+from django.test import TestCase, TransactionTestCase, override_settings, tag
+from django.test.utils import CaptureQueriesContext
+from django.http import QueryDict
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from accounts.models import Profile
+from billing.models import Plan
+from monitoring.metrics import QueryBudgetExceeded
+
+from . import (admin_stats, availability, bookings, datagen, dispatch, entitlements, fragments, geo, load_test,
+               pagination, ratings, search, stats, thumbnails)
+from .models import (Booking, Business, BusinessCategory, BusinessHours, BusinessPhoto, BusinessPlan, BusinessStats,
+                     Notification, PlanUpgradeRequest, QueuedNotification, Review, TimeSlot)
+
+logger = logging.getLogger(__name__)
+
+
+class ListingQueryCountTests(TestCase):
+    """As listagens não podem fazer consultas por negócio (N+1)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', password='senha123')
+        cls.category = BusinessCategory.objects.create(name='Restaurantes')
+
+    def create_businesses(self, count):
+        for i in range(count):
+            business = Business.objects.create(
+                user=self.owner,
+                name=f'Negócio {i}',
+                description='Descrição',
+                business_type='commerce',
+                category=self.category,
+                address='Rua A',
+            )
+            BusinessPhoto.objects.create(business=business, image=f'business_photos/{i}.jpg', is_primary=True)
+            BusinessPhoto.objects.create(business=business, image=f'business_photos/{i}-b.jpg')
+
+    def count_queries(self, url):
+        # Medir sem os fragmentos em cache (o caso mais caro)
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def assertConstantQueries(self, url):
+        self.create_businesses(1)
+        baseline = self.count_queries(url)
+        self.create_businesses(5)
+        self.assertEqual(self.count_queries(url), baseline)
+
+    def test_business_list(self):
+        self.assertConstantQueries(reverse('local_businesses:business_list'))
+
+    def test_nearby_businesses(self):
+        self.assertConstantQueries(reverse('local_businesses:nearby_businesses'))
+
+    def test_home(self):
+        self.assertConstantQueries(reverse('home'))
+
+    def test_primary_photo_is_rendered(self):
+        self.create_businesses(1)
+        response = self.client.get(reverse('local_businesses:business_list'))
+        self.assertContains(response, '/media/business_photos/0.jpg')
+        self.assertNotContains(response, '/media/business_photos/0-b.jpg')
+
+
+class GeoTests(TestCase):
+    """Busca por proximidade pela grade: raio, k mais próximos e parâmetros inválidos"""
+
+    # Recife Antigo e distâncias aproximadas a partir dele
+    CENTER = (-8.0630, -34.8720)
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user('owner')
+        cls.places = {}
+        for name, lat, lng in [('perto', -8.0640, -34.8730),      # ~0,2 km
+                               ('bairro', -8.1130, -34.8900),     # ~5,9 km
+                               ('olinda', -8.0089, -34.8553),     # ~6,3 km
+                               ('caruaru', -8.2760, -35.9760),    # ~124 km
+                               ('sao_paulo', -23.5505, -46.6333)]:
+            cls.places[name] = Business.objects.create(
+                user=owner, name=name, description='Descrição', business_type='commerce', address='Rua A',
+                latitude=lat, longitude=lng)
+        Business.objects.create(user=owner, name='sem coordenadas', description='Descrição',
+                                business_type='commerce', address='Rua A')
+
+    def names(self, ranked):
+        by_id = {business.pk: name for name, business in self.places.items()}
+        return [by_id[pk] for _, pk in ranked]
+
+    def test_grid_cell(self):
+        self.assertEqual(geo.grid_cell(-8.063, -34.872), (-162, -698))
+        self.assertEqual(geo.grid_cell(0, 0), (0, 0))
+        # Células cobrem [n * GRID_CELL_DEGREES, (n + 1) * GRID_CELL_DEGREES)
+        self.assertEqual(geo.grid_cell(-0.0001, 0.0499), (-1, 0))
+        self.assertEqual(geo.grid_cell(None, -34.872), (None, None))
+        self.assertEqual(Business.objects.get(name='perto').grid_row, -162)
+
+    def test_within_radius(self):
+        ranked = geo.within_radius(Business.objects.all(), *self.CENTER, 10)
+        self.assertEqual(self.names(ranked), ['perto', 'bairro', 'olinda'])
+        self.assertEqual([distance for distance, _ in ranked], sorted(distance for distance, _ in ranked))
+        self.assertEqual(self.names(geo.within_radius(Business.objects.all(), *self.CENTER, 1)), ['perto'])
+        self.assertEqual(self.names(geo.within_radius(Business.objects.all(), *self.CENTER, 200)),
+                         ['perto', 'bairro', 'olinda', 'caruaru'])
+
+    def test_nearest_widens_the_radius(self):
+        self.assertEqual(self.names(geo.nearest(Business.objects.all(), *self.CENTER, 2)), ['perto', 'bairro'])
+        self.assertEqual(self.names(geo.nearest(Business.objects.all(), *self.CENTER, 4)),
+                         ['perto', 'bairro', 'olinda', 'caruaru'])
+        # Nunca além de max_radius_km
+        self.assertEqual(len(geo.nearest(Business.objects.all(), *self.CENTER, 10)), 4)
+        self.assertEqual(geo.nearest(Business.objects.all(), *self.CENTER, 0), [])
+
+    def test_parse_radius(self):
+        for value, expected in [('5', 5), ('0.5', 0.5), ('1000', geo.MAX_RADIUS_KM), ('inf', geo.DEFAULT_RADIUS_KM),
+                                ('nan', geo.DEFAULT_RADIUS_KM), ('-inf', geo.DEFAULT_RADIUS_KM),
+                                ('-3', geo.DEFAULT_RADIUS_KM), ('0', geo.DEFAULT_RADIUS_KM),
+                                ('abc', geo.DEFAULT_RADIUS_KM), ('', geo.DEFAULT_RADIUS_KM)]:
+            with self.subTest(radius=value):
+                self.assertEqual(geo.parse_radius(QueryDict(f'radius={value}')), expected)
+        self.assertEqual(geo.parse_radius(QueryDict()), geo.DEFAULT_RADIUS_KM)
+
+    def test_parse_coordinates(self):
+        self.assertEqual(geo.parse_coordinates(QueryDict('lat=-8.06&lng=-34.87')), (-8.06, -34.87))
+        for query in ['lat=nan&lng=0', 'lat=0&lng=inf', 'lat=91&lng=0', 'lat=0&lng=-181', 'lat=x&lng=0', 'lat=0']:
+            with self.subTest(query=query):
+                self.assertIsNone(geo.parse_coordinates(QueryDict(query)))
+
+    def test_nearby_view_with_invalid_parameters(self):
+        url = reverse('local_businesses:nearby_businesses')
+        for radius in ['nan', '-inf', 'inf', '-5', 'abc']:
+            with self.subTest(radius=radius):
+                response = self.client.get(url, {'lat': self.CENTER[0], 'lng': self.CENTER[1], 'radius': radius})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual([b.name for b in response.context['businesses']], ['perto', 'bairro', 'olinda'])
+
+
+class SearchTests(TestCase):
+    """Os dois backends de busca, o limite aplicado depois dos filtros e a manutenção pelos sinais"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner')
+        cls.category = BusinessCategory.objects.create(name='Restaurantes')
+        cls.cafe = cls.create('Café Central', 'Cafés especiais e bolos', 'Rua da Aurora')
+        cls.pizza = cls.create('Pizzaria Bella', 'Pizza no forno a lenha', 'Av. Boa Viagem')
+        cls.bar = cls.create('Bar do Zé', 'Petiscos e café coado', 'Rua do Bom Jesus', business_type='service')
+
+    @classmethod
+    def create(cls, name, description, address, business_type='commerce', category=None):
+        return Business.objects.create(user=cls.owner, name=name, description=description, address=address,
+                                       business_type=business_type, category=category or cls.category)
+
+    def backends(self):
+        inverted = search.InvertedIndexBackend()
+        inverted.rebuild(Business.objects.select_related('category'))
+        return [search.SQLiteFTSBackend(), inverted]
+
+    def ids(self, backend, query, **kwargs):
+        return [pk for pk, _ in backend.search(query, **kwargs)]
+
+    def test_ranking_and_normalization(self):
+        for backend in self.backends():
+            with self.subTest(backend=type(backend).__name__):
+                # Nome pesa mais que descrição; acentos e caixa não importam; prefixos casam
+                self.assertEqual(self.ids(backend, 'CAFE'), [self.cafe.pk, self.bar.pk])
+                self.assertEqual(self.ids(backend, 'pizz'), [self.pizza.pk])
+                self.assertEqual(self.ids(backend, 'restaurantes aurora'), [self.cafe.pk])
+                self.assertEqual(self.ids(backend, 'cafe pizza'), [])
+                self.assertEqual(self.ids(backend, 'de "e" *'), [])
+                self.assertEqual(self.ids(backend, 'cafe', limit=1), [self.cafe.pk])
+
+    def test_queryset_filters_apply_before_limit(self):
+        services = Business.objects.filter(business_type='service')
+        for backend in self.backends():
+            with self.subTest(backend=type(backend).__name__):
+                self.assertEqual(self.ids(backend, 'cafe', limit=1, queryset=services), [self.bar.pk])
+
+    def test_filtered_listing_keeps_low_ranked_matches(self):
+        Business.objects.bulk_create([
+            Business(user=self.owner, name=f'Café {i}', description='Café', address='Rua A',
+                     business_type='commerce', category=self.category)
+            for i in range(search.SEARCH_RESULT_LIMIT)
+        ])
+        search.get_backend().rebuild(Business.objects.select_related('category'))
+        response = self.client.get(reverse('local_businesses:business_list'), {'q': 'cafe', 'type': 'service'})
+        self.assertEqual([business.pk for business in response.context['businesses']], [self.bar.pk])
+
+    def test_index_follows_signals(self):
+        backend = search.get_backend()
+        business = self.create('Sorveteria Gelato', 'Sorvetes artesanais', 'Rua B')
+        self.assertEqual(self.ids(backend, 'gelato'), [business.pk])
+
+        business.name = 'Sorveteria Polar'
+        business.save()
+        self.assertEqual(self.ids(backend, 'gelato'), [])
+        self.assertEqual(self.ids(backend, 'polar'), [business.pk])
+
+        self.category.name = 'Docerias'
+        self.category.save()
+        self.assertIn(business.pk, self.ids(backend, 'docerias'))
+        self.assertEqual(self.ids(backend, 'restaurantes'), [])
+
+        business.delete()
+        self.assertEqual(self.ids(backend, 'polar'), [])
+
+
+class CursorPaginationTests(TestCase):
+    """Cursores válidos seguem para a próxima página; malformados nunca viram erro 500"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', password='senha123')
+        for i in range(5):
+            Business.objects.create(user=cls.admin, name=f'Negócio {i}', description='Descrição',
+                                    business_type='commerce', address='Rua A', latitude=-8.06 - i / 1000,
+                                    longitude=-34.87)
+
+    def bad_cursors(self, size, keyset=True):
+        values = [['abc'] * size, [None] * size, [[1]] * size, [{}] * size, [1.5, 'x', 'y'][:size],
+                  [1] * (size + 1), [1]]
+        if keyset:
+            # Fora da faixa de inteiros do banco; a lista em memória compara sem erro
+            values.append([10 ** 30] * size)
+        # Base64 inválido, "not json", {"a":1} e listas com tipos errados
+        return ['@@@', 'bm90IGpzb24', 'eyJhIjoxfQ',
+                *(pagination.encode_cursor(v) for v in values)]
+
+    def test_keyset_pages_follow_each_other(self):
+        paginator = pagination.KeysetPaginator(Business.objects.all(), ('-avg_rating', '-id'), 2)
+        seen, cursor = [], None
+        while True:
+            page = paginator.page(cursor)
+            seen += [business.pk for business in page]
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, list(Business.objects.order_by('-id').values_list('id', flat=True)))
+
+    def test_ranked_pages_follow_each_other(self):
+        ranked = [(0.5, 3), (0.5, 7), (1.25, 2), (4, 1)]
+        first = pagination.paginate_ranked(ranked, None, 3)
+        self.assertEqual(first.object_list, ranked[:3])
+        self.assertEqual(pagination.paginate_ranked(ranked, first.next_cursor, 3).object_list, ranked[3:])
+
+    def test_malformed_cursors_raise_invalid_cursor(self):
+        paginator = pagination.KeysetPaginator(Business.objects.all(), ('-avg_rating', '-id'), 2)
+        for cursor in self.bad_cursors(2):
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(pagination.InvalidCursor):
+                    paginator.page(cursor)
+        for cursor in self.bad_cursors(2, keyset=False):
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(pagination.InvalidCursor):
+                    pagination.paginate_ranked([(0.5, 1)], cursor, 2)
+
+    def test_views_reject_malformed_cursors(self):
+        self.client.force_login(self.admin)
+        near = {'lat': -8.06, 'lng': -34.87}
+        for size, keyset, url, params, status in [
+            (2, True, reverse('local_businesses:business_list'), {}, 302),
+            (3, True, reverse('local_businesses:nearby_businesses'), {}, 302),
+            (2, False, reverse('local_businesses:nearby_businesses'), near, 302),
+            (2, False, reverse('local_businesses:business_list'), {'q': 'negocio'}, 302),
+            (2, True, reverse('local_businesses:business_api'), {}, 400),
+            (2, False, reverse('local_businesses:business_api'), {'nearby': '1', **near}, 400),
+            (2, True, reverse('local_businesses:admin_users_api'), {}, 400),
+        ]:
+            for cursor in self.bad_cursors(size, keyset):
+                with self.subTest(url=url, params=params, cursor=cursor):
+                    self.assertEqual(self.client.get(url, {**params, 'cursor': cursor}).status_code, status)
+
+
+@override_settings(NOTIFICATION_DIGEST_WINDOW=60,
+                   NOTIFICATION_CHANNELS=['local_businesses.dispatch.InAppChannel'])
+class RatingAggregateTests(TestCase):
+    """Agregados de avaliação em Business: sinais, view, save() desatualizado e reconstrução"""
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user('owner')
+        cls.customers = [User.objects.create_user(f'cliente{i}', password='senha123') for i in range(3)]
+        cls.business = Business.objects.create(user=owner, name='Padaria', description='Descrição',
+                                                business_type='commerce', address='Rua A')
+
+    def assertAggregates(self, count, total, business=None):
+        business = Business.objects.get(pk=(business or self.business).pk)
+        self.assertEqual((business.review_count, business.rating_sum), (count, total))
+        self.assertAlmostEqual(business.avg_rating, total / count if count else 0)
+
+    def review(self, customer, rating):
+        return Review.objects.create(business=self.business, user=customer, rating=rating)
+
+    def test_create_edit_and_delete(self):
+        first = self.review(self.customers[0], 5)
+        self.review(self.customers[1], 2)
+        self.assertAggregates(2, 7)
+
+        first.rating = 3
+        first.save()
+        self.assertAggregates(2, 5)
+        # Salvar de novo sem mudar a nota não altera nada
+        first.save()
+        self.assertAggregates(2, 5)
+
+        Review.objects.get(pk=first.pk).delete()
+        self.assertAggregates(1, 2)
+        Review.objects.all().delete()
+        self.assertAggregates(0, 0)
+
+    def test_add_review_view(self):
+        self.client.login(username='cliente0', password='senha123')
+        url = reverse('local_businesses:add_review', args=[self.business.pk])
+        self.client.post(url, {'rating': 4, 'comment': 'Bom'})
+        self.assertAggregates(1, 4)
+        # Segunda avaliação do mesmo usuário edita a primeira
+        self.client.post(url, {'rating': 2, 'comment': 'Piorou'})
+        self.assertAggregates(1, 2)
+        self.assertEqual(Review.objects.get().comment, 'Piorou')
+
+    def test_stale_business_save_keeps_the_aggregates(self):
+        stale = Business.objects.get(pk=self.business.pk)
+        self.review(self.customers[0], 5)
+        stale.name = 'Padaria Nova'
+        stale.save()
+        self.assertAggregates(1, 5)
+        self.assertEqual(Business.objects.get(pk=self.business.pk).name, 'Padaria Nova')
+
+    def test_rebuild_fixes_drifted_aggregates(self):
+        other = Business.objects.create(user=self.customers[2], name='Oficina', description='Descrição',
+                                        business_type='service', address='Rua B')
+        self.review(self.customers[0], 4)
+        self.review(self.customers[1], 5)
+        Business.objects.filter(pk=self.business.pk).update(review_count=7, rating_sum=1, avg_rating=0.1)
+        Business.objects.filter(pk=other.pk).update(review_count=1, rating_sum=3, avg_rating=3.0)
+
+        out = StringIO()
+        call_command('rebuild_rating_aggregates', '--verify', stdout=out)
+        self.assertIn('2 businesses out of date', out.getvalue())
+        # --verify só relata
+        self.assertEqual(Business.objects.get(pk=self.business.pk).review_count, 7)
+
+        out = StringIO()
+        call_command('rebuild_rating_aggregates', '--batch-size', '1', stdout=out)
+        self.assertIn('2 businesses updated', out.getvalue())
+        self.assertAggregates(2, 9)
+        self.assertAggregates(0, 0, other)
+        self.assertEqual(ratings.rebuild(), [])
+
+
+class BusinessStatsTests(TestCase):
+    """Contadores do painel em BusinessStats: diferenças pelos sinais e reconstrução"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', password='senha123')
+        cls.customer = User.objects.create_user('cliente')
+        cls.business = Business.objects.create(user=cls.owner, name='Barbearia', description='Descrição',
+                                               business_type='service', address='Rua A')
+        cls.plan = Plan.objects.create(name='Pro', price=10, credits_per_month=0)
+
+    def assertStats(self, **expected):
+        stats_row = BusinessStats.objects.get(business=self.business)
+        self.assertEqual({field: getattr(stats_row, field) for field in expected}, expected)
+        # As diferenças aplicadas batem com a recontagem
+        self.assertEqual(stats.rebuild(dry_run=True), [])
+
+    def test_booking_deltas(self):
+        booking = Booking.objects.create(business=self.business, user=self.customer, service_name='Corte',
+                                         booking_date=date.today(), booking_time=time(10))
+        Booking.objects.create(business=self.business, user=self.customer, service_name='Barba',
+                               booking_date=date.today(), booking_time=time(11), status='confirmed')
+        self.assertStats(booking_count=2, pending_booking_count=1)
+        booking.status = 'confirmed'
+        booking.save()
+        self.assertStats(booking_count=2, pending_booking_count=0)
+        booking.status = 'pending'
+        booking.save()
+        Booking.objects.get(pk=booking.pk).delete()
+        self.assertStats(booking_count=1, pending_booking_count=0)
+
+    def test_photo_deltas(self):
+        photos = [BusinessPhoto.objects.create(business=self.business, image=f'business_photos/{i}.jpg')
+                  for i in range(2)]
+        self.assertStats(photo_count=2)
+        photos[0].delete()
+        self.assertStats(photo_count=1)
+
+    def test_upgrade_deltas(self):
+        upgrade = PlanUpgradeRequest.objects.create(business=self.business, requested_plan='pro',
+                                                    billing_plan=self.plan)
+        self.assertStats(pending_upgrade_count=1)
+        upgrade.status = 'approved'
+        upgrade.save()
+        self.assertStats(pending_upgrade_count=0)
+        PlanUpgradeRequest.objects.create(business=self.business, requested_plan='premium', billing_plan=self.plan)
+        PlanUpgradeRequest.objects.filter(status='pending').get().delete()
+        self.assertStats(pending_upgrade_count=0)
+
+    def test_get_or_rebuild_recreates_a_missing_row(self):
+        Booking.objects.create(business=self.business, user=self.customer, service_name='Corte',
+                               booking_date=date.today(), booking_time=time(10))
+        BusinessStats.objects.filter(business=self.business).delete()
+        business = Business.objects.get(pk=self.business.pk)
+        stats_row = stats.get_or_rebuild(business)
+        self.assertEqual((stats_row.booking_count, stats_row.pending_booking_count), (1, 1))
+        self.assertTrue(BusinessStats.objects.filter(business=self.business).exists())
+
+    def test_rebuild_command(self):
+        BusinessStats.objects.filter(business=self.business).update(photo_count=5)
+        out = StringIO()
+        call_command('rebuild_business_stats', stdout=out)
+        self.assertIn('1 businesses updated', out.getvalue())
+        self.assertStats(photo_count=0)
+
+    def test_dashboard_reads_the_stats_row(self):
+        Booking.objects.create(business=self.business, user=self.customer, service_name='Corte',
+                               booking_date=date.today(), booking_time=time(10))
+        self.client.login(username='owner', password='senha123')
+        url = reverse('local_businesses:business_dashboard')
+        # Primeira visita aquece o contador de não lidas do menu
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual((response.context['total_bookings'], response.context['pending_bookings_count']), (1, 1))
+        sql = [query['sql'] for query in queries]
+        recounts = [q for q in sql if 'COUNT(' in q and any(
+            f'FROM "local_businesses_{table}"' in q for table in ('booking', 'businessphoto', 'planupgraderequest'))]
+        self.assertEqual(recounts, [])
+        # A linha de estatísticas vem junto com os negócios do dono
+        self.assertFalse([q for q in sql if 'FROM "local_businesses_businessstats"' in q])
+
+
+class EntitlementsTests(TestCase):
+    """Limites do dono pelo melhor plano dos seus negócios, em cache por usuário"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', password='senha123')
+        Profile.objects.create(user=cls.owner)
+        cls.business = Business.objects.create(user=cls.owner, name='Loja', description='Descrição',
+                                               business_type='commerce', address='Rua A')
+        cls.plan = entitlements.apply_plan(BusinessPlan(business=cls.business), 'free')
+        cls.plan.save()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_lookup_is_one_query_and_cached(self):
+        with self.assertNumQueries(1):
+            user_entitlements = entitlements.for_user(self.owner)
+        self.assertEqual((user_entitlements.plan_type, user_entitlements.business_count), ('free', 1))
+        with self.assertNumQueries(0):
+            entitlements.for_user(self.owner)
+
+    def test_plan_change_invalidates_the_cache(self):
+        self.assertFalse(entitlements.for_user(self.owner).can_add_business)
+        entitlements.apply_plan(self.plan, 'pro').save()
+        user_entitlements = entitlements.for_user(self.owner)
+        self.assertEqual((user_entitlements.plan_type, user_entitlements.max_businesses), ('pro', 3))
+        self.assertTrue(user_entitlements.can_add_business)
+
+        # O melhor plano entre os negócios vale para o dono
+        second = Business.objects.create(user=self.owner, name='Filial', description='Descrição',
+                                         business_type='commerce', address='Rua B')
+        entitlements.apply_plan(BusinessPlan(business=second), 'premium').save()
+        self.assertEqual(entitlements.for_user(self.owner).plan_type, 'premium')
+        second.delete()
+        user_entitlements = entitlements.for_user(self.owner)
+        self.assertEqual((user_entitlements.plan_type, user_entitlements.business_count), ('pro', 1))
+
+    def test_business_limit_is_enforced(self):
+        self.client.login(username='owner', password='senha123')
+        url = reverse('local_businesses:register_business')
+        self.assertRedirects(self.client.get(url), reverse('local_businesses:business_list'),
+                             fetch_redirect_response=False)
+        entitlements.apply_plan(self.plan, 'pro').save()
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_apply_plan_copies_the_limits(self):
+        for plan_type, limits in entitlements.PLAN_LIMITS.items():
+            with self.subTest(plan_type=plan_type):
+                plan = entitlements.apply_plan(BusinessPlan(), plan_type)
+                self.assertEqual({field: getattr(plan, field) for field in limits}, limits)
+
+
+class AdminDashboardTests(TestCase):
+    """Painel administrativo: consultas constantes e totais em cache"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_superuser('admin', password='senha123')
+        cls.plan = Plan.objects.create(name='Pro', price=10, credits_per_month=0)
+
+    def setUp(self):
+        cache.clear()
+        self.client.login(username='admin', password='senha123')
+        self.url = reverse('local_businesses:admin_dashboard')
+
+    def add_data(self, count):
+        start = User.objects.count()
+        for i in range(start, start + count):
+            owner = User.objects.create_user(f'dono{i}')
+            business = Business.objects.create(user=owner, name=f'Negócio {i}', description='Descrição',
+                                               business_type='commerce', address='Rua A')
+            entitlements.apply_plan(BusinessPlan(business=business), 'free').save()
+            Review.objects.create(business=business, user=owner, rating=4)
+            Booking.objects.create(business=business, user=owner, service_name='Serviço',
+                                   booking_date=date.today(), booking_time=time(10))
+            PlanUpgradeRequest.objects.create(business=business, requested_plan='pro', billing_plan=self.plan)
+
+    def queries(self, cold_totals=False):
+        if cold_totals:
+            # Uma requisição antes, para as consultas de sessão e usuário não dependerem do cache vazio
+            self.client.get(self.url)
+            cache.delete(admin_stats.CACHE_KEY)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_query_count_does_not_grow_with_the_data(self):
+        counts = []
+        for size in (2, 10):
+            self.add_data(size)
+            response, count = self.queries(cold_totals=True)
+            self.assertEqual(response.context['total_businesses'], Business.objects.count())
+            counts.append(count)
+        self.assertEqual(counts[0], counts[1])
+
+    def test_totals_are_cached(self):
+        self.add_data(2)
+        response, cold = self.queries(cold_totals=True)
+        self.assertEqual((response.context['total_businesses'], response.context['total_bookings']), (2, 2))
+        self.add_data(1)
+        response, warm = self.queries()
+        self.assertEqual(warm, cold - 1)
+        self.assertEqual(response.context['total_businesses'], 2)
+        with self.assertNumQueries(0):
+            admin_stats.totals()
+
+    def test_totals_are_one_query(self):
+        self.add_data(3)
+        with self.assertNumQueries(1):
+            self.assertEqual(admin_stats.totals(), {'total_businesses': 3, 'total_users': 4, 'total_reviews': 3,
+                                                    'total_bookings': 3})
+
+
+class NotificationDispatchTests(TestCase):
+    """Fila de notificações: entrega imediata, resumos por janela e o comando worker"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', email='dono@example.com')
+        cls.customers = [User.objects.create_user(f'cliente{i}') for i in range(3)]
+        cls.business = Business.objects.create(user=cls.owner, name='Pousada', description='Descrição',
+                                               business_type='commerce', address='Rua A')
+
+    def setUp(self):
+        dispatch._channels = None
+        self.addCleanup(setattr, dispatch, '_channels', None)
+
+    def enqueue(self, notification_type, count=1, age=0, user=None):
+        items = [dispatch.enqueue(self.business, notification_type, f'Título {i}', f'Mensagem {i}',
+                                  user=user or self.customers[i % 3]) for i in range(count)]
+        if age:
+            QueuedNotification.objects.filter(pk__in=[item.pk for item in items]).update(
+                created_at=timezone.now() - timedelta(seconds=age))
+        return items
+
+    def test_enqueue_only_writes_the_queue(self):
+        self.enqueue('general')
+        self.assertEqual(QueuedNotification.objects.count(), 1)
+        self.assertFalse(Notification.objects.exists())
+
+    def test_immediate_types_are_delivered(self):
+        self.enqueue('general', 2)
+        self.assertEqual(dispatch.process_batch(), 2)
+        self.assertEqual(Notification.objects.filter(notification_type='general').count(), 2)
+        self.assertEqual(BusinessStats.objects.get(business=self.business).unread_notification_count, 2)
+        self.assertFalse(QueuedNotification.objects.filter(processed_at__isnull=True).exists())
+        self.assertEqual(dispatch.process_batch(), 0)
+
+    def test_digest_waits_for_the_window(self):
+        self.enqueue('review', 3)
+        self.assertEqual(dispatch.process_batch(), 0)
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual(dispatch.process_batch(flush=True), 3)
+        notification = Notification.objects.get()
+        self.assertEqual(notification.title, '3 novas avaliações')
+        self.assertIsNone(notification.user)
+        self.assertEqual(notification.message, 'Mensagem 0\nMensagem 1\nMensagem 2')
+
+    def test_group_is_delivered_once_its_oldest_item_is_ripe(self):
+        self.enqueue('review', 1, age=120)
+        self.enqueue('review', 1, user=self.customers[0])
+        self.assertEqual(dispatch.process_batch(), 2)
+        self.assertEqual(Notification.objects.get().title, '2 novas avaliações')
+
+    def test_single_item_keeps_its_own_text(self):
+        self.enqueue('booking', 1, age=120)
+        dispatch.process_batch()
+        notification = Notification.objects.get()
+        self.assertEqual((notification.title, notification.user), ('Título 0', self.customers[0]))
+
+    def test_waiting_digests_do_not_block_the_batch(self):
+        self.enqueue('review', 5)
+        self.enqueue('general')
+        self.assertEqual(dispatch.process_batch(batch_size=3), 1)
+        self.assertEqual(Notification.objects.get().notification_type, 'general')
+
+    @override_settings(NOTIFICATION_CHANNELS=['local_businesses.dispatch.InAppChannel',
+                                              'local_businesses.dispatch.EmailChannel'])
+    def test_email_is_sent_after_commit(self):
+        self.enqueue('general')
+        with self.captureOnCommitCallbacks(execute=True):
+            dispatch.process_batch()
+        self.assertEqual([message.to for message in mail.outbox], [['dono@example.com']])
+
+    def test_command_delivers_everything_and_purges(self):
+        old = self.enqueue('general')[0]
+        QueuedNotification.objects.filter(pk=old.pk).update(processed_at=timezone.now() - timedelta(days=8))
+        self.enqueue('general', 2)
+        self.enqueue('review', 2)
+        call_command('process_notifications', flush=True, stdout=StringIO())
+        self.assertFalse(QueuedNotification.objects.filter(pk=old.pk).exists())
+        self.assertFalse(QueuedNotification.objects.filter(processed_at__isnull=True).exists())
+        self.assertEqual(Notification.objects.count(), 3)
+
+
+class UnreadNotificationCounterTests(TestCase):
+    """Contador de não lidas do menu: cache por usuário, leitura e entrega"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', password='senha123')
+        cls.customer = User.objects.create_user('cliente')
+        cls.business = Business.objects.create(user=cls.owner, name='Pousada', description='Descrição',
+                                               business_type='commerce', address='Rua A')
+
+    def setUp(self):
+        cache.clear()
+        dispatch._channels = None
+        self.addCleanup(setattr, dispatch, '_channels', None)
+        self.client.login(username='owner', password='senha123')
+
+    def notify(self, count):
+        for i in range(count):
+            Notification.objects.create(business=self.business, notification_type='general', title=f'Título {i}',
+                                        message='Mensagem')
+
+    def counter_queries(self, path='/'):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path)
+        return response, [q for q in queries if 'COUNT' in q['sql'] and 'local_businesses_notification' in q['sql']]
+
+    def test_counter_is_cached_across_pages(self):
+        self.notify(2)
+        cache.clear()
+        response, queries = self.counter_queries()
+        self.assertEqual((response.context['unread_notifications'], len(queries)), (2, 1))
+        response, queries = self.counter_queries()
+        self.assertEqual((response.context['unread_notifications'], len(queries)), (2, 0))
+
+    def test_new_notification_increments_the_cached_counter(self):
+        self.counter_queries()
+        self.notify(1)
+        response, queries = self.counter_queries()
+        self.assertEqual((response.context['unread_notifications'], len(queries)), (1, 0))
+
+    def test_reading_notifications_refreshes_the_counter(self):
+        self.notify(3)
+        self.assertEqual(self.counter_queries()[0].context['unread_notifications'], 3)
+        response = self.client.get(reverse('local_businesses:manage_notifications'))
+        self.assertEqual(response.context['unread_notifications'], 0)
+        self.assertEqual(self.counter_queries()[0].context['unread_notifications'], 0)
+
+    def test_dispatch_refreshes_the_counter_after_commit(self):
+        self.assertEqual(self.counter_queries()[0].context['unread_notifications'], 0)
+        dispatch.enqueue(self.business, 'general', 'Título', 'Mensagem', user=self.customer)
+        with self.captureOnCommitCallbacks() as callbacks:
+            dispatch.process_batch()
+        # bulk_create não passa pelo sinal: até o commit o valor em cache continua valendo
+        self.assertEqual(self.counter_queries()[0].context['unread_notifications'], 0)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.counter_queries()[0].context['unread_notifications'], 1)
+
+    def test_anonymous_users_do_not_query_the_counter(self):
+        self.client.logout()
+        response, queries = self.counter_queries()
+        self.assertEqual((response.context['unread_notifications'], queries), (0, []))
+
+
+class ThumbnailTests(TestCase):
+    """Miniaturas das fotos e a tag responsive_photo"""
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user('owner')
+        cls.business = Business.objects.create(user=owner, name='Galeria', description='Descrição',
+                                               business_type='commerce', address='Rua A')
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name, MEDIA_URL='/media/')
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def create_photo(self, size=(1200, 800), mode='RGB', color='red', name='foto.png'):
+        buffer = BytesIO()
+        Image.new(mode, size, color).save(buffer, 'PNG')
+        return BusinessPhoto.objects.create(business=self.business, image=ContentFile(buffer.getvalue(), name=name))
+
+    def open_derivative(self, photo, width, fmt):
+        return Image.open(default_storage.open(thumbnails.derivative_name(photo.image.name, width, fmt)))
+
+    def render(self, photo, arguments=''):
+        return Template('{% load photos %}{% responsive_photo photo ' + arguments + ' %}').render(
+            Context({'photo': photo}))
+
+    def test_derivatives_are_generated(self):
+        photo = self.create_photo()
+        self.assertEqual(thumbnails.process_batch(), 1)
+        photo.refresh_from_db()
+        self.assertEqual(photo.thumbnail_widths, [240, 480, 960])
+        self.assertIsNotNone(photo.thumbnails_generated_at)
+        for width in photo.thumbnail_widths:
+            for fmt in thumbnails.FORMATS:
+                with self.subTest(width=width, fmt=fmt), self.open_derivative(photo, width, fmt) as image:
+                    self.assertEqual((image.format.lower(), image.size), (fmt, (width, width * 2 // 3)))
+        self.assertEqual(thumbnails.process_batch(), 0)
+
+    def test_widths_are_limited_to_the_original(self):
+        photo = self.create_photo(size=(300, 100))
+        self.assertEqual(thumbnails.generate(photo), [240, 300])
+
+    def test_transparent_image_gets_a_white_background_in_jpeg(self):
+        photo = self.create_photo(size=(240, 240), mode='RGBA', color=(0, 0, 0, 0))
+        thumbnails.generate(photo)
+        with self.open_derivative(photo, 240, 'jpeg') as image:
+            self.assertEqual((image.mode, image.getpixel((0, 0))), ('RGB', (255, 255, 255)))
+        with self.open_derivative(photo, 240, 'webp') as image:
+            self.assertEqual(image.mode, 'RGBA')
+
+    def test_names_are_deterministic(self):
+        self.assertEqual(thumbnails.derivative_name('business_photos/ab/abcd.png', 480, 'webp'),
+                         'thumbnails/business_photos/ab/abcd-480w.webp')
+        first, second = self.create_photo(name='a.png'), self.create_photo(name='b.png')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(thumbnails.url(first, 240, 'jpeg'), thumbnails.url(second, 240, 'jpeg'))
+
+    def test_existing_derivatives_are_not_generated_again(self):
+        first, second = self.create_photo(name='a.png'), self.create_photo(name='b.png')
+        thumbnails.generate(first)
+        with mock.patch.object(thumbnails.default_storage, 'save') as save:
+            self.assertEqual(thumbnails.generate(second), [240, 480, 960])
+        save.assert_not_called()
+
+        default_storage.delete(thumbnails.derivative_name(first.image.name, 480, 'webp'))
+        with mock.patch.object(thumbnails.default_storage, 'save') as save:
+            thumbnails.generate(first)
+        self.assertEqual([call.args[0] for call in save.call_args_list],
+                         [thumbnails.derivative_name(first.image.name, 480, 'webp')])
+
+    def test_invalid_image_is_not_retried(self):
+        broken = BusinessPhoto.objects.create(business=self.business,
+                                              image=ContentFile(b'not an image', name='quebrada.jpg'))
+        missing = BusinessPhoto.objects.create(business=self.business, image='business_photos/ausente.jpg')
+        with self.assertLogs('local_businesses.thumbnails', 'ERROR'):
+            self.assertEqual(thumbnails.process_batch(), 2)
+        for photo in (broken, missing):
+            photo.refresh_from_db()
+            self.assertEqual(photo.thumbnail_widths, [])
+            self.assertIsNotNone(photo.thumbnails_generated_at)
+        self.assertEqual(thumbnails.process_batch(), 0)
+
+    def test_command_regenerates_everything(self):
+        photo = self.create_photo()
+        thumbnails.process_batch()
+        out = StringIO()
+        call_command('generate_thumbnails', all=True, stdout=out)
+        self.assertIn('Thumbnails generated for 1 photos', out.getvalue())
+        photo.refresh_from_db()
+        self.assertEqual(photo.thumbnail_widths, [240, 480, 960])
+
+    def test_responsive_photo_without_thumbnails(self):
+        photo = self.create_photo()
+        self.assertHTMLEqual(self.render(photo, 'alt="Fachada"'),
+                             f'<img src="{photo.image.url}" alt="Fachada" loading="lazy" decoding="async">')
+
+    def test_responsive_photo_srcset(self):
+        photo = self.create_photo()
+        thumbnails.process_batch()
+        photo.refresh_from_db()
+        base = '/media/thumbnails/' + photo.image.name.rsplit('.', 1)[0]
+        webp = ', '.join(f'{base}-{width}w.webp {width}w' for width in (240, 480, 960))
+        jpeg = ', '.join(f'{base}-{width}w.jpg {width}w' for width in (240, 480, 960))
+        self.assertHTMLEqual(
+            self.render(photo, 'sizes="(min-width: 800px) 33vw, 100vw" loading="eager"'),
+            f'<picture><source type="image/webp" srcset="{webp}" sizes="(min-width: 800px) 33vw, 100vw">'
+            f'<img src="{base}-480w.jpg" srcset="{jpeg}" sizes="(min-width: 800px) 33vw, 100vw"'
+            f' loading="eager" decoding="async"></picture>',
+        )
+
+
+class FragmentInvalidationTests(TestCase):
+    """Os sinais trocam a versão dos fragmentos: a próxima página não usa o conteúdo antigo"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner')
+        cls.customer = User.objects.create_user('cliente')
+        cls.category = BusinessCategory.objects.create(name='Padarias')
+        cls.business = Business.objects.create(user=cls.owner, name='Pão Quente', description='Descrição',
+                                               business_type='commerce', category=cls.category, address='Rua A')
+        cls.photo = BusinessPhoto.objects.create(business=cls.business, image='business_photos/antiga.jpg',
+                                                 is_primary=True)
+
+    def setUp(self):
+        cache.clear()
+        self.list_url = reverse('local_businesses:business_list')
+        self.detail_url = reverse('local_businesses:business_detail', args=[self.business.pk])
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def change(self, func):
+        with self.captureOnCommitCallbacks(execute=True):
+            func()
+
+    def test_review_changes_refresh_the_reviews_fragment(self):
+        review = Review.objects.create(business=self.business, user=self.customer, rating=5, comment='Pão fresco')
+        self.assertIn('Pão fresco', self.get(self.detail_url))
+
+        # Sem sinal a versão não muda: o fragmento em cache continua valendo
+        Review.objects.filter(pk=review.pk).update(comment='Pão dormido')
+        self.assertNotIn('Pão dormido', self.get(self.detail_url))
+
+        review.comment = 'Pão dormido'
+        self.change(review.save)
+        self.assertIn('Pão dormido', self.get(self.detail_url))
+
+        self.change(review.delete)
+        self.assertIn('Nenhuma avaliação ainda', self.get(self.detail_url))
+
+    def test_photo_changes_refresh_the_card(self):
+        self.assertIn('antiga.jpg', self.get(self.list_url))
+
+        def replace_photo():
+            self.photo.is_primary = False
+            self.photo.save()
+            BusinessPhoto.objects.create(business=self.business, image='business_photos/nova.jpg', is_primary=True)
+        self.change(replace_photo)
+        content = self.get(self.list_url)
+        self.assertIn('nova.jpg', content)
+        self.assertNotIn('antiga.jpg', content)
+
+    def test_category_rename_refreshes_cards_and_options(self):
+        self.assertEqual(self.get(self.list_url).count('Padarias'), 2)
+        self.category.name = 'Confeitarias'
+        self.change(self.category.save)
+        content = self.get(self.list_url)
+        self.assertEqual(content.count('Confeitarias'), 2)
+        self.assertNotIn('Padarias', content)
+
+    def test_category_delete_refreshes_cards_and_options(self):
+        self.get(self.list_url)
+        self.change(self.category.delete)
+        self.assertNotIn('Padarias', self.get(self.list_url))
+
+    @override_settings(REPLICA_PIN_SECONDS=5)
+    def test_replica_reads_keep_the_new_version_clean_while_it_settles(self):
+        review = Review.objects.create(business=self.business, user=self.customer, rating=5, comment='Antigo')
+        later = time_module.time_ns() + 6 * 10 ** 9
+        with mock.patch.object(fragments, '_reading_replica', return_value=True):
+            self.assertIn('Antigo', self.get(self.detail_url))
+            # A réplica alcança o primário sem nova troca de versão
+            Review.objects.filter(pk=review.pk).update(comment='Novo')
+            self.assertIn('Antigo', self.get(self.detail_url))
+            with mock.patch.object(fragments.time, 'time_ns', return_value=later):
+                self.assertIn('Novo', self.get(self.detail_url))
+
+    @override_settings(REPLICA_PIN_SECONDS=5)
+    def test_cache_key(self):
+        version = fragments.version('business', self.business.pk)
+        self.assertEqual(fragments.cache_key(version), version)
+        with mock.patch.object(fragments, '_reading_replica', return_value=True):
+            self.assertEqual(fragments.cache_key(version), f'{version}-replica')
+            self.assertEqual(fragments.cache_key(version - 5 * 10 ** 9), version - 5 * 10 ** 9)
+
+
+class ConditionalGetTests(TestCase):
+    """ETag/Last-Modified das páginas públicas e 304 só para visitantes anônimos"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', password='senha123')
+        cls.customer = User.objects.create_user('cliente')
+        cls.business = Business.objects.create(user=cls.owner, name='Sapataria', description='Descrição',
+                                               business_type='service', address='Rua A')
+
+    def setUp(self):
+        self.detail_url = reverse('local_businesses:business_detail', args=[self.business.pk])
+        self.list_url = reverse('local_businesses:business_list')
+
+    def get(self, url, **headers):
+        return self.client.get(url, headers=headers)
+
+    def test_unchanged_page_returns_not_modified(self):
+        for url in (self.detail_url, self.list_url):
+            with self.subTest(url=url):
+                response = self.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response['Cache-Control'], 'public, max-age=0, must-revalidate')
+                self.assertIn('Cookie', response['Vary'])
+
+                cached = self.get(url, if_none_match=response['ETag'])
+                self.assertEqual(cached.status_code, 304)
+                self.assertEqual(cached.content, b'')
+                self.assertEqual(cached['ETag'], response['ETag'])
+
+                cached = self.get(url, if_modified_since=response['Last-Modified'])
+                self.assertEqual(cached.status_code, 304)
+                self.assertEqual(self.get(url, if_modified_since='Mon, 01 Jan 2001 00:00:00 GMT').status_code, 200)
+
+    def test_listing_etag_includes_the_query(self):
+        plain = self.get(self.list_url)['ETag']
+        response = self.get(self.list_url + '?q=sapato', if_none_match=plain)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], plain)
+
+    def assertChangesValidator(self, url, change):
+        etag = self.get(url)['ETag']
+        change()
+        response = self.get(url, if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_validator_follows_related_edits(self):
+        def add_photo():
+            self.photo = BusinessPhoto.objects.create(business=self.business, image='business_photos/a.jpg')
+
+        def edit_photo():
+            self.photo.is_primary = True
+            self.photo.save()
+
+        def add_hours():
+            self.hours = BusinessHours.objects.create(business=self.business, day_of_week='monday',
+                                                      open_time=time(8), close_time=time(18))
+
+        def edit_hours():
+            self.hours.is_closed = True
+            self.hours.save()
+
+        def add_review():
+            self.review = Review.objects.create(business=self.business, user=self.customer, rating=4)
+
+        def edit_review():
+            self.review.comment = 'Conserto rápido'
+            self.review.save()
+
+        changes = [add_photo, edit_photo, add_hours, edit_hours, add_review, edit_review,
+                   lambda: self.hours.delete(), lambda: self.photo.delete()]
+        for change in changes:
+            with self.subTest(change=change.__name__):
+                self.assertChangesValidator(self.detail_url, change)
+
+    def test_listing_validator_follows_photos_and_categories(self):
+        self.assertChangesValidator(self.list_url, lambda: BusinessPhoto.objects.create(
+            business=self.business, image='business_photos/a.jpg', is_primary=True))
+        self.assertChangesValidator(self.list_url, lambda: BusinessCategory.objects.create(name='Reparos'))
+
+        # Categorias sem negócios também aparecem no filtro da listagem
+        def rename_empty_category():
+            category = BusinessCategory.objects.get(name='Reparos')
+            category.name = 'Consertos'
+            category.save()
+        self.assertChangesValidator(self.list_url, rename_empty_category)
+        self.assertFalse(Business.objects.filter(category__name='Consertos').exists())
+
+    def test_authenticated_users_get_private_pages(self):
+        anonymous = self.get(self.detail_url)
+        self.client.login(username='owner', password='senha123')
+        for url in (self.detail_url, self.list_url):
+            with self.subTest(url=url):
+                response = self.get(url, if_none_match=anonymous['ETag'],
+                                    if_modified_since=anonymous['Last-Modified'])
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('private', response['Cache-Control'])
+                self.assertNotIn('public', response['Cache-Control'])
+                self.assertNotIn('ETag', response)
+
+    def test_missing_business(self):
+        response = self.get(reverse('local_businesses:business_detail', args=[self.business.pk + 1]))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(QUERY_BUDGETS_STRICT=True)
+class QueryBudgetTests(TestCase):
+    """As páginas públicas e o painel ficam dentro de QUERY_BUDGETS, logado ou não"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', password='senha123', is_staff=True)
+        category = BusinessCategory.objects.create(name='Restaurantes')
+        cls.businesses = [
+            Business.objects.create(user=cls.owner, name=f'Negócio {i}', description='Descrição',
+                                    business_type='commerce', category=category, address='Rua A')
+            for i in range(5)
+        ]
+        for business in cls.businesses:
+            BusinessPhoto.objects.create(business=business, image='business_photos/foto.jpg', is_primary=True)
+
+    def urls(self):
+        business = self.businesses[0]
+        return [
+            reverse('home'),
+            reverse('dashboard:home'),
+            reverse('local_businesses:business_list'),
+            reverse('local_businesses:nearby_businesses') + '?lat=-23.5&lng=-46.6',
+            reverse('local_businesses:business_api') + '?html=1',
+            reverse('local_businesses:business_detail', args=[business.id]),
+        ]
+
+    def test_anonymous_pages_within_budget(self):
+        for url in self.urls():
+            cache.clear()
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_owner_pages_within_budget(self):
+        self.client.force_login(self.owner)
+        for url in self.urls() + [reverse('local_businesses:business_dashboard')]:
+            cache.clear()
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_exceeding_budget_fails(self):
+        with override_settings(QUERY_BUDGETS={'local_businesses:business_list': 0}):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(reverse('local_businesses:business_list'))
+
+    def test_server_timing_for_staff(self):
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse('local_businesses:business_list'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+, total;dur=')
+
+
+class AvailabilityTests(TestCase):
+    """Horários livres: recorte pelo expediente, reservas, capacidade e cache por data"""
+
+    monday = date(2030, 1, 7)
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user('owner')
+        cls.customer = User.objects.create_user('cliente')
+        cls.business = Business.objects.create(user=owner, name='Clínica', description='Descrição',
+                                               business_type='service', address='Rua A')
+        cls.slot = TimeSlot.objects.create(business=cls.business, day_of_week='monday', start_time=time(8),
+                                           end_time=time(12), duration=60)
+        TimeSlot.objects.create(business=cls.business, day_of_week='tuesday', start_time=time(14),
+                                end_time=time(16), duration=60, capacity=3)
+        cls.hours = BusinessHours.objects.create(business=cls.business, day_of_week='monday',
+                                                 open_time=time(9), close_time=time(11, 30))
+
+    def setUp(self):
+        cache.clear()
+
+    def book(self, day, booking_time, people=1, status='pending'):
+        return Booking.objects.create(business=self.business, user=self.customer, service_name='Consulta',
+                                      booking_date=day, booking_time=booking_time, number_of_people=people,
+                                      status=status)
+
+    def starts(self, day):
+        return [(start, remaining) for start, _, remaining in availability.available_times(self.business, day)[day]]
+
+    def test_expand_slots_is_clipped_by_business_hours(self):
+        slots = list(TimeSlot.objects.filter(day_of_week='monday'))
+        self.assertEqual(availability.expand_slots(slots, {}, self.monday),
+                         [(480, 540, None), (540, 600, None), (600, 660, None), (660, 720, None)])
+        self.assertEqual(availability.expand_slots(slots, {'monday': self.hours}, self.monday),
+                         [(540, 600, None), (600, 660, None)])
+        self.assertEqual(availability.expand_slots(slots, {'monday': self.hours}, self.monday + timedelta(days=1)),
+                         [])
+        self.hours.is_closed = True
+        self.assertEqual(availability.expand_slots(slots, {'monday': self.hours}, self.monday), [])
+
+    def test_bookings_are_subtracted(self):
+        self.book(self.monday, time(9))
+        self.book(self.monday, time(10), status='cancelled')
+        self.assertEqual(self.starts(self.monday), [(time(10), None)])
+
+    def test_capacity_slots_count_people(self):
+        tuesday = self.monday + timedelta(days=1)
+        self.book(tuesday, time(14), people=2)
+        self.book(tuesday, time(15), people=3)
+        self.assertEqual(self.starts(tuesday), [(time(14), 1)])
+
+    def test_week_view_uses_one_query_per_table(self):
+        with self.assertNumQueries(3):
+            schedule = availability.available_times(self.business, self.monday, 7)
+        self.assertEqual(len(schedule), 7)
+        with self.assertNumQueries(0):
+            availability.available_times(self.business, self.monday, 7)
+
+    def test_range_is_clamped(self):
+        self.assertEqual(len(availability.available_times(self.business, self.monday, 100)),
+                         availability.MAX_RANGE_DAYS)
+        self.assertEqual(list(availability.available_times(self.business, self.monday, 0)), [self.monday])
+
+    def cached_days(self, days):
+        version = availability._version(self.business.pk)
+        return {day for day in days if cache.get(availability._date_key(self.business.pk, version, day)) is not None}
+
+    def test_booking_invalidates_only_its_date_after_commit(self):
+        days = [self.monday, self.monday + timedelta(days=7)]
+        availability.available_times(self.business, self.monday, 8)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.book(self.monday, time(9))
+            # Antes do commit uma consulta simultânea ainda não veria a reserva
+            self.assertEqual(self.cached_days(days), set(days))
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.cached_days(days), {days[1]})
+        self.assertEqual(self.starts(self.monday), [(time(10), None)])
+
+    def test_moved_booking_invalidates_both_dates(self):
+        days = [self.monday, self.monday + timedelta(days=7), self.monday + timedelta(days=14)]
+        booking = self.book(self.monday, time(9))
+        availability.available_times(self.business, self.monday, 15)
+        booking.booking_date = days[1]
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.save()
+        self.assertEqual(self.cached_days(days), {days[2]})
+
+    def test_schedule_changes_invalidate_every_date(self):
+        days = [self.monday, self.monday + timedelta(days=1)]
+        changes = [
+            lambda: TimeSlot.objects.get(pk=self.slot.pk).save(),
+            lambda: BusinessHours.objects.get(pk=self.hours.pk).save(),
+            lambda: BusinessHours.objects.get(pk=self.hours.pk).delete(),
+        ]
+        for index, change in enumerate(changes):
+            availability.available_times(self.business, self.monday, 2)
+            with self.subTest(change=index):
+                with self.captureOnCommitCallbacks(execute=True):
+                    change()
+                self.assertEqual(self.cached_days(days), set())
+        self.assertEqual([start for start, _ in self.starts(self.monday)], [time(8), time(9), time(10), time(11)])
+
+
+class BookingValidationTests(TestCase):
+    """Reservas só nos intervalos oferecidos, com pessoas e duração positivas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner')
+        cls.customer = User.objects.create_user('cliente', password='senha123')
+        cls.business = Business.objects.create(user=cls.owner, name='Barbearia', description='Descrição',
+                                               business_type='service', address='Rua A')
+        cls.day = date.today() + timedelta(days=7)
+        cls.weekday = availability.WEEKDAYS[cls.day.weekday()]
+        cls.exclusive = TimeSlot.objects.create(business=cls.business, day_of_week=cls.weekday,
+                                                start_time=time(9), end_time=time(12), duration=60)
+        cls.shared = TimeSlot.objects.create(business=cls.business, day_of_week=cls.weekday,
+                                             start_time=time(14), end_time=time(16), duration=60, capacity=2)
+
+    def book(self, booking_time, duration=60, people=1, day=None):
+        booking = Booking(business=self.business, user=self.customer, service_name='Corte',
+                          booking_date=day or self.day, booking_time=booking_time, duration=duration,
+                          number_of_people=people)
+        return bookings.create_booking(booking)
+
+    def test_blocked_interval_comes_from_the_slot(self):
+        booking = self.book(time(10), duration=1)
+        booking.refresh_from_db()
+        self.assertEqual((booking.booking_time, booking.duration), (time(10), 60))
+        with self.assertRaises(bookings.BookingConflict):
+            self.book(time(10), duration=1)
+
+    def test_misaligned_time_is_rejected(self):
+        for booking_time in (time(10, 30), time(11, 59), time(12), time(14, 15)):
+            with self.subTest(booking_time=booking_time), self.assertRaises(bookings.BookingConflict):
+                self.book(booking_time, duration=1)
+        self.assertFalse(Booking.objects.exists())
+
+    def test_time_outside_any_slot_is_rejected(self):
+        for booking_time in (time(8), time(13), time(20)):
+            with self.subTest(booking_time=booking_time), self.assertRaises(bookings.BookingConflict):
+                self.book(booking_time)
+        with self.assertRaises(bookings.BookingConflict):
+            self.book(time(10), day=self.day + timedelta(days=1))
+
+    def test_closed_day_is_rejected(self):
+        BusinessHours.objects.create(business=self.business, day_of_week=self.weekday, open_time=time(9),
+                                     close_time=time(18), is_closed=True)
+        with self.assertRaises(bookings.BookingConflict):
+            self.book(time(10))
+
+    def test_non_positive_head_count_is_rejected(self):
+        self.book(time(14), people=2)
+        for people in (0, -10):
+            with self.subTest(people=people), self.assertRaises(bookings.BookingConflict):
+                self.book(time(14), people=people)
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_capacity_counts_people(self):
+        self.book(time(14), people=2)
+        for _ in range(4):
+            with self.assertRaises(bookings.BookingConflict):
+                self.book(time(14), people=2)
+        self.book(time(15), people=1)
+        self.book(time(15), people=1)
+        self.assertEqual(Booking.objects.count(), 3)
+
+    def test_form_rejects_non_positive_values(self):
+        self.client.login(username='cliente', password='senha123')
+        response = self.client.post(reverse('local_businesses:book_service', args=[self.business.pk]), {
+            'service_name': 'Corte', 'booking_date': self.day.isoformat(), 'booking_time': '10:00',
+            'duration': -30, 'number_of_people': -5,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.context['form'].errors), {'duration', 'number_of_people'})
+        self.assertFalse(Booking.objects.exists())
+
+    def test_view_rejects_misaligned_time(self):
+        self.client.login(username='cliente', password='senha123')
+        response = self.client.post(reverse('local_businesses:book_service', args=[self.business.pk]), {
+            'service_name': 'Corte', 'booking_date': self.day.isoformat(), 'booking_time': '10:30',
+            'duration': 1, 'number_of_people': 1,
+        })
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Booking.objects.exists())
+
+
+class ConcurrentBookingTests(TransactionTestCase):
+    """Várias threads disputando o mesmo horário não podem gerar reserva dupla"""
+
+    THREADS = 16
+
+    def setUp(self):
+        self.owner = User.objects.create(username='owner')
+        self.customers = User.objects.bulk_create([User(username=f'cliente{i}') for i in range(self.THREADS)])
+        self.business = Business.objects.create(
+            user=self.owner, name='Passeios', description='Descrição', business_type='service', address='Rua A',
+        )
+        self.day = date.today() + timedelta(days=7)
+
+    def create_slot(self, capacity=None):
+        TimeSlot.objects.create(
+            business=self.business, day_of_week=availability.WEEKDAYS[self.day.weekday()],
+            start_time=time(9, 0), end_time=time(18, 0), duration=60, capacity=capacity,
+        )
+
+    def book_concurrently(self, booking_time):
+        results = []
+        barrier = threading.Barrier(self.THREADS)
+
+        def worker(customer):
+            try:
+                booking = Booking(
+                    business_id=self.business.id, user=customer, service_name='Passeio',
+                    booking_date=self.day, booking_time=booking_time, duration=60, number_of_people=1,
+                )
+                barrier.wait()
+                try:
+                    bookings.create_booking(booking)
+                    results.append('ok')
+                except bookings.BookingConflict:
+                    results.append('conflict')
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(customer,)) for customer in self.customers]
+        started = time_module.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time_module.perf_counter() - started
+        logger.info('%d booking attempts in %.3fs (%.1f/s)', len(results), elapsed, len(results) / elapsed)
+        self.assertEqual(len(results), self.THREADS)
+        return results
+
+    def test_exclusive_slot_accepts_one_booking(self):
+        self.create_slot()
+        results = self.book_concurrently(time(10, 0))
+        self.assertEqual(results.count('ok'), 1)
+        self.assertEqual(Booking.objects.filter(business=self.business).count(), 1)
+
+    def test_overlapping_start_times_conflict(self):
+        self.create_slot()
+        Booking.objects.create(
+            business=self.business, user=self.owner, service_name='Passeio',
+            booking_date=self.day, booking_time=time(9, 30), duration=60,
+        )
+        results = self.book_concurrently(time(10, 0))
+        self.assertEqual(results.count('ok'), 0)
+
+    def test_slot_capacity_is_never_exceeded(self):
+        self.create_slot(capacity=5)
+        results = self.book_concurrently(time(10, 0))
+        self.assertEqual(results.count('ok'), 5)
+        self.assertEqual(Booking.objects.filter(business=self.business).count(), 5)
+
+
+@tag('benchmark')
+class ViewBenchmarkTests(TransactionTestCase):
+    """Cenários de load_test em escala pequena; só o comando benchmark_views mede para valer.
+
+    Rodar só estes: manage.py test --tag benchmark (ou pular com --exclude-tag benchmark).
+    """
+
+    def setUp(self):
+        load_test.seed(scale=5)
+
+    def assertScenariosHealthy(self, results):
+        self.assertEqual([row['scenario'] for row in results], list(load_test.SCENARIOS))
+        for row in results:
+            logger.info('%s: %.1f req/s, p95 %.1f ms', row['scenario'], row['ops_per_second'], row['p95_ms'])
+            with self.subTest(scenario=row['scenario']):
+                self.assertEqual(row['requests'], 20)
+                # Erros incluem views acima de QUERY_BUDGETS
+                self.assertEqual(row['errors'], 0, row['statuses'])
+
+    # Uma thread: o banco de teste em memória do SQLite trava tabelas inteiras
+    # entre conexões; a concorrência é medida pelo comando, em banco em arquivo
+    def test_test_client(self):
+        self.assertScenariosHealthy(load_test.run(threads=1, requests=20, warmup=2))
+
+    def test_wsgi_server(self):
+        self.assertScenariosHealthy(load_test.run(threads=1, requests=20, warmup=2, server=True))
+
+
+class DataGenerationTests(TestCase):
+    """datagen grava dados consistentes com os sinais e repetíveis pela semente"""
+
+    def generate(self, prefix):
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+            return datagen.generate(users=40, businesses=15, seed=7, batch_size=4, prefix=prefix,
+                                    max_reviews=30, placeholders=1)
+
+    def test_counters_match_source_tables(self):
+        counts = self.generate('gen')
+        self.assertEqual(counts['users'], User.objects.filter(username__startswith='gen').count())
+        self.assertEqual(counts['businesses'], Business.objects.count())
+        self.assertEqual(counts['reviews'], sum(Business.objects.values_list('review_count', flat=True)))
+        self.assertEqual(ratings.rebuild(dry_run=True), [])
+        self.assertEqual(stats.rebuild(dry_run=True), [])
+        business = Business.objects.order_by('id').first()
+        self.assertIn(business.pk, [pk for pk, _ in search.get_backend().search(business.name)])
+
+    def test_same_seed_same_data(self):
+        fields = ('name', 'address', 'latitude', 'longitude', 'review_count', 'rating_sum', 'is_active')
+        self.generate('first')
+        self.generate('second')
+        first = Business.objects.filter(user__username__startswith='first').order_by('id').values_list(*fields)
+        second = Business.objects.filter(user__username__startswith='second').order_by('id').values_list(*fields)
+        self.assertEqual(list(first), list(second))
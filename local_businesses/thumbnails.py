@@ -0,0 +1,107 @@
+"""Miniaturas (derivados) das fotos dos negócios.
+
+Para cada BusinessPhoto são gerados WebP e JPEG recomprimidos em algumas
+larguras (WIDTHS, limitadas à largura original), gravados em MEDIA_ROOT com
+nomes determinísticos: thumbnails/<nome da original sem extensão>-<largura>w.<ext>.
+Como as originais são endereçadas por conteúdo, fotos idênticas compartilham
+as miniaturas, e um derivado que já existe em disco não é gerado de novo.
+
+A geração roda fora da requisição, no comando generate_thumbnails, que
+consome as fotos com thumbnails_generated_at vazio (índice parcial). Enquanto
+isso a tag responsive_photo usa a imagem original.
+"""
+import logging
+import posixpath
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from . import conditional, fragments
+from .models import BusinessPhoto
+
+logger = logging.getLogger(__name__)
+
+WIDTHS = (240, 480, 960)
+
+# Formato -> (extensão, opções do Pillow); o primeiro é o preferido no <picture>
+FORMATS = {
+    'webp': ('webp', {'quality': 75, 'method': 6}),
+    'jpeg': ('jpg', {'quality': 80, 'optimize': True, 'progressive': True}),
+}
+
+
+def derivative_name(image_name, width, fmt):
+    base = posixpath.splitext(image_name)[0]
+    return f'thumbnails/{base}-{width}w.{FORMATS[fmt][0]}'
+
+
+def url(photo, width, fmt):
+    return default_storage.url(derivative_name(photo.image.name, width, fmt))
+
+
+def srcset(photo, fmt):
+    return ', '.join(f'{url(photo, width, fmt)} {width}w' for width in photo.thumbnail_widths)
+
+
+def _encode(image, fmt):
+    if fmt == 'jpeg' and image.mode != 'RGB':
+        # JPEG não tem transparência: compor sobre fundo branco
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A') if 'A' in image.getbands() else None)
+        image = background
+    buffer = BytesIO()
+    image.save(buffer, fmt.upper(), **FORMATS[fmt][1])
+    return buffer.getvalue()
+
+
+def generate(photo):
+    """Gera os derivados que faltam; retorna as larguras disponíveis"""
+    with photo.image.open('rb') as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or 'A' in image.getbands() else 'RGB')
+
+    widths = sorted({min(width, image.width) for width in WIDTHS})
+    # Da maior para a menor, reduzindo a partir do resultado anterior
+    resized = image
+    for width in reversed(widths):
+        names = {fmt: derivative_name(photo.image.name, width, fmt) for fmt in FORMATS}
+        missing = [fmt for fmt, name in names.items() if not default_storage.exists(name)]
+        if not missing:
+            continue
+        height = max(1, round(image.height * width / image.width))
+        resized = resized.resize((width, height), Image.LANCZOS)
+        for fmt in missing:
+            default_storage.save(names[fmt], ContentFile(_encode(resized, fmt)))
+    return widths
+
+
+def process_batch(batch_size=100):
+    """Gera as miniaturas de um lote de fotos pendentes; retorna quantas foram processadas"""
+    photos = list(BusinessPhoto.objects.filter(thumbnails_generated_at__isnull=True).order_by('id')[:batch_size])
+    now = timezone.now()
+    for photo in photos:
+        try:
+            photo.thumbnail_widths = generate(photo)
+        except (OSError, ValueError, Image.DecompressionBombError):
+            # Arquivo ausente ou inválido: não tentar de novo a cada lote
+            logger.exception('Não foi possível gerar as miniaturas da foto %d', photo.pk)
+            photo.thumbnail_widths = []
+        photo.thumbnails_generated_at = now
+    BusinessPhoto.objects.bulk_update(photos, ['thumbnail_widths', 'thumbnails_generated_at'])
+    # bulk_update não dispara sinais: os cartões em cache ainda apontam para as originais
+    business_ids = {photo.business_id for photo in photos}
+    fragments.invalidate_businesses(business_ids)
+    conditional.touch_businesses(business_ids)
+    return len(photos)
+
+
+def reset(queryset=None):
+    """Marca fotos para terem as miniaturas geradas de novo"""
+    queryset = BusinessPhoto.objects.all() if queryset is None else queryset
+    return queryset.update(thumbnails_generated_at=None)
@@ -6,6 +6,7 @@ app_name = 'local_businesses'
 urlpatterns = [
     path('', views.business_list, name='business_list'),
     path('nearby/', views.nearby_businesses, name='nearby_businesses'),
+    path('api/businesses/', views.business_api, name='business_api'),
     path('business/<int:business_id>/', views.business_detail, name='business_detail'),
     path('register/', views.register_business, name='register_business'),
     path('dashboard/', views.business_dashboard, name='business_dashboard'),
@@ -23,6 +24,7 @@ urlpatterns = [
     
     # URLs administrativas
     path('admin/', views.admin_dashboard, name='admin_dashboard'),
+    path('admin/users/', views.admin_users_api, name='admin_users_api'),
     path('admin/approve/<int:upgrade_id>/', views.approve_upgrade, name='approve_upgrade'),
     path('admin/reject/<int:upgrade_id>/', views.reject_upgrade, name='reject_upgrade'),
 ]
\ No newline at end of file
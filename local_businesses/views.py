@@ -1,76 +1,157 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
-from django.db.models import Avg
+from django.http import Http404, JsonResponse
 from django.contrib.auth.models import User
-from .models import Business, BusinessCategory, BusinessPhoto, BusinessHours, Review, BusinessPlan, Booking, TimeSlot, Notification, PlanUpgradeRequest
+from datetime import date
+from django.db import transaction
+from django.db.models.functions import Coalesce
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.datastructures import MultiValueDict
+from . import admin_stats, availability, conditional, dispatch, entitlements, fragments, geo, pagination, search, stats
+from . import bookings as booking_service
+from . import notifications as notification_counters
+from .models import Business, BusinessCategory, BusinessPhoto, BusinessHours, Review, BusinessPlan, Booking, TimeSlot, PlanUpgradeRequest
 from accounts.models import Profile
 from billing.models import Plan
+from uploads import sessions as upload_sessions
 from .forms import BusinessRegistrationForm, BusinessEditForm, PhotoForm, BusinessHoursForm, ReviewForm, BookingForm
 
-def business_list(request):
-    """Lista todos os comércios e serviços"""
-    businesses = Business.objects.filter(is_active=True).select_related('category', 'businessplan')
-    
-    # Adicionar média de avaliações
-    businesses = businesses.annotate(avg_rating=Avg('reviews__rating'))
+LISTING_PAGE_SIZE = 24
+API_MAX_PAGE_SIZE = 100
+
+# Ordenações das listagens; terminam no id para o cursor ser único
+LISTING_ORDERING = ('-avg_rating', '-id')
+NEARBY_ORDERING = ('-featured', '-avg_rating', '-id')
+
+def _filtered_businesses(request):
+    """Negócios ativos com os filtros de categoria e tipo aplicados"""
+    businesses = Business.objects.filter(is_active=True).select_related('category', 'businessplan').with_primary_photo()
     
-    # Filtros
-    query = request.GET.get('q')
     category_id = request.GET.get('category')
     business_type = request.GET.get('type')
     
-    if query:
-        businesses = businesses.filter(name__icontains=query) | businesses.filter(description__icontains=query)
-    
     if category_id:
         businesses = businesses.filter(category_id=category_id)
     
     if business_type:
         businesses = businesses.filter(business_type=business_type)
     
-    categories = BusinessCategory.objects.all()
-    
-    context = {
-        'businesses': businesses,
-        'categories': categories,
-    }
-    return render(request, 'local_businesses/list.html', context)
+    return businesses
 
-def nearby_businesses(request):
-    """Lista comércios e serviços próximos (simulação)"""
-    # Esta função seria expandida para usar geolocalização real
-    businesses = Business.objects.filter(is_active=True).select_related('category', 'businessplan')
-    businesses = businesses.annotate(avg_rating=Avg('reviews__rating'))
-    
-    # Ordenar por destaque (premium primeiro)
-    businesses = businesses.order_by('-businessplan__is_featured', '-avg_rating')
+def _business_page(request, nearby, per_page=LISTING_PAGE_SIZE):
+    """Uma página da listagem, seguindo o cursor recebido em ?cursor="""
+    businesses = _filtered_businesses(request)
+    cursor = request.GET.get('cursor')
+    query = request.GET.get('q')
+    coordinates = geo.parse_coordinates(request.GET) if nearby else None
     
-    # Se tivermos coordenadas do usuário, ordenar por proximidade
-    user_lat = request.GET.get('lat')
-    user_lng = request.GET.get('lng')
+    ranking = None
+    if query:
+        # Busca no índice textual
+        ranking = dict(search.get_backend().search(query, queryset=businesses))
+        businesses = businesses.filter(id__in=ranking)
+    
+    if coordinates:
+        # Ordenar por proximidade usando o índice de grade
+        lat, lng = coordinates
+        radius_km = geo.parse_radius(request.GET)
+        k = request.GET.get('k')
+        if k and k.isdigit():
+            ranked = geo.nearest(businesses, lat, lng, int(k))
+        else:
+            ranked = geo.within_radius(businesses, lat, lng, radius_km)
+        page = pagination.paginate_ranked(ranked, cursor, per_page)
+        page.object_list = geo.load_ranked(businesses, page.object_list)
+    elif ranking is not None:
+        # Ordenar por relevância
+        ranked = sorted((-ranking[pk], pk) for pk in businesses.values_list('id', flat=True))
+        page = pagination.paginate_ranked(ranked, cursor, per_page)
+        page.object_list = pagination.load_ranked(businesses, page.object_list, 'search_rank')
+    elif nearby:
+        # Sem coordenadas, ordenar por destaque (premium primeiro)
+        businesses = businesses.annotate(featured=Coalesce('businessplan__is_featured', False))
+        page = pagination.KeysetPaginator(businesses, NEARBY_ORDERING, per_page).page(cursor)
+    else:
+        page = pagination.KeysetPaginator(businesses, LISTING_ORDERING, per_page).page(cursor)
+    return page
+
+def _render_listing(request, nearby):
+    try:
+        page = _business_page(request, nearby)
+    except pagination.InvalidCursor:
+        return redirect(request.path)
     
-    categories = BusinessCategory.objects.all()
+    # Parâmetros atuais sem o cursor, para os links de próxima página e a API
+    params = request.GET.copy()
+    params.pop('cursor', None)
     
     context = {
-        'businesses': businesses,
-        'categories': categories,
-        'nearby': True,
-        'user_lat': user_lat,
-        'user_lng': user_lng,
+        'businesses': fragments.attach_versions(page.object_list),
+        'page': page,
+        'query_params': params.urlencode(),
+        'categories': BusinessCategory.objects.all(),
+        'nearby': nearby,
+        'user_lat': request.GET.get('lat'),
+        'user_lng': request.GET.get('lng'),
     }
     return render(request, 'local_businesses/list.html', context)
 
+@conditional.conditional_page(conditional.listing_validators)
+def business_list(request):
+    """Lista todos os comércios e serviços"""
+    return _render_listing(request, nearby=False)
+
+@conditional.conditional_page(conditional.listing_validators)
+def nearby_businesses(request):
+    """Lista comércios e serviços próximos à localização do usuário"""
+    return _render_listing(request, nearby=True)
+
+def business_api(request):
+    """API JSON paginada por cursor, usada pelo mapa e pela rolagem infinita"""
+    nearby = request.GET.get('nearby') == '1'
+    try:
+        per_page = min(int(request.GET.get('limit', LISTING_PAGE_SIZE)), API_MAX_PAGE_SIZE)
+    except ValueError:
+        per_page = LISTING_PAGE_SIZE
+    try:
+        page = _business_page(request, nearby, max(per_page, 1))
+    except pagination.InvalidCursor:
+        return JsonResponse({'error': 'Cursor inválido.'}, status=400)
+    
+    results = []
+    for business in page.object_list:
+        photo = business.primary_photo
+        results.append({
+            'id': business.id,
+            'name': business.name,
+            'address': business.address,
+            'category': business.category.name if business.category else None,
+            'business_type': business.business_type,
+            'latitude': float(business.latitude) if business.latitude is not None else None,
+            'longitude': float(business.longitude) if business.longitude is not None else None,
+            'avg_rating': business.avg_rating,
+            'review_count': business.review_count,
+            'distance_km': getattr(business, 'distance_km', None),
+            'photo': photo.image.url if photo else None,
+            'url': reverse('local_businesses:business_detail', args=[business.id]),
+        })
+    
+    data = {'results': results, 'next_cursor': page.next_cursor}
+    if request.GET.get('html') == '1':
+        # Cartões já renderizados para a rolagem infinita
+        data['html'] = render_to_string('local_businesses/_business_cards.html',
+                                        {'businesses': fragments.attach_versions(page.object_list)}, request=request)
+    return JsonResponse(data)
+
+@conditional.conditional_page(conditional.detail_validators)
 def business_detail(request, business_id):
     """Detalhes de um comércio/serviço específico"""
     business = get_object_or_404(Business, id=business_id, is_active=True)
     photos = business.photos.all()
     hours = business.hours.all()
-    reviews = business.reviews.all().order_by('-created_at')
-    
-    # Calcular média de avaliações
-    avg_rating = reviews.aggregate(Avg('rating'))['rating__avg']
+    reviews = business.reviews.select_related('user').order_by('-created_at')
     
     # Verificar se o usuário já fez uma avaliação
     user_review = None
@@ -82,7 +163,7 @@ def business_detail(request, business_id):
         'photos': photos,
         'hours': hours,
         'reviews': reviews,
-        'avg_rating': avg_rating,
+        'avg_rating': business.avg_rating,
         'user_review': user_review,
     }
     return render(request, 'local_businesses/detail.html', context)
@@ -93,22 +174,11 @@ def register_business(request):
     profile = get_object_or_404(Profile, user=request.user)
     
     # Verificar limite de negócios baseado no plano do usuário
-    user_businesses = request.user.businesses.all()
-    
-    # Definir limites por plano (valores padrão)
-    max_businesses = 1  # Free plan
-    
-    # Verificar se o usuário tem algum negócio com plano Pro ou Premium
-    user_plans = BusinessPlan.objects.filter(business__user=request.user)
-    if user_plans.filter(plan_type='premium').exists():
-        max_businesses = 10
-    elif user_plans.filter(plan_type='pro').exists():
-        max_businesses = 3
-    elif user_plans.filter(plan_type='free').exists():
-        max_businesses = 1
+    user_entitlements = entitlements.for_request(request)
+    max_businesses = user_entitlements.max_businesses
     
     # Verificar se o usuário atingiu o limite de negócios
-    if user_businesses.count() >= max_businesses:
+    if not user_entitlements.can_add_business:
         messages.error(request, f'Você atingiu o limite de {max_businesses} negócios para seu plano atual. '
                                 f'Faça um upgrade para cadastrar mais negócios.')
         return redirect('local_businesses:business_list')
@@ -121,12 +191,7 @@ def register_business(request):
             business.save()
             
             # Criar plano gratuito por padrão
-            BusinessPlan.objects.create(
-                business=business,
-                plan_type='free',
-                max_photos=1,
-                max_businesses=1
-            )
+            entitlements.apply_plan(BusinessPlan(business=business), 'free').save()
             
             messages.success(request, 'Negócio registrado com sucesso!')
             return redirect('local_businesses:business_dashboard')
@@ -136,80 +201,56 @@ def register_business(request):
     context = {
         'form': form,
         'max_businesses': max_businesses,
-        'current_businesses': user_businesses.count(),
+        'current_businesses': user_entitlements.business_count,
     }
     return render(request, 'local_businesses/register.html', context)
 
 @login_required
 def business_dashboard(request):
     """Painel do comércio/serviço"""
-    # Obter todos os negócios do usuário
-    user_businesses = request.user.businesses.all()
+    # Todos os negócios do usuário, com plano e contadores (BusinessStats) na mesma consulta
+    user_businesses = list(request.user.businesses.select_related('businessplan', 'stats').order_by('id'))
     
     # Se o usuário não tem negócios, redirecionar para registro
-    if not user_businesses.exists():
+    if not user_businesses:
         messages.info(request, 'Você ainda não possui nenhum negócio cadastrado.')
         return redirect('local_businesses:register_business')
     
     # Verificar se foi selecionado um negócio específico
     business_id = request.GET.get('business_id')
     if business_id:
-        business = get_object_or_404(Business, id=business_id, user=request.user)
+        business = next((b for b in user_businesses if str(b.id) == business_id), None)
+        if business is None:
+            raise Http404
     else:
         # Para manter compatibilidade, usar o primeiro negócio como principal
-        business = user_businesses.first()
+        business = user_businesses[0]
     
     business_plan = getattr(business, 'businessplan', None)
+    business_stats = stats.get_or_rebuild(business)
     
-    # Contar fotos atuais
-    photo_count = business.photos.count()
-    
-    # Obter reservas recentes
-    recent_bookings = business.bookings.filter(status='pending')[:5]
-    
-    # Calcular média de avaliações
-    from django.db.models import Avg
-    avg_rating = business.reviews.aggregate(Avg('rating'))['rating__avg']
-    
-    # Contar reservas pendentes
-    pending_bookings_count = business.bookings.filter(status='pending').count()
-    
-    # Contar notificações não lidas
-    unread_notifications_count = business.notifications.filter(is_read=False).count()
-    
-    # Contar avaliações e reservas totais
-    total_reviews = business.reviews.count()
-    total_bookings = business.bookings.count()
-    
-    # Obter solicitações de upgrade pendentes
-    pending_upgrades = PlanUpgradeRequest.objects.filter(business=business, status='pending')
-    
-    # Definir limites por plano (valores padrão)
-    max_businesses = 1  # Free plan
-    
-    # Verificar se o usuário tem algum negócio com plano Pro ou Premium
-    user_plans = BusinessPlan.objects.filter(business__user=request.user)
-    if user_plans.filter(plan_type='premium').exists():
-        max_businesses = 10
-    elif user_plans.filter(plan_type='pro').exists():
-        max_businesses = 3
-    elif user_plans.filter(plan_type='free').exists():
-        max_businesses = 1
+    # Listas só são consultadas quando os contadores indicam que há itens
+    recent_bookings = []
+    if business_stats.pending_booking_count:
+        recent_bookings = business.bookings.filter(status='pending')[:5]
+    pending_upgrades = []
+    if business_stats.pending_upgrade_count:
+        pending_upgrades = PlanUpgradeRequest.objects.filter(business=business, status='pending')
     
     context = {
         'business': business,
         'businesses': user_businesses,
         'business_plan': business_plan,
-        'photo_count': photo_count,
+        'photo_count': business_stats.photo_count,
         'recent_bookings': recent_bookings,
-        'avg_rating': avg_rating,
-        'pending_bookings_count': pending_bookings_count,
-        'unread_notifications_count': unread_notifications_count,
-        'total_reviews': total_reviews,
-        'total_bookings': total_bookings,
+        'avg_rating': business.avg_rating,
+        'pending_bookings_count': business_stats.pending_booking_count,
+        'unread_notifications_count': business_stats.unread_notification_count,
+        'total_reviews': business.review_count,
+        'total_bookings': business_stats.booking_count,
         'pending_upgrades': pending_upgrades,
-        'max_businesses': max_businesses,
-        'current_businesses': user_businesses.count(),
+        'max_businesses': entitlements.for_request(request).max_businesses,
+        'current_businesses': len(user_businesses),
     }
     return render(request, 'local_businesses/dashboard.html', context)
 
@@ -240,7 +281,7 @@ def manage_photos(request):
     business_plan = getattr(business, 'businessplan', None)
     
     # Verificar limite de fotos
-    max_photos = business_plan.max_photos if business_plan else 1
+    max_photos = business_plan.max_photos if business_plan else entitlements.PLAN_LIMITS['free']['max_photos']
     current_photos = business.photos.count()
     
     if request.method == 'POST':
@@ -251,6 +292,13 @@ def manage_photos(request):
             photo_id = request.POST.get('photo_id')
             photo = get_object_or_404(BusinessPhoto, id=photo_id, business=business)
             photo.delete()
+            
+            # Promover outra foto para principal, se a excluída era a principal
+            if photo.is_primary:
+                next_photo = business.photos.order_by('id').first()
+                if next_photo:
+                    next_photo.is_primary = True
+                    next_photo.save(update_fields=['is_primary'])
             messages.success(request, 'Foto excluída com sucesso!')
             return redirect('local_businesses:manage_photos')
         elif action == 'set_primary':
@@ -267,8 +315,13 @@ def manage_photos(request):
             messages.success(request, 'Foto definida como principal!')
             return redirect('local_businesses:manage_photos')
         else:
-            # Adicionar nova foto
-            form = PhotoForm(request.POST, request.FILES)
+            # Adicionar nova foto (enviada no formulário ou antes, em partes, pelo app uploads)
+            files = request.FILES
+            upload = None
+            if request.POST.get('upload_id'):
+                upload = upload_sessions.completed_file(request.user, request.POST['upload_id'])
+                files = MultiValueDict({'image': [upload]} if upload else {})
+            form = PhotoForm(request.POST, files)
             if form.is_valid():
                 if current_photos >= max_photos:
                     messages.error(request, f'Você atingiu o limite de {max_photos} fotos para seu plano.')
@@ -281,6 +334,8 @@ def manage_photos(request):
                         photo.is_primary = True
                     
                     photo.save()
+                    if upload:
+                        upload_sessions.discard(upload.session)
                     messages.success(request, 'Foto adicionada com sucesso!')
                     return redirect('local_businesses:manage_photos')
             else:
@@ -370,32 +425,7 @@ def manage_plan(request):
                 return redirect('local_businesses:checkout')
             else:
                 # Atualizar plano gratuito diretamente
-                business_plan.plan_type = plan_type
-                
-                # Definir limites com base no plano
-                if plan_type == 'free':
-                    business_plan.max_photos = 1
-                    business_plan.max_businesses = 1
-                    business_plan.can_show_menu = False
-                    business_plan.can_show_website = False
-                    business_plan.can_show_whatsapp = False
-                    business_plan.is_featured = False
-                elif plan_type == 'pro':
-                    business_plan.max_photos = 5
-                    business_plan.max_businesses = 3
-                    business_plan.can_show_menu = False
-                    business_plan.can_show_website = True
-                    business_plan.can_show_whatsapp = True
-                    business_plan.is_featured = False
-                elif plan_type == 'premium':
-                    business_plan.max_photos = 10  # ou ilimitado
-                    business_plan.max_businesses = 10
-                    business_plan.can_show_menu = True
-                    business_plan.can_show_website = True
-                    business_plan.can_show_whatsapp = True
-                    business_plan.is_featured = True
-                    
-                business_plan.save()
+                entitlements.apply_plan(business_plan, plan_type).save()
                 messages.success(request, f'Plano atualizado para {business_plan.get_plan_type_display()}!')
                 return redirect('local_businesses:manage_plan')
     
@@ -457,11 +487,11 @@ def checkout(request):
             )
             
             # Criar notificação para o negócio
-            Notification.objects.create(
-                business=business,
-                notification_type='plan_upgrade',
-                title='Solicitação de Upgrade de Plano',
-                message=f'Sua solicitação para o plano {upgrade_request.get_requested_plan_display()} foi recebida e está aguardando aprovação.'
+            dispatch.enqueue(
+                business,
+                'plan_upgrade',
+                'Solicitação de Upgrade de Plano',
+                f'Sua solicitação para o plano {upgrade_request.get_requested_plan_display()} foi recebida e está aguardando aprovação.',
             )
             
             # Limpar a sessão
@@ -497,23 +527,28 @@ def add_review(request, business_id):
             review.business = business
             review.user = request.user
             
+            # A avaliação e os agregados do negócio são gravados juntos
+            with transaction.atomic():
+                if existing_review:
+                    # Atualizar avaliação existente
+                    existing_review.rating = review.rating
+                    existing_review.comment = review.comment
+                    existing_review.save()
+                else:
+                    # Criar nova avaliação
+                    review.save()
+                    # Create notification for business owner
+                    dispatch.enqueue(
+                        business,
+                        'review',
+                        f'Nova avaliação de {request.user.get_full_name() or request.user.username}',
+                        f'{request.user.get_full_name() or request.user.username} deixou uma avaliação de {review.rating} estrelas.',
+                        user=request.user,
+                    )
+            
             if existing_review:
-                # Atualizar avaliação existente
-                existing_review.rating = review.rating
-                existing_review.comment = review.comment
-                existing_review.save()
                 messages.success(request, 'Avaliação atualizada com sucesso!')
             else:
-                # Criar nova avaliação
-                review.save()
-                # Create notification for business owner
-                Notification.objects.create(
-                    business=business,
-                    user=request.user,
-                    notification_type='review',
-                    title=f'Nova avaliação de {request.user.get_full_name() or request.user.username}',
-                    message=f'{request.user.get_full_name() or request.user.username} deixou uma avaliação de {review.rating} estrelas.'
-                )
                 messages.success(request, 'Avaliação adicionada com sucesso!')
             
             return redirect('local_businesses:business_detail', business_id=business.id)
@@ -542,15 +577,24 @@ def book_service(request, business_id):
             booking = form.save(commit=False)
             booking.business = business
             booking.user = request.user
-            booking.save()
+            
+            try:
+                booking_service.create_booking(booking)
+            except booking_service.BookingConflict as e:
+                form.add_error('booking_time', str(e))
+                context = {
+                    'form': form,
+                    'business': business,
+                }
+                return render(request, 'local_businesses/book_service.html', context, status=409)
             
             # Create notification for business owner
-            Notification.objects.create(
-                business=business,
+            dispatch.enqueue(
+                business,
+                'booking',
+                f'Nova reserva de {request.user.get_full_name() or request.user.username}',
+                f'{request.user.get_full_name() or request.user.username} solicitou uma reserva para {booking.service_name} no dia {booking.booking_date} às {booking.booking_time}.',
                 user=request.user,
-                notification_type='booking',
-                title=f'Nova reserva de {request.user.get_full_name() or request.user.username}',
-                message=f'{request.user.get_full_name() or request.user.username} solicitou uma reserva para {booking.service_name} no dia {booking.booking_date} às {booking.booking_time}.'
             )
             
             messages.success(request, 'Reserva solicitada com sucesso! O estabelecimento entrará em contato para confirmação.')
@@ -568,7 +612,7 @@ def book_service(request, business_id):
 def manage_bookings(request):
     """Gerenciar reservas (para comerciantes)"""
     business = get_object_or_404(Business, user=request.user)
-    bookings = business.bookings.all().order_by('-booking_date', '-booking_time')
+    bookings = business.bookings.select_related('user').order_by('-booking_date', '-booking_time')
     
     if request.method == 'POST':
         booking_id = request.POST.get('booking_id')
@@ -579,34 +623,34 @@ def manage_bookings(request):
         if action == 'confirm':
             booking.status = 'confirmed'
             # Create notification for user
-            Notification.objects.create(
-                business=business,
+            dispatch.enqueue(
+                business,
+                'booking_update',
+                f'Reserva confirmada: {booking.service_name}',
+                f'Sua reserva para {booking.service_name} no dia {booking.booking_date} às {booking.booking_time} foi confirmada.',
                 user=request.user,
-                notification_type='booking_update',
-                title=f'Reserva confirmada: {booking.service_name}',
-                message=f'Sua reserva para {booking.service_name} no dia {booking.booking_date} às {booking.booking_time} foi confirmada.'
             )
             messages.success(request, f'Reserva para {booking.user.get_full_name() or booking.user.username} confirmada!')
         elif action == 'cancel':
             booking.status = 'cancelled'
             # Create notification for user
-            Notification.objects.create(
-                business=business,
+            dispatch.enqueue(
+                business,
+                'booking_update',
+                f'Reserva cancelada: {booking.service_name}',
+                f'Sua reserva para {booking.service_name} no dia {booking.booking_date} às {booking.booking_time} foi cancelada.',
                 user=request.user,
-                notification_type='booking_update',
-                title=f'Reserva cancelada: {booking.service_name}',
-                message=f'Sua reserva para {booking.service_name} no dia {booking.booking_date} às {booking.booking_time} foi cancelada.'
             )
             messages.info(request, f'Reserva para {booking.user.get_full_name() or booking.user.username} cancelada.')
         elif action == 'complete':
             booking.status = 'completed'
             # Create notification for user
-            Notification.objects.create(
-                business=business,
+            dispatch.enqueue(
+                business,
+                'booking_update',
+                f'Reserva concluída: {booking.service_name}',
+                f'Sua reserva para {booking.service_name} no dia {booking.booking_date} às {booking.booking_time} foi concluída. Obrigado!',
                 user=request.user,
-                notification_type='booking_update',
-                title=f'Reserva concluída: {booking.service_name}',
-                message=f'Sua reserva para {booking.service_name} no dia {booking.booking_date} às {booking.booking_time} foi concluída. Obrigado!'
             )
             messages.success(request, f'Reserva para {booking.user.get_full_name() or booking.user.username} marcada como concluída.')
         
@@ -664,7 +708,10 @@ def manage_notifications(request):
     notifications = business.notifications.all()
     
     # Marcar todas as notificações como lidas
-    business.notifications.filter(is_read=False).update(is_read=True)
+    marked = business.notifications.filter(is_read=False).update(is_read=True)
+    if marked:
+        notification_counters.invalidate(request.user.id)
+        stats.apply_delta(business.id, unread_notification_count=-marked)
     
     context = {
         'business': business,
@@ -674,22 +721,34 @@ def manage_notifications(request):
 
 @login_required
 def get_available_times(request, business_id, date_str):
-    """API para obter horários disponíveis para reserva"""
-    business = get_object_or_404(Business, id=business_id)
+    """API para obter horários disponíveis para reserva.
     
-    # Esta é uma implementação simplificada
-    # Em uma aplicação real, você precisaria verificar os horários já reservados
-    available_times = []
-    time_slots = business.time_slots.filter(is_active=True)
-    
-    for slot in time_slots:
-        # Adicionar horários disponíveis (simplificado)
-        available_times.append({
-            'start_time': slot.start_time.strftime('%H:%M'),
-            'end_time': slot.end_time.strftime('%H:%M'),
-        })
+    Aceita ?days=N para retornar N dias a partir de date_str (visão semanal).
+    """
+    business = get_object_or_404(Business, id=business_id)
     
-    return JsonResponse({'available_times': available_times})
+    try:
+        start_date = date.fromisoformat(date_str)
+        days = int(request.GET.get('days', 1))
+    except ValueError:
+        return JsonResponse({'error': 'Data inválida.'}, status=400)
+    
+    schedule = availability.available_times(business, start_date, days)
+    
+    # Não oferecer horários que já passaram
+    now = timezone.localtime()
+    by_day = {}
+    for day, intervals in schedule.items():
+        by_day[day.isoformat()] = [
+            {'start_time': start.strftime('%H:%M'), 'end_time': end.strftime('%H:%M'), 'remaining': remaining}
+            for start, end, remaining in intervals
+            if day > now.date() or (day == now.date() and start > now.time())
+        ]
+    
+    data = {'available_times': by_day[start_date.isoformat()]}
+    if len(by_day) > 1:
+        data['days'] = by_day
+    return JsonResponse(data)
 
 # Import necessário para o formulário TimeSlotForm
 from .forms import TimeSlotForm
@@ -702,37 +761,41 @@ def admin_dashboard(request):
         messages.error(request, 'Acesso negado. Apenas administradores podem acessar esta página.')
         return redirect('home')
     
-    # Obter estatísticas do sistema
-    total_businesses = Business.objects.count()
-    total_users = User.objects.count()
-    total_reviews = Review.objects.count()
-    total_bookings = Booking.objects.count()
-    
     # Obter solicitações de upgrade pendentes
     pending_upgrades = PlanUpgradeRequest.objects.filter(status='pending').select_related('business', 'billing_plan')
     
     # Obter últimos negócios registrados
-    latest_businesses = Business.objects.order_by('-created_at')[:5]
+    latest_businesses = Business.objects.select_related('category').order_by('-created_at')[:5]
     
     # Obter últimos usuários registrados
     latest_users = User.objects.order_by('-date_joined')[:5]
     
-    # Obter todos os usuários com seus negócios e planos
-    # Agora um usuário pode ter múltiplos negócios, então precisamos ajustar a lógica
-    users_with_plans = User.objects.prefetch_related('businesses__businessplan').order_by('username')
-    
+    # A tabela de usuários e planos é carregada por admin_users_api
     context = {
-        'total_businesses': total_businesses,
-        'total_users': total_users,
-        'total_reviews': total_reviews,
-        'total_bookings': total_bookings,
+        **admin_stats.totals(),
         'pending_upgrades': pending_upgrades,
         'latest_businesses': latest_businesses,
         'latest_users': latest_users,
-        'users_with_plans': users_with_plans,
+        'users_api_url': reverse('local_businesses:admin_users_api'),
     }
     return render(request, 'local_businesses/admin_dashboard.html', context)
 
+@login_required
+def admin_users_api(request):
+    """Usuários e seus planos em JSON, paginados por cursor e filtrados por ?q="""
+    if not request.user.is_superuser:
+        return JsonResponse({'error': 'Acesso negado.'}, status=403)
+    
+    try:
+        page = admin_stats.users_page(request.GET.get('q', '').strip(), request.GET.get('cursor'))
+    except pagination.InvalidCursor:
+        return JsonResponse({'error': 'Cursor inválido.'}, status=400)
+    
+    return JsonResponse({
+        'results': [admin_stats.serialize_user(user) for user in page],
+        'next_cursor': page.next_cursor,
+    })
+
 @login_required
 def approve_upgrade(request, upgrade_id):
     """Aprovar uma solicitação de upgrade de plano"""
@@ -753,39 +816,14 @@ def approve_upgrade(request, upgrade_id):
         
         # Atualizar o plano do negócio
         business_plan, created = BusinessPlan.objects.get_or_create(business=upgrade_request.business)
-        business_plan.plan_type = upgrade_request.requested_plan
-        
-        # Definir limites com base no plano
-        if upgrade_request.requested_plan == 'free':
-            business_plan.max_photos = 1
-            business_plan.max_businesses = 1
-            business_plan.can_show_menu = False
-            business_plan.can_show_website = False
-            business_plan.can_show_whatsapp = False
-            business_plan.is_featured = False
-        elif upgrade_request.requested_plan == 'pro':
-            business_plan.max_photos = 5
-            business_plan.max_businesses = 3
-            business_plan.can_show_menu = False
-            business_plan.can_show_website = True
-            business_plan.can_show_whatsapp = True
-            business_plan.is_featured = False
-        elif upgrade_request.requested_plan == 'premium':
-            business_plan.max_photos = 10  # ou ilimitado
-            business_plan.max_businesses = 10
-            business_plan.can_show_menu = True
-            business_plan.can_show_website = True
-            business_plan.can_show_whatsapp = True
-            business_plan.is_featured = True
-            
-        business_plan.save()
+        entitlements.apply_plan(business_plan, upgrade_request.requested_plan).save()
         
         # Criar notificação para o negócio
-        Notification.objects.create(
-            business=upgrade_request.business,
-            notification_type='plan_upgrade_approved',
-            title='Upgrade de Plano Aprovado',
-            message=f'Seu upgrade para o plano {upgrade_request.get_requested_plan_display()} foi aprovado com sucesso!'
+        dispatch.enqueue(
+            upgrade_request.business,
+            'plan_upgrade_approved',
+            'Upgrade de Plano Aprovado',
+            f'Seu upgrade para o plano {upgrade_request.get_requested_plan_display()} foi aprovado com sucesso!',
         )
         
         messages.success(request, f'Upgrade para o plano {upgrade_request.get_requested_plan_display()} aprovado com sucesso!')
@@ -817,11 +855,11 @@ def reject_upgrade(request, upgrade_id):
         upgrade_request.save()
         
         # Criar notificação para o negócio
-        Notification.objects.create(
-            business=upgrade_request.business,
-            notification_type='plan_upgrade_rejected',
-            title='Upgrade de Plano Rejeitado',
-            message=f'Seu upgrade para o plano {upgrade_request.get_requested_plan_display()} foi rejeitado. Motivo: {rejection_reason}'
+        dispatch.enqueue(
+            upgrade_request.business,
+            'plan_upgrade_rejected',
+            'Upgrade de Plano Rejeitado',
+            f'Seu upgrade para o plano {upgrade_request.get_requested_plan_display()} foi rejeitado. Motivo: {rejection_reason}',
         )
         
         messages.success(request, f'Upgrade para o plano {upgrade_request.get_requested_plan_display()} rejeitado.')
@@ -0,0 +1,131 @@
+"""Benchmark de escrita concorrente (reservas, avaliações e notificações).
+
+Usado pelo comando benchmark_db_writes: cria um banco descartável com a massa
+de benchmarks.seed() e dispara várias threads, cada uma com a sua conexão,
+executando a mesma mistura de escritas das views (reserva com verificação de
+conflito, avaliação com agregados e fila de notificação, marcar notificações
+como lidas). Mede vazão, latência e quantas operações falharam com
+"database is locked".
+
+Perfis: 'configured' usa DATABASES como está (PostgreSQL via DATABASE_URL ou
+SQLite, em modo WAL com SQLITE_WAL=1); 'rollback-journal' é o SQLite com as opções padrão (journal
+DELETE, synchronous FULL, transações DEFERRED, timeout de 5 s), para comparar.
+"""
+import random
+import threading
+import time
+from collections import Counter
+from datetime import date, time as dt_time, timedelta
+
+from django.contrib.auth.models import User
+from django.db import OperationalError, connection, transaction
+
+from . import benchmarks, dispatch, notifications, stats
+from . import bookings as booking_service
+from .models import Booking, Business, Review
+
+PROFILES = {
+    'configured': None,
+    'rollback-journal': {
+        'timeout': 5,
+        'init_command': 'PRAGMA journal_mode=DELETE;PRAGMA synchronous=FULL',
+    },
+}
+SQLITE_ONLY = {'rollback-journal'}
+
+# Peso de cada operação na mistura
+OPERATIONS = {'booking': 4, 'review': 3, 'notifications': 3}
+
+
+def book(rng, business_id, user_id):
+    booking = Booking(
+        business_id=business_id, user_id=user_id, service_name='Serviço',
+        booking_date=date.today() + timedelta(days=rng.randint(1, 60)),
+        booking_time=dt_time(rng.randint(8, 17)),
+    )
+    try:
+        booking_service.create_booking(booking)
+    except booking_service.BookingConflict:
+        return 'conflict'
+
+
+def review(rng, business_id, user_id):
+    with transaction.atomic():
+        existing = Review.objects.filter(business_id=business_id, user_id=user_id).first()
+        if existing:
+            existing.rating = rng.randint(1, 5)
+            existing.save()
+        else:
+            business = Business.objects.get(pk=business_id)
+            user = User.objects.get(pk=user_id)
+            Review.objects.create(business=business, user=user, rating=rng.randint(1, 5))
+            dispatch.enqueue(business, 'review', 'Nova avaliação', 'Benchmark', user=user)
+
+
+def read_notifications(rng, business_id, user_id):
+    with transaction.atomic():
+        business = Business.objects.only('id', 'user_id').get(pk=business_id)
+        marked = business.notifications.filter(is_read=False).update(is_read=True)
+        if marked:
+            stats.apply_delta(business.id, unread_notification_count=-marked)
+    if marked:
+        notifications.invalidate(business.user_id)
+
+
+def _worker(seed, operations, business_ids, user_ids, results, lock):
+    rng = random.Random(seed)
+    names = list(OPERATIONS)
+    weights = list(OPERATIONS.values())
+    latencies, outcomes = [], Counter()
+    try:
+        for _ in range(operations):
+            name = rng.choices(names, weights)[0]
+            operation = {'booking': book, 'review': review, 'notifications': read_notifications}[name]
+            started = time.perf_counter()
+            try:
+                outcome = operation(rng, rng.choice(business_ids), rng.choice(user_ids)) or 'ok'
+            except OperationalError as e:
+                if 'locked' not in str(e):
+                    raise
+                outcome = 'locked'
+            latencies.append(time.perf_counter() - started)
+            outcomes[outcome] += 1
+    finally:
+        connection.close()
+    with lock:
+        results['latencies'].extend(latencies)
+        results['outcomes'].update(outcomes)
+
+
+def run(threads=8, operations=200, seed=0):
+    """Roda a mistura de escritas no banco atual; retorna as métricas"""
+    business_ids = list(Business.objects.filter(is_active=True).order_by('id').values_list('id', flat=True))
+    user_ids = list(Review.objects.order_by().values_list('user_id', flat=True).distinct())
+    results = {'latencies': [], 'outcomes': Counter()}
+    lock = threading.Lock()
+    workers = [
+        threading.Thread(target=_worker, args=(seed + i, operations, business_ids, user_ids, results, lock))
+        for i in range(threads)
+    ]
+    # As threads abrem as próprias conexões; a do comando não pode segurar uma transação
+    connection.close()
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        'threads': threads,
+        'operations': len(results['latencies']),
+        **benchmarks.latency_report(results['latencies'], elapsed),
+        'outcomes': dict(results['outcomes']),
+    }
+
+
+def with_profile(profile, callback, businesses=200, seed=0):
+    """Executa callback() em um banco de teste novo com as opções do perfil"""
+    with benchmarks.throwaway_database(PROFILES[profile]):
+        counts = benchmarks.seed(businesses=businesses, seed=seed)
+        return counts, callback()
@@ -0,0 +1,83 @@
+"""Leitura das páginas públicas em uma réplica (DATABASES['replica']).
+
+ReplicaMiddleware liga a réplica só durante as views de REPLICA_VIEWS
+(GET/HEAD); todas as outras requisições, comandos e workers continuam lendo e
+escrevendo no primário, então nenhuma view precisa escolher o banco.
+ReplicaRouter manda as escritas sempre para o primário e, na requisição em que
+houve escrita, passa a ler do primário também.
+
+Para ler as próprias escritas apesar do atraso da réplica, a resposta de uma
+requisição que escreveu leva o cookie primary_until: até esse instante as
+views públicas desse navegador leem do primário. Sessões e usuários são
+sempre lidos do primário.
+
+O atraso da réplica também atingiria o cache de fragmentos (uma página
+renderizada logo depois de uma invalidação guardaria o conteúdo antigo com a
+versão nova); por isso, nos REPLICA_PIN_SECONDS depois de uma troca de versão,
+as leituras da réplica usam uma chave à parte (local_businesses.fragments).
+"""
+import threading
+import time
+
+from django.conf import settings
+
+REPLICA = 'replica'
+PRIMARY = 'default'
+PRIMARY_ONLY_APPS = {'auth', 'sessions'}
+PIN_COOKIE = 'primary_until'
+
+_state = threading.local()
+
+
+def _reset():
+    _state.use_replica = False
+    _state.wrote = False
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (getattr(_state, 'use_replica', False) and not getattr(_state, 'wrote', False)
+                and model._meta.app_label not in PRIMARY_ONLY_APPS):
+            return REPLICA
+        return PRIMARY
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # A réplica tem os mesmos dados do primário
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # A réplica recebe o esquema pela replicação (ou sync_replica)
+        return db == PRIMARY
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _reset()
+        try:
+            response = self.get_response(request)
+            if _state.wrote and REPLICA in settings.DATABASES:
+                response.set_cookie(PIN_COOKIE, str(int(time.time()) + settings.REPLICA_PIN_SECONDS),
+                                    max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax')
+            return response
+        finally:
+            _reset()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (REPLICA in settings.DATABASES and request.method in ('GET', 'HEAD')
+                and request.resolver_match.view_name in settings.REPLICA_VIEWS
+                and not self.pinned(request)):
+            _state.use_replica = True
+
+    @staticmethod
+    def pinned(request):
+        try:
+            return int(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
@@ -0,0 +1,117 @@
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import resolve, reverse
+
+from local_businesses.models import Business
+from . import replicas
+
+# Só o middleware consulta DATABASES['replica']; nenhuma consulta chega a usá-lo
+REPLICA_ALIAS = {'replica': {**settings.DATABASES['default']}}
+
+
+@mock.patch.dict(settings.DATABASES, REPLICA_ALIAS)
+@override_settings(REPLICA_PIN_SECONDS=5)
+class ReplicaRoutingTests(SimpleTestCase):
+    """Views públicas leem da réplica; quem escreveu lê do primário pelo cookie primary_until"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = replicas.ReplicaRouter()
+        self.list_url = reverse('local_businesses:business_list')
+
+    def request(self, path, method='get', cookies=None, write=False):
+        """Passa a requisição pelo middleware; retorna (resposta, bancos lidos pela view)"""
+        request = getattr(self.factory, method)(path)
+        request.COOKIES.update(cookies or {})
+        request.resolver_match = match = resolve(path)
+        reads = {}
+
+        def view(request):
+            middleware.process_view(request, match.func, match.args, match.kwargs)
+            reads['business'] = self.router.db_for_read(Business)
+            reads['user'] = self.router.db_for_read(User)
+            reads['session'] = self.router.db_for_read(Session)
+            if write:
+                self.assertEqual(self.router.db_for_write(Business), replicas.PRIMARY)
+                reads['after_write'] = self.router.db_for_read(Business)
+            return HttpResponse()
+
+        middleware = replicas.ReplicaMiddleware(view)
+        return middleware(request), reads
+
+    def test_public_get_reads_from_the_replica(self):
+        for method in ('get', 'head'):
+            with self.subTest(method=method):
+                response, reads = self.request(self.list_url, method)
+                self.assertEqual(reads, {'business': 'replica', 'user': 'default', 'session': 'default'})
+                self.assertNotIn(replicas.PIN_COOKIE, response.cookies)
+        # Fora da requisição tudo volta para o primário
+        self.assertEqual(self.router.db_for_read(Business), replicas.PRIMARY)
+
+    def test_other_requests_stay_on_the_primary(self):
+        cases = [
+            ('post', self.list_url),
+            ('get', reverse('local_businesses:business_dashboard')),
+        ]
+        for method, path in cases:
+            with self.subTest(method=method, path=path):
+                self.assertEqual(self.request(path, method)[1]['business'], replicas.PRIMARY)
+
+    def test_write_pins_the_browser_to_the_primary(self):
+        before = int(time.time())
+        response, reads = self.request(self.list_url, write=True)
+        self.assertEqual(reads['after_write'], replicas.PRIMARY)
+        cookie = response.cookies[replicas.PIN_COOKIE]
+        self.assertIn(int(cookie.value), range(before + 5, int(time.time()) + 6))
+        self.assertEqual(cookie['max-age'], 5)
+        self.assertTrue(cookie['httponly'])
+        self.assertEqual(cookie['samesite'], 'Lax')
+
+        _, reads = self.request(self.list_url, cookies={replicas.PIN_COOKIE: cookie.value})
+        self.assertEqual(reads['business'], replicas.PRIMARY)
+
+    def test_expired_or_invalid_pin_is_ignored(self):
+        for value in (str(int(time.time()) - 1), 'x', ''):
+            with self.subTest(value=value):
+                _, reads = self.request(self.list_url, cookies={replicas.PIN_COOKIE: value})
+                self.assertEqual(reads['business'], 'replica')
+
+    def test_state_is_reset_after_an_error(self):
+        def view(request):
+            middleware.process_view(request, None, (), {})
+            raise RuntimeError
+
+        request = self.factory.get(self.list_url)
+        request.resolver_match = resolve(self.list_url)
+        middleware = replicas.ReplicaMiddleware(view)
+        with self.assertRaises(RuntimeError):
+            middleware(request)
+        self.assertEqual(self.router.db_for_read(Business), replicas.PRIMARY)
+
+    def test_only_the_primary_is_migrated(self):
+        self.assertTrue(self.router.allow_migrate('default', 'local_businesses'))
+        self.assertFalse(self.router.allow_migrate('replica', 'local_businesses'))
+
+
+class NoReplicaTests(SimpleTestCase):
+    """Sem DATABASES['replica'] nada muda"""
+
+    def test_no_replica_no_pin(self):
+        request = RequestFactory().get(reverse('local_businesses:business_list'))
+        request.resolver_match = match = resolve(request.path)
+        router = replicas.ReplicaRouter()
+
+        def view(request):
+            middleware.process_view(request, match.func, match.args, match.kwargs)
+            self.assertEqual(router.db_for_read(Business), replicas.PRIMARY)
+            router.db_for_write(Business)
+            return HttpResponse()
+
+        middleware = replicas.ReplicaMiddleware(view)
+        self.assertNotIn(replicas.PIN_COOKIE, middleware(request).cookies)
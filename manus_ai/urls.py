@@ -29,6 +29,7 @@ urlpatterns = [
     path('community/', include('community.urls')),
     path('billing/', include('billing.urls')),
     path('businesses/', include('local_businesses.urls')),  # Novo app adicionado
+    path('uploads/', include('uploads.urls')),
 ]
 
 # Servir arquivos de mídia durante o desenvolvimento
@@ -0,0 +1,38 @@
+from datetime import timedelta
+
+from django.contrib import admin
+from django.template.response import TemplateResponse
+from django.utils import timezone
+
+from . import metrics
+from .models import RequestSample
+
+
+@admin.register(RequestSample)
+class RequestSampleAdmin(admin.ModelAdmin):
+    """A lista das amostras é substituída pelo resumo por nome de URL"""
+    windows = (1, 24, 24 * 7)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        try:
+            hours = int(request.GET.get('hours', 24))
+        except ValueError:
+            hours = 24
+        # O que ainda está em memória neste processo também entra no resumo
+        metrics.flush()
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Desempenho por view',
+            'hours': hours,
+            'windows': self.windows,
+            'rows': metrics.summarize(timezone.now() - timedelta(hours=hours)),
+            **(extra_context or {}),
+        }
+        return TemplateResponse(request, 'admin/monitoring/summary.html', context)
@@ -0,0 +1,166 @@
+"""Métricas por requisição: consultas, tempo de banco, de template e tamanho.
+
+PerformanceMiddleware abre uma medição por requisição (thread-local); as
+consultas de todos os bancos passam por record_query (execute_wrapper) e as
+renderizações pelo backend de templates de monitoring.template_backend. Ao
+final a medição vira um RequestSample, guardado em memória e gravado em lote
+(PERF_FLUSH_SIZE amostras ou PERF_FLUSH_SECONDS), para não escrever no banco a
+cada requisição. Amostras ainda em memória se perdem se o processo terminar.
+
+summarize() agrega as amostras de uma janela por nome de URL com p50/p95/p99.
+"""
+import math
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import RequestSample
+
+DEFAULT_FLUSH_SIZE = 50
+DEFAULT_FLUSH_SECONDS = 30
+DEFAULT_RETENTION_DAYS = 7
+
+_local = threading.local()
+_buffer = []
+_buffer_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class Recording:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+
+
+def start():
+    _local.recording = Recording()
+    return _local.recording
+
+
+def stop():
+    _local.recording = None
+
+
+def current():
+    return getattr(_local, 'recording', None)
+
+
+def record_query(execute, sql, params, many, context):
+    recording = current()
+    if recording is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        recording.queries += 1
+        recording.db_time += time.perf_counter() - started
+
+
+class template_timer:
+    """Soma o tempo de renderização; renderizações aninhadas contam uma vez só"""
+
+    def __enter__(self):
+        self.recording = current()
+        if self.recording is not None:
+            self.recording.template_depth += 1
+            self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        if self.recording is not None:
+            self.recording.template_depth -= 1
+            if not self.recording.template_depth:
+                self.recording.template_time += time.perf_counter() - self.started
+
+
+def budget_for(view_name):
+    return getattr(settings, 'QUERY_BUDGETS', {}).get(view_name)
+
+
+def check_budget(view_name, queries):
+    budget = budget_for(view_name)
+    if budget is not None and queries > budget and getattr(settings, 'QUERY_BUDGETS_STRICT', False):
+        raise QueryBudgetExceeded(f'{view_name} executou {queries} consultas; o orçamento é {budget}')
+
+
+def server_timing(recording, total):
+    return ', '.join([
+        f'db;dur={recording.db_time * 1000:.1f};desc="{recording.queries} queries"',
+        f'tpl;dur={recording.template_time * 1000:.1f}',
+        f'total;dur={total * 1000:.1f}',
+    ])
+
+
+def add_sample(sample):
+    if random.random() >= getattr(settings, 'PERF_SAMPLE_RATE', 1.0):
+        return
+    with _buffer_lock:
+        _buffer.append(sample)
+        due = (len(_buffer) >= getattr(settings, 'PERF_FLUSH_SIZE', DEFAULT_FLUSH_SIZE)
+               or time.monotonic() - _last_flush >= getattr(settings, 'PERF_FLUSH_SECONDS', DEFAULT_FLUSH_SECONDS))
+    if due:
+        flush()
+
+
+def flush():
+    """Grava as amostras em memória e apaga as mais antigas que PERF_RETENTION_DAYS"""
+    global _last_flush
+    with _buffer_lock:
+        samples = _buffer[:]
+        _buffer.clear()
+        _last_flush = time.monotonic()
+    if not samples:
+        return 0
+    RequestSample.objects.bulk_create(samples)
+    retention = timedelta(days=getattr(settings, 'PERF_RETENTION_DAYS', DEFAULT_RETENTION_DAYS))
+    RequestSample.objects.filter(created_at__lt=timezone.now() - retention).delete()
+    return len(samples)
+
+
+def percentile(values, p):
+    """Percentil pelo posto mais próximo; values já ordenados"""
+    if not values:
+        return None
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def summarize(since):
+    """Uma linha por nome de URL com contagens e percentis, da mais lenta (p95) para a mais rápida"""
+    columns = ('queries', 'db_ms', 'template_ms', 'total_ms', 'response_bytes')
+    grouped = defaultdict(lambda: defaultdict(list))
+    rows = (RequestSample.objects.filter(created_at__gte=since)
+            .values_list('view_name', *columns).iterator(chunk_size=5000))
+    for view_name, *values in rows:
+        for column, value in zip(columns, values):
+            if value is not None:
+                grouped[view_name][column].append(value)
+
+    summary = []
+    for view_name, values in grouped.items():
+        for column in values.values():
+            column.sort()
+        budget = budget_for(view_name)
+        row = {
+            'view_name': view_name,
+            'requests': len(values['total_ms']),
+            'budget': budget,
+            'over_budget': sum(1 for count in values['queries'] if count > budget) if budget is not None else 0,
+        }
+        for column in columns:
+            for p in (50, 95, 99):
+                row[f'{column}_p{p}'] = percentile(values[column], p)
+        summary.append(row)
+    summary.sort(key=lambda row: row['total_ms_p95'], reverse=True)
+    return summary
@@ -0,0 +1,60 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+from django.utils.functional import empty
+
+from . import metrics
+from .models import RequestSample
+
+
+class PerformanceMiddleware:
+    """Mede cada requisição e responde com o cabeçalho Server-Timing.
+
+    O cabeçalho vai para todos quando PERF_SERVER_TIMING está ligado e, fora
+    isso, só para a equipe que a view já carregou: ler request.user aqui custaria
+    as consultas da sessão e do usuário em toda requisição. Com QUERY_BUDGETS_STRICT (nos testes), uma view que
+    passa do orçamento de consultas de QUERY_BUDGETS levanta QueryBudgetExceeded.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recording = metrics.start()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all(initialized_only=False):
+                    stack.enter_context(connection.execute_wrapper(metrics.record_query))
+                response = self.get_response(request)
+        finally:
+            metrics.stop()
+        total = time.perf_counter() - recording.started
+
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else '<unresolved>'
+        if getattr(settings, 'PERF_SERVER_TIMING', False) or _loaded_staff(request):
+            response['Server-Timing'] = metrics.server_timing(recording, total)
+        metrics.add_sample(RequestSample(
+            view_name=view_name,
+            method=request.method,
+            status=response.status_code,
+            queries=recording.queries,
+            db_ms=recording.db_time * 1000,
+            template_ms=recording.template_time * 1000,
+            total_ms=total * 1000,
+            response_bytes=None if response.streaming else len(response.content),
+            created_at=timezone.now(),
+        ))
+        metrics.check_budget(view_name, recording.queries)
+        return response
+
+
+def _loaded_staff(request):
+    # Respostas dadas antes do AuthenticationMiddleware (ex.: Host inválido) não têm request.user
+    user = getattr(request, 'user', None)
+    if user is None or getattr(user, '_wrapped', None) is empty:
+        return False
+    return user.is_staff
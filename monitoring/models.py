@@ -0,0 +1,22 @@
+from django.db import models
+
+
+class RequestSample(models.Model):
+    """Métricas de uma requisição, gravadas em lote por monitoring.metrics"""
+    view_name = models.CharField(max_length=200)
+    method = models.CharField(max_length=10)
+    status = models.PositiveSmallIntegerField()
+    queries = models.PositiveIntegerField()
+    db_ms = models.FloatField()
+    template_ms = models.FloatField()
+    total_ms = models.FloatField()
+    response_bytes = models.PositiveIntegerField(null=True, blank=True)  # vazio em respostas em streaming
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='request_sample_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.method} {self.view_name} ({self.total_ms:.1f} ms)'
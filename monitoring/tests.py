@@ -0,0 +1,163 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import metrics
+from .models import RequestSample
+
+
+def sample(view_name='home', total_ms=10.0, queries=1, response_bytes=100, created_at=None):
+    return RequestSample(view_name=view_name, method='GET', status=200, queries=queries, db_ms=1.0,
+                         template_ms=2.0, total_ms=total_ms, response_bytes=response_bytes,
+                         created_at=created_at or timezone.now())
+
+
+class PercentileTests(SimpleTestCase):
+    """Percentil pelo posto mais próximo"""
+
+    def test_nearest_rank(self):
+        values = list(range(1, 11))
+        cases = [(0, 1), (10, 1), (11, 2), (50, 5), (51, 6), (95, 10), (99, 10), (100, 10)]
+        for p, expected in cases:
+            with self.subTest(p=p):
+                self.assertEqual(metrics.percentile(values, p), expected)
+        self.assertEqual(metrics.percentile(list(range(1, 101)), 95), 95)
+
+    def test_small_samples(self):
+        self.assertIsNone(metrics.percentile([], 50))
+        self.assertEqual([metrics.percentile([7], p) for p in (50, 95, 99)], [7, 7, 7])
+
+
+class SummarizeTests(TestCase):
+    """Resumo das amostras por nome de URL"""
+
+    @override_settings(QUERY_BUDGETS={'home': 2})
+    def test_groups_by_view(self):
+        now = timezone.now()
+        RequestSample.objects.bulk_create(
+            [sample('home', total_ms=ms, queries=ms % 4) for ms in range(1, 21)]
+            + [sample('detail', total_ms=100.0, response_bytes=None), sample('detail', total_ms=300.0)]
+            + [sample('old', total_ms=999.0, created_at=now - timedelta(days=2))]
+        )
+        summary = metrics.summarize(now - timedelta(days=1))
+        self.assertEqual([row['view_name'] for row in summary], ['detail', 'home'])
+
+        detail, home = summary
+        self.assertEqual((detail['requests'], detail['budget'], detail['over_budget']), (2, None, 0))
+        self.assertEqual((detail['total_ms_p50'], detail['total_ms_p99']), (100.0, 300.0))
+        # Respostas em streaming não têm tamanho
+        self.assertEqual((detail['response_bytes_p50'], detail['response_bytes_p99']), (100, 100))
+
+        self.assertEqual((home['requests'], home['budget'], home['over_budget']), (20, 2, 5))
+        self.assertEqual((home['total_ms_p50'], home['total_ms_p95'], home['total_ms_p99']), (10.0, 19.0, 20.0))
+        self.assertEqual(home['queries_p99'], 3)
+
+    def test_empty_window(self):
+        self.assertEqual(metrics.summarize(timezone.now()), [])
+
+
+@override_settings(PERF_SAMPLE_RATE=1, PERF_FLUSH_SIZE=3, PERF_FLUSH_SECONDS=3600, PERF_RETENTION_DAYS=7)
+class FlushTests(TestCase):
+    """Amostras ficam em memória e são gravadas em lote"""
+
+    def setUp(self):
+        metrics._buffer.clear()
+        self.addCleanup(metrics._buffer.clear)
+        metrics.flush()
+
+    def test_samples_are_written_in_batches(self):
+        metrics.add_sample(sample())
+        metrics.add_sample(sample())
+        self.assertFalse(RequestSample.objects.exists())
+        metrics.add_sample(sample())
+        self.assertEqual(RequestSample.objects.count(), 3)
+        self.assertEqual(metrics._buffer, [])
+
+    @override_settings(PERF_FLUSH_SECONDS=0)
+    def test_samples_are_written_after_the_interval(self):
+        metrics.add_sample(sample())
+        self.assertEqual(RequestSample.objects.count(), 1)
+
+    @override_settings(PERF_SAMPLE_RATE=0)
+    def test_sampling(self):
+        metrics.add_sample(sample())
+        self.assertEqual(metrics._buffer, [])
+
+    def test_flush_prunes_old_samples(self):
+        now = timezone.now()
+        RequestSample.objects.bulk_create([
+            sample('expired', created_at=now - timedelta(days=8)),
+            sample('kept', created_at=now - timedelta(days=6)),
+        ])
+        self.assertEqual(metrics.flush(), 0)
+        # Sem amostras novas nada é apagado
+        self.assertEqual(RequestSample.objects.count(), 2)
+
+        metrics.add_sample(sample('new'))
+        self.assertEqual(metrics.flush(), 1)
+        self.assertEqual(sorted(RequestSample.objects.values_list('view_name', flat=True)), ['kept', 'new'])
+
+
+@override_settings(PERF_SERVER_TIMING=False, PERF_SAMPLE_RATE=1, PERF_FLUSH_SIZE=1000, PERF_FLUSH_SECONDS=3600,
+                   ALLOWED_HOSTS=['testserver'])
+class PerformanceMiddlewareTests(TestCase):
+    """Medição por requisição e o cabeçalho Server-Timing"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('equipe', password='senha123', is_staff=True)
+        cls.user = User.objects.create_user('cliente', password='senha123')
+
+    def setUp(self):
+        metrics._buffer.clear()
+        self.addCleanup(metrics._buffer.clear)
+
+    def test_server_timing_only_for_staff(self):
+        self.assertNotIn('Server-Timing', self.client.get('/'))
+        self.client.login(username='cliente', password='senha123')
+        self.assertNotIn('Server-Timing', self.client.get('/'))
+        self.client.login(username='equipe', password='senha123')
+        self.assertRegex(self.client.get('/')['Server-Timing'],
+                         r'^db;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+, total;dur=[\d.]+$')
+
+    def test_user_is_not_loaded_for_the_header(self):
+        self.client.login(username='equipe', password='senha123')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('local_businesses:business_api'))
+        # A view não usa request.user: nem sessão nem usuário são consultados
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertNotIn('django_session', sql)
+        self.assertNotIn('auth_user', sql)
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(PERF_SERVER_TIMING=True)
+    def test_server_timing_for_everyone(self):
+        self.assertIn('Server-Timing', self.client.get('/'))
+
+    def test_sample_is_recorded(self):
+        response = self.client.get('/')
+        recorded = metrics._buffer[-1]
+        self.assertEqual((recorded.view_name, recorded.method, recorded.status), ('home', 'GET', 200))
+        self.assertEqual(recorded.response_bytes, len(response.content))
+        self.assertGreater(recorded.queries, 0)
+        self.assertGreater(recorded.total_ms, 0)
+
+    def test_response_before_authentication(self):
+        # DisallowedHost sai do CommonMiddleware, antes de request.user existir
+        with self.assertLogs('django.security.DisallowedHost', 'ERROR'):
+            response = self.client.get('/', headers={'host': 'invalido.example'})
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual((metrics._buffer[-1].view_name, metrics._buffer[-1].status), ('<unresolved>', 400))
+
+    @override_settings(QUERY_BUDGETS={'home': 0}, QUERY_BUDGETS_STRICT=True)
+    def test_query_budget(self):
+        with self.assertRaises(metrics.QueryBudgetExceeded):
+            self.client.get('/')
+        with override_settings(QUERY_BUDGETS_STRICT=False):
+            self.assertEqual(self.client.get('/').status_code, 200)
@@ -1,4 +1,8 @@
+# Dados de demonstração (usuários joao e maria, planos, tarefas, eventos).
+# Argumentos extras são repassados ao comando generate_data, que gera uma massa
+# sintética em escala: python populate_data.py --users 1000000 --businesses 200000
 import os
+import sys
 import django
 
 # Configurar o Django
@@ -6,6 +10,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'manus_ai.settings')
 django.setup()
 
 from django.contrib.auth.models import User
+from django.core.management import call_command
 from accounts.models import Profile, Team, TeamMembership
 from tasks.models import Task
 from billing.models import Plan
@@ -248,4 +253,6 @@ def create_sample_data():
     print("Dados de exemplo criados com sucesso!")
 
 if __name__ == '__main__':
-    create_sample_data()
\ No newline at end of file
+    create_sample_data()
+    if len(sys.argv) > 1:
+        call_command('generate_data', *sys.argv[1:])
\ No newline at end of file
@@ -0,0 +1,40 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from tasks import scheduler
+
+class Command(BaseCommand):
+    help = 'Run due scheduled tasks on a worker pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--processes', action='store_true',
+                            help='Use a process pool instead of threads')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep polling for due tasks instead of exiting when there are none')
+        parser.add_argument('--interval', type=float, default=30,
+                            help='Seconds between polls when --loop is used')
+
+    def handle(self, *args, **options):
+        pool = ProcessPoolExecutor if options['processes'] else ThreadPoolExecutor
+        totals = {}
+        with pool(max_workers=options['workers']) as executor:
+            while True:
+                results = scheduler.run_due(executor, batch_size=options['batch_size'],
+                                            processes=options['processes'])
+                for key, value in results.items():
+                    totals[key] = totals.get(key, 0) + value
+                if results['claimed']:
+                    continue
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{totals.get('completed', 0)} scheduled tasks completed, "
+            f"{totals.get('failed', 0)} failed, {totals.get('skipped', 0)} skipped, "
+            f"{totals.get('missed', 0)} missed runs coalesced"
+        ))
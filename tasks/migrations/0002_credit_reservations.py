@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='credits_reserved',
+            field=models.IntegerField(default=0),
+        ),
+    ]
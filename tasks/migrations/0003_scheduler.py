@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0002_credit_reservations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scheduledtask',
+            name='claimed_by',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='scheduledtask',
+            name='claimed_until',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='scheduledtask',
+            name='interval',
+            field=models.DurationField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='scheduledtask',
+            index=models.Index(fields=['is_active', 'next_run'], name='scheduled_task_due_idx'),
+        ),
+    ]
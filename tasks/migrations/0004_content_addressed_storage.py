@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:07
+
+import uploads.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0003_scheduler'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='taskfile',
+            name='file',
+            field=models.FileField(storage=uploads.storage.get_content_storage, upload_to='task_files/'),
+        ),
+    ]
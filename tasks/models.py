@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
 from accounts.models import Team
+from uploads.storage import get_content_storage
 
 class Task(models.Model):
     STATUS_CHOICES = [
@@ -24,6 +25,7 @@ class Task(models.Model):
     assigned_to = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='assigned_tasks')
     team = models.ForeignKey(Team, on_delete=models.CASCADE, null=True, blank=True)
     credits_used = models.IntegerField(default=0)
+    credits_reserved = models.IntegerField(default=0)  # Reserva em aberto enquanto a tarefa executa
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     completed_at = models.DateTimeField(null=True, blank=True)
@@ -42,16 +44,25 @@ class ScheduledTask(models.Model):
     task = models.ForeignKey(Task, on_delete=models.CASCADE)
     frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES)
     next_run = models.DateTimeField()
+    interval = models.DurationField(null=True, blank=True)  # Usado pela frequência custom
     is_active = models.BooleanField(default=True)
+    # Worker que reservou a execução e até quando a reserva vale (ver tasks.scheduler)
+    claimed_by = models.CharField(max_length=64, blank=True, editable=False)
+    claimed_until = models.DateTimeField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_active', 'next_run'], name='scheduled_task_due_idx'),
+        ]
+    
     def __str__(self):
         return f'Scheduled: {self.task.title}'
 
 class TaskFile(models.Model):
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='files')
-    file = models.FileField(upload_to='task_files/')
+    file = models.FileField(upload_to='task_files/', storage=get_content_storage)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
@@ -0,0 +1,176 @@
+"""Execução das tarefas agendadas (ScheduledTask).
+
+O comando run_scheduler consulta os agendamentos vencidos pelo índice
+(is_active, next_run) e os reserva em lote com um único UPDATE condicional
+(claimed_by/claimed_until), de modo que vários workers possam rodar ao mesmo
+tempo sem executar o mesmo agendamento duas vezes. Uma reserva abandonada
+(worker que caiu) expira depois de LEASE segundos.
+
+Execuções perdidas (o scheduler ficou parado) não são repetidas uma a uma:
+o agendamento roda uma vez e next_run avança direto para a próxima ocorrência
+no futuro. Cada usuário executa no máximo Plan.max_scheduled_tasks
+agendamentos ativos (os mais antigos); os demais apenas avançam.
+
+A execução reserva SCHEDULED_TASK_CREDITS créditos (billing.credits), chama
+SCHEDULED_TASK_HANDLER com a tarefa e debita o valor retornado por ele.
+"""
+import calendar
+import logging
+import uuid
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from billing import credits
+from billing.models import Plan, Subscription
+from .models import ScheduledTask, Task
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HANDLER = 'tasks.scheduler.complete_task'
+DEFAULT_CREDITS = 1
+
+# Segundos que um worker tem para avançar os agendamentos que reservou
+LEASE = 300
+
+STEPS = {
+    'daily': timedelta(days=1),
+    'weekly': timedelta(weeks=1),
+}
+
+
+def complete_task(task):
+    """Execução padrão: apenas conclui a tarefa, debitando a reserva inteira"""
+    return None
+
+
+def add_months(value, months):
+    index = value.month - 1 + months
+    year, month = value.year + index // 12, index % 12 + 1
+    return value.replace(year=year, month=month, day=min(value.day, calendar.monthrange(year, month)[1]))
+
+
+def next_occurrence(schedule, now):
+    """(próxima execução depois de now, execuções perdidas); (None, 0) se o agendamento é inválido"""
+    if schedule.frequency == 'monthly':
+        months = max(1, (now.year - schedule.next_run.year) * 12 + now.month - schedule.next_run.month)
+        while add_months(schedule.next_run, months) <= now:
+            months += 1
+        return add_months(schedule.next_run, months), months - 1
+
+    step = STEPS.get(schedule.frequency) or schedule.interval
+    if not step or step <= timedelta(0):
+        return None, 0
+    runs = max(1, (now - schedule.next_run) // step + 1)
+    return schedule.next_run + runs * step, runs - 1
+
+
+def allowed_schedule_ids(user_ids):
+    """Agendamentos ativos dentro do limite do plano de cada usuário"""
+    default = Plan._meta.get_field('max_scheduled_tasks').default
+    limits = dict(Subscription.objects.filter(user_id__in=user_ids, is_active=True)
+                  .values_list('user_id', 'plan__max_scheduled_tasks'))
+    active = (ScheduledTask.objects.filter(is_active=True, task__created_by_id__in=user_ids)
+              .order_by('id').values_list('id', 'task__created_by_id'))
+    used = Counter()
+    allowed = set()
+    for schedule_id, user_id in active:
+        if used[user_id] < limits.get(user_id, default):
+            used[user_id] += 1
+            allowed.add(schedule_id)
+    return allowed
+
+
+def claim(batch_size, now=None):
+    """Reserva até batch_size agendamentos vencidos e avança next_run.
+
+    Retorna (quantos foram reservados, agendamentos que devem rodar agora).
+    """
+    now = now or timezone.now()
+    token = uuid.uuid4().hex
+    due = ScheduledTask.objects.filter(is_active=True, next_run__lte=now).filter(
+        Q(claimed_until__isnull=True) | Q(claimed_until__lt=now))
+    ids = list(due.order_by('next_run').values_list('id', flat=True)[:batch_size])
+    if not ids:
+        return 0, []
+    # As condições são repetidas no UPDATE: quem chegar depois não reserva nada
+    if not due.filter(id__in=ids).update(claimed_by=token, claimed_until=now + timedelta(seconds=LEASE)):
+        return 0, []
+
+    with transaction.atomic():
+        schedules = list(ScheduledTask.objects.filter(claimed_by=token).select_related('task'))
+        for schedule in schedules:
+            schedule.next_run, schedule.missed = next_occurrence(schedule, now)
+            if schedule.next_run is None:
+                logger.warning('Agendamento %d sem intervalo válido; desativado', schedule.pk)
+                schedule.next_run = now
+                schedule.is_active = False
+            schedule.claimed_by = ''
+            schedule.claimed_until = None
+        ScheduledTask.objects.bulk_update(schedules, ['next_run', 'is_active', 'claimed_by', 'claimed_until'])
+
+    allowed = allowed_schedule_ids({schedule.task.created_by_id for schedule in schedules})
+    runnable = []
+    for schedule in schedules:
+        if not schedule.is_active:
+            continue
+        if schedule.pk not in allowed:
+            logger.info('Agendamento %d acima do limite do plano; execução ignorada', schedule.pk)
+            continue
+        if schedule.missed:
+            logger.info('Agendamento %d: %d execuções perdidas agrupadas', schedule.pk, schedule.missed)
+        runnable.append(schedule)
+    return len(schedules), runnable
+
+
+def execute(task_id):
+    """Executa uma tarefa; retorna 'completed', 'failed' ou 'skipped'"""
+    task = Task.objects.select_related('created_by').get(pk=task_id)
+    cost = getattr(settings, 'SCHEDULED_TASK_CREDITS', DEFAULT_CREDITS)
+    handler = import_string(getattr(settings, 'SCHEDULED_TASK_HANDLER', DEFAULT_HANDLER))
+    if cost:
+        try:
+            credits.reserve(task, cost)
+        except credits.CreditError as e:
+            logger.info('Tarefa %d não executada: %s', task_id, e)
+            return 'skipped'
+    try:
+        used = handler(task)
+    except Exception:
+        logger.exception('Falha ao executar a tarefa agendada %d', task_id)
+        if cost:
+            credits.refund(task)
+        else:
+            Task.objects.filter(pk=task_id).update(status='failed')
+        return 'failed'
+    if cost:
+        credits.commit(task, cost if used is None else min(used, cost))
+    else:
+        Task.objects.filter(pk=task_id).update(status='completed', completed_at=timezone.now())
+    return 'completed'
+
+
+def _execute_in_worker(task_id):
+    try:
+        return execute(task_id)
+    finally:
+        # Cada thread do pool abre a sua conexão
+        connection.close()
+
+
+def run_due(executor, batch_size=100, processes=False):
+    """Reserva um lote de agendamentos vencidos e os executa no pool; retorna a contagem por resultado"""
+    claimed, schedules = claim(batch_size)
+    results = Counter(claimed=claimed, missed=sum(schedule.missed for schedule in schedules))
+    if not schedules:
+        return results
+    if processes:
+        # Processos filhos não podem herdar as conexões abertas do pai
+        connections.close_all()
+    results.update(executor.map(_execute_in_worker, [schedule.task_id for schedule in schedules]))
+    return results
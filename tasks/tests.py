@@ -1,3 +1,186 @@
-from django.test import TestCase
+from datetime import datetime, timedelta, timezone as dt_timezone
+from types import SimpleNamespace
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import Profile
+from billing import ledger
+from billing.models import CreditTransaction, Plan, Subscription
+from . import scheduler
+from .models import ScheduledTask, Task
+
+
+class SerialExecutor:
+    """Executor que roda no próprio thread, para os testes enxergarem a transação"""
+
+    def map(self, func, items):
+        return [func(item) for item in items]
+
+
+def failing_handler(task):
+    raise RuntimeError('falhou')
+
+
+def partial_handler(task):
+    return 1
+
+
+class NextOccurrenceTests(TestCase):
+    """Próxima execução e execuções perdidas de cada frequência"""
+
+    start = datetime(2024, 1, 31, 9, 0, tzinfo=dt_timezone.utc)
+
+    def schedule(self, frequency, interval=None):
+        return SimpleNamespace(frequency=frequency, next_run=self.start, interval=interval)
+
+    def test_on_time_run_advances_one_step(self):
+        cases = [
+            ('daily', None, self.start + timedelta(days=1)),
+            ('weekly', None, self.start + timedelta(weeks=1)),
+            ('custom', timedelta(hours=6), self.start + timedelta(hours=6)),
+            ('monthly', None, datetime(2024, 2, 29, 9, 0, tzinfo=dt_timezone.utc)),
+        ]
+        for frequency, interval, expected in cases:
+            with self.subTest(frequency=frequency):
+                self.assertEqual(scheduler.next_occurrence(self.schedule(frequency, interval), self.start),
+                                 (expected, 0))
+
+    def test_missed_runs_are_coalesced(self):
+        now = self.start + timedelta(days=3, hours=1)
+        self.assertEqual(scheduler.next_occurrence(self.schedule('daily'), now),
+                         (self.start + timedelta(days=4), 3))
+
+    def test_next_run_is_always_in_the_future(self):
+        now = self.start + timedelta(days=2)
+        next_run, missed = scheduler.next_occurrence(self.schedule('daily'), now)
+        self.assertEqual((next_run, missed), (self.start + timedelta(days=3), 2))
+        self.assertGreater(next_run, now)
+
+    def test_monthly_keeps_the_day_when_possible(self):
+        now = datetime(2024, 5, 1, tzinfo=dt_timezone.utc)
+        next_run, missed = scheduler.next_occurrence(self.schedule('monthly'), now)
+        self.assertEqual((next_run, missed), (datetime(2024, 5, 31, 9, 0, tzinfo=dt_timezone.utc), 3))
+
+    def test_invalid_interval(self):
+        for interval in (None, timedelta(0), timedelta(seconds=-1)):
+            with self.subTest(interval=interval):
+                self.assertEqual(scheduler.next_occurrence(self.schedule('custom', interval), self.start),
+                                 (None, 0))
+
+    def test_add_months_clamps_to_month_end(self):
+        self.assertEqual(scheduler.add_months(self.start, 1).date(), datetime(2024, 2, 29).date())
+        self.assertEqual(scheduler.add_months(self.start, 13).date(), datetime(2025, 2, 28).date())
+
+
+class SchedulerTests(TestCase):
+    """Reserva dos agendamentos vencidos, limite do plano e consumo de créditos"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('agendador')
+        Profile.objects.create(user=cls.user)
+        ledger.record(cls.user, 10, 'bonus', 'Créditos iniciais')
+
+    def setUp(self):
+        self.now = timezone.now()
+
+    def create_schedule(self, user=None, frequency='daily', overdue=timedelta(minutes=1), **kwargs):
+        task = Task.objects.create(title='Relatório', description='Descrição', created_by=user or self.user)
+        return ScheduledTask.objects.create(task=task, frequency=frequency, next_run=self.now - overdue, **kwargs)
+
+    def test_claim_advances_due_schedules(self):
+        due = self.create_schedule(overdue=timedelta(days=2, minutes=1))
+        later = self.create_schedule(overdue=-timedelta(hours=1))
+        claimed, runnable = scheduler.claim(10, now=self.now)
+        self.assertEqual((claimed, runnable), (1, [due]))
+        self.assertEqual(runnable[0].missed, 2)
+        due.refresh_from_db()
+        self.assertGreater(due.next_run, self.now)
+        self.assertEqual((due.claimed_by, due.claimed_until), ('', None))
+        later.refresh_from_db()
+        self.assertEqual(later.next_run, self.now + timedelta(hours=1))
+
+    def test_schedule_runs_once_per_occurrence(self):
+        self.create_schedule()
+        self.assertEqual(scheduler.claim(10, now=self.now)[0], 1)
+        self.assertEqual(scheduler.claim(10, now=self.now), (0, []))
+
+    def test_claimed_schedule_is_skipped_until_the_lease_expires(self):
+        schedule = self.create_schedule(claimed_by='outro', claimed_until=self.now + timedelta(seconds=60))
+        self.assertEqual(scheduler.claim(10, now=self.now), (0, []))
+        ScheduledTask.objects.filter(pk=schedule.pk).update(claimed_until=self.now - timedelta(seconds=1))
+        self.assertEqual(scheduler.claim(10, now=self.now)[1], [schedule])
+
+    def test_claim_respects_batch_size(self):
+        for _ in range(3):
+            self.create_schedule()
+        self.assertEqual(scheduler.claim(2, now=self.now)[0], 2)
+        self.assertEqual(scheduler.claim(2, now=self.now)[0], 1)
+
+    def test_invalid_schedule_is_deactivated(self):
+        schedule = self.create_schedule(frequency='custom')
+        with self.assertLogs('tasks.scheduler', 'WARNING'):
+            self.assertEqual(scheduler.claim(10, now=self.now), (1, []))
+        schedule.refresh_from_db()
+        self.assertFalse(schedule.is_active)
+
+    def test_plan_limits_active_schedules(self):
+        plan = Plan.objects.create(name='Mínimo', price=0, credits_per_month=0, max_scheduled_tasks=2)
+        Subscription.objects.create(user=self.user, plan=plan, start_date=self.now,
+                                    end_date=self.now + timedelta(days=30))
+        schedules = [self.create_schedule() for _ in range(3)]
+        claimed, runnable = scheduler.claim(10, now=self.now)
+        self.assertEqual(claimed, 3)
+        self.assertEqual(runnable, schedules[:2])
+        # O que ficou acima do limite também avança, sem acumular execuções perdidas
+        schedules[2].refresh_from_db()
+        self.assertGreater(schedules[2].next_run, self.now)
+
+    def test_default_plan_limit_without_subscription(self):
+        default = Plan._meta.get_field('max_scheduled_tasks').default
+        schedules = [self.create_schedule() for _ in range(default + 1)]
+        self.assertEqual(scheduler.allowed_schedule_ids({self.user.pk}), {s.pk for s in schedules[:default]})
+
+    def test_run_due_debits_credits(self):
+        schedule = self.create_schedule()
+        results = scheduler.run_due(SerialExecutor())
+        self.assertEqual((results['claimed'], results['completed']), (1, 1))
+        task = Task.objects.get(pk=schedule.task_id)
+        self.assertEqual((task.status, task.credits_used, task.credits_reserved), ('completed', 1, 0))
+        profile = Profile.objects.get(user=self.user)
+        self.assertEqual((profile.credit_balance, profile.credits_reserved, profile.running_tasks), (9, 0, 0))
+        self.assertTrue(CreditTransaction.objects.filter(user=self.user, transaction_type='usage', amount=1).exists())
+
+    @override_settings(SCHEDULED_TASK_CREDITS=11)
+    def test_run_is_skipped_without_credits(self):
+        schedule = self.create_schedule()
+        self.assertEqual(scheduler.run_due(SerialExecutor())['skipped'], 1)
+        self.assertEqual(Task.objects.get(pk=schedule.task_id).status, 'pending')
+        self.assertEqual(Profile.objects.get(user=self.user).credit_balance, 10)
+
+    @override_settings(SCHEDULED_TASK_CREDITS=3, SCHEDULED_TASK_HANDLER='tasks.tests.partial_handler')
+    def test_handler_usage_is_debited(self):
+        schedule = self.create_schedule()
+        scheduler.run_due(SerialExecutor())
+        self.assertEqual(Task.objects.get(pk=schedule.task_id).credits_used, 1)
+        self.assertEqual(Profile.objects.get(user=self.user).credit_balance, 9)
+
+    @override_settings(SCHEDULED_TASK_HANDLER='tasks.tests.failing_handler')
+    def test_failed_run_refunds_the_reservation(self):
+        schedule = self.create_schedule()
+        with self.assertLogs('tasks.scheduler', 'ERROR'):
+            self.assertEqual(scheduler.run_due(SerialExecutor())['failed'], 1)
+        self.assertEqual(Task.objects.get(pk=schedule.task_id).status, 'failed')
+        profile = Profile.objects.get(user=self.user)
+        self.assertEqual((profile.credit_balance, profile.credits_reserved, profile.running_tasks), (10, 0, 0))
+
+    @override_settings(SCHEDULED_TASK_CREDITS=0)
+    def test_run_without_credits_configured(self):
+        schedule = self.create_schedule()
+        self.assertEqual(scheduler.run_due(SerialExecutor())['completed'], 1)
+        task = Task.objects.get(pk=schedule.task_id)
+        self.assertEqual(task.status, 'completed')
+        self.assertIsNotNone(task.completed_at)
+        self.assertEqual(Profile.objects.get(user=self.user).credit_balance, 10)
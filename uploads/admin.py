@@ -0,0 +1,10 @@
+from django.contrib import admin
+
+from .models import UploadSession
+
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ('filename', 'user', 'size', 'received', 'created_at', 'completed_at')
+    raw_id_fields = ('user',)
+    readonly_fields = ('sha256',)
@@ -0,0 +1,36 @@
+"""Upload handler que grava em disco e calcula o SHA-256 durante a leitura"""
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.files.uploadhandler import SkipFile, TemporaryFileUploadHandler
+
+logger = logging.getLogger(__name__)
+
+
+class HashingFileUploadHandler(TemporaryFileUploadHandler):
+    """Grava cada arquivo em um temporário (nunca em memória), calcula o hash
+    a cada chunk e descarta arquivos maiores que UPLOAD_MAX_SIZE.
+
+    O arquivo resultante ganha o atributo sha256, usado pelo
+    ContentAddressedStorage para não ler o arquivo de novo.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hasher = hashlib.sha256()
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.UPLOAD_MAX_SIZE:
+            logger.warning('Upload de %s descartado: maior que %d bytes', self.file_name, settings.UPLOAD_MAX_SIZE)
+            self.file.close()
+            raise SkipFile
+        self.hasher.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.sha256 = self.hasher.hexdigest()
+        return file
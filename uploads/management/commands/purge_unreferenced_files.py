@@ -0,0 +1,17 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from uploads import storage
+
+class Command(BaseCommand):
+    help = 'Delete content-addressed files that no record references anymore'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24,
+                            help='Only delete files unused for more than this many hours')
+
+    def handle(self, *args, **options):
+        purged = storage.purge_unreferenced(timezone.now() - timedelta(hours=options['hours']))
+        self.stdout.write(self.style.SUCCESS(f'{purged} unreferenced files deleted'))
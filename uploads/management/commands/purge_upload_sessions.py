@@ -0,0 +1,17 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from uploads import sessions
+
+class Command(BaseCommand):
+    help = 'Delete upload sessions (and their partial files) with no recent activity'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24,
+                            help='Delete sessions idle for more than this many hours')
+
+    def handle(self, *args, **options):
+        purged = sessions.purge(timezone.now() - timedelta(hours=options['hours']))
+        self.stdout.write(self.style.SUCCESS(f'{purged} upload sessions purged'))
@@ -0,0 +1,32 @@
+import os
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import models
+
+
+class UploadSession(models.Model):
+    """Upload em partes, retomável a partir de `received` (ver uploads.sessions)"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    received = models.BigIntegerField(default=0)
+    # Até quando uma requisição tem o offset `received` reservado (ver uploads.sessions)
+    claimed_until = models.DateTimeField(null=True, blank=True, editable=False)
+    sha256 = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def path(self):
+        return os.path.join(settings.UPLOAD_SESSION_DIR, f'{self.id}.part')
+
+    @property
+    def is_complete(self):
+        return self.completed_at is not None
+
+    def __str__(self):
+        return f'{self.filename} ({self.received}/{self.size})'
@@ -0,0 +1,159 @@
+"""Uploads em partes (chunked) e retomáveis.
+
+O cliente abre uma sessão com o nome e o tamanho do arquivo (start), envia as
+partes em ordem informando o offset de cada uma (append) e, se a conexão cair,
+consulta `received` para continuar de onde parou. Cada parte é copiada do corpo
+da requisição para o arquivo .part em blocos de BLOCK_SIZE, então o uso de
+memória não depende do tamanho do arquivo.
+
+Antes de gravar, a parte reserva o offset com um UPDATE condicional
+(received=offset, claimed_until vencido): um reenvio simultâneo da mesma parte
+recebe 409 em vez de escrever no .part ao mesmo tempo. A reserva de uma
+requisição que caiu no meio expira depois de LEASE segundos.
+
+Ao receber o último byte o SHA-256 do arquivo é calculado lendo o .part em
+blocos; completed_file() entrega o arquivo pronto para um FileField que use o
+ContentAddressedStorage, que o move para o lugar definitivo sem copiá-lo.
+"""
+import hashlib
+import mimetypes
+import os
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import UploadSession
+
+BLOCK_SIZE = 64 * 1024
+
+# Segundos que uma requisição tem para gravar a parte que reservou
+LEASE = 300
+
+
+class UploadError(Exception):
+    pass
+
+
+class OffsetMismatch(UploadError):
+    def __init__(self, offset):
+        super().__init__(f'O upload continua a partir do byte {offset}.')
+        self.offset = offset
+
+
+class ChunkInProgress(OffsetMismatch):
+    def __init__(self, offset):
+        UploadError.__init__(self, f'O byte {offset} já está sendo enviado por outra requisição.')
+        self.offset = offset
+
+
+def start(user, filename, size):
+    if not 0 < size <= settings.UPLOAD_MAX_SIZE:
+        raise UploadError(f'O arquivo deve ter entre 1 e {settings.UPLOAD_MAX_SIZE} bytes.')
+    session = UploadSession.objects.create(user=user, filename=os.path.basename(filename)[:255], size=size)
+    os.makedirs(settings.UPLOAD_SESSION_DIR, exist_ok=True)
+    open(session.path, 'wb').close()
+    return session
+
+
+def append(session, stream, offset, length):
+    """Grava `length` bytes de `stream` a partir de `offset`; retorna a sessão atualizada"""
+    if session.is_complete:
+        raise UploadError('O upload já foi concluído.')
+    if offset != session.received:
+        raise OffsetMismatch(session.received)
+    if length <= 0 or offset + length > session.size:
+        raise UploadError('A parte ultrapassa o tamanho declarado do arquivo.')
+
+    now = timezone.now()
+    claimed_until = now + timedelta(seconds=LEASE)
+    claimed = UploadSession.objects.filter(pk=session.pk, received=offset, completed_at__isnull=True).filter(
+        Q(claimed_until__isnull=True) | Q(claimed_until__lt=now)).update(claimed_until=claimed_until)
+    if not claimed:
+        session.refresh_from_db()
+        if session.received == offset and not session.is_complete:
+            raise ChunkInProgress(offset)
+        raise OffsetMismatch(session.received)
+
+    claim = UploadSession.objects.filter(pk=session.pk, received=offset, claimed_until=claimed_until)
+    written = 0
+    try:
+        with open(session.path, 'r+b') as part:
+            # Uma tentativa anterior interrompida pode ter deixado bytes além de `received`
+            part.seek(offset)
+            while written < length:
+                block = stream.read(min(BLOCK_SIZE, length - written))
+                if not block:
+                    break
+                part.write(block)
+                written += len(block)
+            part.truncate()
+    finally:
+        if written != length:
+            claim.update(claimed_until=None)
+    if written != length:
+        raise UploadError('A parte chegou incompleta.')
+
+    # Se a reserva expirou e outra requisição assumiu o offset, esta não avança
+    if not claim.update(received=offset + written, claimed_until=None, updated_at=timezone.now()):
+        session.refresh_from_db()
+        raise OffsetMismatch(session.received)
+    session.received = offset + written
+    if session.received == session.size:
+        finish(session)
+    return session
+
+
+def finish(session):
+    hasher = hashlib.sha256()
+    with open(session.path, 'rb') as part:
+        for block in iter(lambda: part.read(1024 * 1024), b''):
+            hasher.update(block)
+    session.sha256 = hasher.hexdigest()
+    session.completed_at = timezone.now()
+    session.save(update_fields=['sha256', 'completed_at', 'updated_at'])
+
+
+class SessionFile(File):
+    """Arquivo de uma sessão concluída, aceito por FileField/ImageField como um upload comum"""
+
+    def __init__(self, session):
+        super().__init__(open(session.path, 'rb'), name=session.filename)
+        self.session = session
+        self.sha256 = session.sha256
+        self.content_type = mimetypes.guess_type(session.filename)[0] or 'application/octet-stream'
+
+    def temporary_file_path(self):
+        return self.session.path
+
+
+def completed_file(user, upload_id):
+    """Arquivo de uma sessão concluída do usuário, ou None"""
+    try:
+        upload_id = uuid.UUID(str(upload_id))
+    except ValueError:
+        return None
+    session = UploadSession.objects.filter(pk=upload_id, user=user, completed_at__isnull=False).first()
+    if session is None or not os.path.exists(session.path):
+        return None
+    return SessionFile(session)
+
+
+def discard(session):
+    """Remove a sessão e o .part (se ainda não foi movido para o armazenamento)"""
+    try:
+        os.remove(session.path)
+    except FileNotFoundError:
+        pass
+    session.delete()
+
+
+def purge(older_than):
+    """Remove sessões sem atividade desde older_than; retorna quantas"""
+    stale = list(UploadSession.objects.filter(updated_at__lt=older_than))
+    for session in stale:
+        discard(session)
+    return len(stale)
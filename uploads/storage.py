@@ -0,0 +1,113 @@
+"""Armazenamento endereçado por conteúdo em MEDIA_ROOT.
+
+O nome final de cada arquivo é <pasta do upload_to>/<aa>/<sha256><extensão>:
+arquivos idênticos enviados várias vezes ocupam o disco uma única vez. Como um
+mesmo arquivo pode ser referenciado por vários registros, delete() não remove
+nada do disco: arquivos que nenhum registro referencia mais são apagados depois
+pelo comando purge_unreferenced_files (purge_unreferenced). Um arquivo
+reaproveitado tem o mtime renovado, e só arquivos sem uso há algum tempo são
+apagados, para não remover um upload cujo registro ainda não foi gravado.
+"""
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.apps import apps
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db.models import FileField
+from django.utils.deconstruct import deconstructible
+
+BLOCK_SIZE = 1024 * 1024
+
+
+def file_digest(content):
+    """SHA-256 do arquivo, reaproveitando o calculado no upload quando existir"""
+    digest = getattr(content, 'sha256', None)
+    if digest:
+        return digest
+    hasher = hashlib.sha256()
+    for chunk in content.chunks(BLOCK_SIZE):
+        hasher.update(chunk)
+    content.seek(0)
+    return hasher.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+
+    def get_available_name(self, name, max_length=None):
+        # O mesmo nome implica o mesmo conteúdo; nunca acrescentar sufixos
+        return name
+
+    def _save(self, name, content):
+        digest = file_digest(content)
+        directory, filename = posixpath.split(name)
+        extension = posixpath.splitext(filename)[1].lower()
+        name = posixpath.join(directory, digest[:2], digest + extension)
+        if self.exists(name):
+            # Marca o uso mais recente (ver purge_unreferenced)
+            os.utime(self.path(name))
+            return name
+
+        full_path = self.path(name)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        if hasattr(content, 'temporary_file_path'):
+            # Já está em disco: apenas mover
+            file_move_safe(content.temporary_file_path(), full_path, allow_overwrite=True)
+        else:
+            # Gravar em um temporário e renomear, para que um leitor nunca veja o arquivo pela metade
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(full_path))
+            with os.fdopen(fd, 'wb') as destination:
+                for chunk in content.chunks(BLOCK_SIZE):
+                    destination.write(chunk)
+            os.replace(tmp_path, full_path)
+        if self.file_permissions_mode is not None:
+            os.chmod(full_path, self.file_permissions_mode)
+        return name
+
+    def delete(self, name):
+        # Outros registros podem apontar para o mesmo arquivo; ver purge_unreferenced
+        pass
+
+
+content_storage = ContentAddressedStorage()
+
+
+def get_content_storage():
+    return content_storage
+
+
+def file_fields():
+    """(modelo, campo) de cada FileField gravado no armazenamento endereçado por conteúdo"""
+    for model in apps.get_models():
+        for field in model._meta.concrete_fields:
+            if isinstance(field, FileField) and isinstance(field.storage, ContentAddressedStorage):
+                yield model, field
+
+
+def purge_unreferenced(older_than):
+    """Apaga os arquivos sem registro que os referencie e sem uso desde older_than; retorna quantos"""
+    referenced = {}
+    for model, field in file_fields():
+        if callable(field.upload_to):
+            continue
+        directory = posixpath.dirname(field.upload_to.rstrip('/') + '/')
+        names = model._default_manager.filter(**{f'{field.attname}__startswith': directory + '/'})
+        referenced.setdefault((field.storage, directory), set()).update(
+            names.values_list(field.attname, flat=True))
+
+    cutoff = older_than.timestamp()
+    purged = 0
+    for (storage, directory), names in referenced.items():
+        if not storage.exists(directory):
+            continue
+        for prefix in storage.listdir(directory)[0]:
+            for filename in storage.listdir(posixpath.join(directory, prefix))[1]:
+                name = posixpath.join(directory, prefix, filename)
+                if name in names or os.path.getmtime(storage.path(name)) >= cutoff:
+                    continue
+                FileSystemStorage.delete(storage, name)
+                purged += 1
+    return purged
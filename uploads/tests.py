@@ -0,0 +1,222 @@
+import hashlib
+import os
+import tempfile
+import time
+from datetime import timedelta
+from io import BytesIO, StringIO
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from tasks.models import Task, TaskFile
+from . import sessions
+from .models import UploadSession
+from .storage import content_storage, purge_unreferenced
+
+
+class TemporaryDirectoriesMixin:
+    """MEDIA_ROOT e UPLOAD_SESSION_DIR em diretórios temporários"""
+
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name, UPLOAD_SESSION_DIR=os.path.join(media.name, 'sessions'))
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+
+class UploadSessionTests(TemporaryDirectoriesMixin, TestCase):
+    """Uploads em partes: ordem dos offsets, reserva da parte e conclusão"""
+
+    data = bytes(range(256)) * 1000
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('uploader', password='senha')
+
+    def upload(self, data=None, chunk=100000):
+        data = self.data if data is None else data
+        session = sessions.start(self.user, 'relatorio.pdf', len(data))
+        for offset in range(0, len(data), chunk):
+            piece = data[offset:offset + chunk]
+            sessions.append(session, BytesIO(piece), offset, len(piece))
+        return session
+
+    def test_start_validates_size(self):
+        for size in (0, -1, 50 * 1024 * 1024 + 1):
+            with self.subTest(size=size), self.assertRaises(sessions.UploadError):
+                sessions.start(self.user, 'arquivo.bin', size)
+        session = sessions.start(self.user, '../../etc/passwd', 10)
+        self.assertEqual(session.filename, 'passwd')
+        self.assertEqual(os.path.getsize(session.path), 0)
+
+    def test_chunks_are_appended_in_order(self):
+        session = self.upload()
+        session.refresh_from_db()
+        self.assertEqual(session.received, len(self.data))
+        self.assertTrue(session.is_complete)
+        self.assertEqual(session.sha256, hashlib.sha256(self.data).hexdigest())
+        self.assertIsNone(session.claimed_until)
+        with open(session.path, 'rb') as part:
+            self.assertEqual(part.read(), self.data)
+
+    def test_offset_mismatch_reports_the_resume_offset(self):
+        session = sessions.start(self.user, 'arquivo.bin', 10)
+        sessions.append(session, BytesIO(b'12345'), 0, 5)
+        for offset in (0, 3, 7):
+            with self.subTest(offset=offset), self.assertRaises(sessions.OffsetMismatch) as raised:
+                sessions.append(session, BytesIO(b'abc'), offset, 3)
+            self.assertEqual(raised.exception.offset, 5)
+
+    def test_stale_session_object_is_rejected(self):
+        session = sessions.start(self.user, 'arquivo.bin', 10)
+        stale = UploadSession.objects.get(pk=session.pk)
+        sessions.append(session, BytesIO(b'12345'), 0, 5)
+        with self.assertRaises(sessions.OffsetMismatch) as raised:
+            sessions.append(stale, BytesIO(b'abcde'), 0, 5)
+        self.assertEqual(raised.exception.offset, 5)
+        with open(session.path, 'rb') as part:
+            self.assertEqual(part.read(), b'12345')
+
+    def test_chunk_beyond_declared_size(self):
+        session = sessions.start(self.user, 'arquivo.bin', 4)
+        for length in (0, 5):
+            with self.subTest(length=length), self.assertRaises(sessions.UploadError):
+                sessions.append(session, BytesIO(b'12345'), 0, length)
+
+    def test_incomplete_chunk_releases_the_claim(self):
+        session = sessions.start(self.user, 'arquivo.bin', 10)
+        with self.assertRaises(sessions.UploadError):
+            sessions.append(session, BytesIO(b'123'), 0, 10)
+        session.refresh_from_db()
+        self.assertEqual((session.received, session.claimed_until), (0, None))
+        sessions.append(session, BytesIO(b'0123456789'), 0, 10)
+        with open(session.path, 'rb') as part:
+            self.assertEqual(part.read(), b'0123456789')
+
+    def test_claimed_offset_is_not_written_twice(self):
+        session = sessions.start(self.user, 'arquivo.bin', 10)
+        UploadSession.objects.filter(pk=session.pk).update(
+            claimed_until=timezone.now() + timedelta(seconds=sessions.LEASE))
+        with self.assertRaises(sessions.ChunkInProgress) as raised:
+            sessions.append(session, BytesIO(b'0123456789'), 0, 10)
+        self.assertEqual(raised.exception.offset, 0)
+        self.assertEqual(os.path.getsize(session.path), 0)
+
+        # Reserva abandonada: vale de novo depois de LEASE
+        UploadSession.objects.filter(pk=session.pk).update(claimed_until=timezone.now() - timedelta(seconds=1))
+        sessions.append(session, BytesIO(b'0123456789'), 0, 10)
+        self.assertTrue(session.is_complete)
+
+    def test_completed_upload_rejects_more_data(self):
+        session = self.upload(b'abc')
+        with self.assertRaises(sessions.UploadError):
+            sessions.append(session, BytesIO(b'd'), 3, 1)
+
+    def test_completed_file_is_deduplicated_by_hash(self):
+        task = Task.objects.create(title='Tarefa', description='Descrição', created_by=self.user)
+        names = []
+        uploads = [self.upload(), self.upload()]
+        for session in uploads:
+            file = sessions.completed_file(self.user, session.pk)
+            self.assertEqual(file.sha256, hashlib.sha256(self.data).hexdigest())
+            with file:
+                names.append(TaskFile.objects.create(task=task, file=file).file.name)
+        # O primeiro .part foi movido, não copiado; o repetido fica para purge_upload_sessions
+        self.assertFalse(os.path.exists(uploads[0].path))
+        digest = hashlib.sha256(self.data).hexdigest()
+        self.assertEqual(names, [f'task_files/{digest[:2]}/{digest}.pdf'] * 2)
+        with content_storage.open(names[0]) as stored:
+            self.assertEqual(stored.read(), self.data)
+
+    def test_completed_file_requires_a_finished_session_of_the_user(self):
+        other = User.objects.create_user('outro')
+        session = sessions.start(self.user, 'arquivo.bin', 10)
+        self.assertIsNone(sessions.completed_file(self.user, session.pk))
+        sessions.append(session, BytesIO(b'0123456789'), 0, 10)
+        self.assertIsNone(sessions.completed_file(other, session.pk))
+        self.assertIsNone(sessions.completed_file(self.user, 'inválido'))
+        with sessions.completed_file(self.user, session.pk) as file:
+            self.assertEqual(file.content_type, 'application/octet-stream')
+
+    def test_purge_removes_idle_sessions(self):
+        idle = sessions.start(self.user, 'parado.bin', 10)
+        active = sessions.start(self.user, 'ativo.bin', 10)
+        UploadSession.objects.filter(pk=idle.pk).update(updated_at=timezone.now() - timedelta(days=2))
+        call_command('purge_upload_sessions', stdout=StringIO())
+        self.assertEqual(list(UploadSession.objects.all()), [active])
+        self.assertFalse(os.path.exists(idle.path))
+        self.assertTrue(os.path.exists(active.path))
+
+    def test_views(self):
+        self.client.login(username='uploader', password='senha')
+        response = self.client.post(reverse('uploads:start_upload'), {'filename': 'dados.csv', 'size': 6})
+        self.assertEqual(response.status_code, 201)
+        url = response.json()['url']
+
+        response = self.client.generic('PATCH', url, b'abc', HTTP_UPLOAD_OFFSET='0')
+        self.assertEqual(response.json()['offset'], 3)
+        response = self.client.generic('PATCH', url, b'abc', HTTP_UPLOAD_OFFSET='0')
+        self.assertEqual((response.status_code, response.json()['offset']), (409, 3))
+        response = self.client.generic('PATCH', url, b'def', HTTP_UPLOAD_OFFSET='x')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.generic('PATCH', url, b'def', HTTP_UPLOAD_OFFSET='3')
+        self.assertEqual(response.json()['sha256'], hashlib.sha256(b'abcdef').hexdigest())
+        self.assertTrue(self.client.get(url).json()['complete'])
+
+
+class ContentStorageTests(TemporaryDirectoriesMixin, TestCase):
+    """Armazenamento endereçado por conteúdo e limpeza dos arquivos sem referência"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('dono')
+        cls.task = Task.objects.create(title='Tarefa', description='Descrição', created_by=cls.user)
+
+    def age(self, name, hours=48):
+        past = time.time() - hours * 3600
+        os.utime(content_storage.path(name), (past, past))
+
+    def test_identical_content_is_stored_once(self):
+        first = content_storage.save('task_files/a.TXT', ContentFile(b'mesmo'))
+        second = content_storage.save('task_files/b.txt', ContentFile(b'mesmo'))
+        digest = hashlib.sha256(b'mesmo').hexdigest()
+        self.assertEqual(first, f'task_files/{digest[:2]}/{digest}.txt')
+        self.assertEqual(second, first)
+
+    def test_delete_keeps_shared_files(self):
+        one = TaskFile.objects.create(task=self.task, file=ContentFile(b'conteudo', name='a.txt'))
+        TaskFile.objects.create(task=self.task, file=ContentFile(b'conteudo', name='b.txt'))
+        one.file.delete()
+        self.assertTrue(content_storage.exists(TaskFile.objects.get(pk__gt=one.pk).file.name))
+
+    def test_purge_unreferenced(self):
+        kept = TaskFile.objects.create(task=self.task, file=ContentFile(b'usado', name='a.txt')).file.name
+        orphan = content_storage.save('task_files/b.txt', ContentFile(b'sem registro'))
+        recent = content_storage.save('task_files/c.txt', ContentFile(b'acabou de chegar'))
+        for name in (kept, orphan):
+            self.age(name)
+
+        self.assertEqual(purge_unreferenced(timezone.now() - timedelta(hours=24)), 1)
+        self.assertTrue(content_storage.exists(kept))
+        self.assertFalse(content_storage.exists(orphan))
+        self.assertTrue(content_storage.exists(recent))
+
+    def test_reuse_renews_the_grace_period(self):
+        name = content_storage.save('task_files/a.txt', ContentFile(b'reenviado'))
+        self.age(name)
+        content_storage.save('task_files/b.txt', ContentFile(b'reenviado'))
+        self.assertEqual(purge_unreferenced(timezone.now() - timedelta(hours=24)), 0)
+
+    def test_command(self):
+        name = content_storage.save('business_photos/a.jpg', ContentFile(b'foto removida'))
+        self.age(name)
+        out = StringIO()
+        call_command('purge_unreferenced_files', stdout=out)
+        self.assertIn('1 unreferenced files deleted', out.getvalue())
+        self.assertFalse(content_storage.exists(name))
@@ -0,0 +1,60 @@
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views.decorators.http import require_http_methods, require_POST
+
+from . import sessions
+from .models import UploadSession
+
+
+def _session_data(session):
+    return {
+        'id': str(session.id),
+        'url': reverse('uploads:upload_chunk', args=[session.id]),
+        'size': session.size,
+        'offset': session.received,
+        'complete': session.is_complete,
+        'sha256': session.sha256 or None,
+    }
+
+
+@login_required
+@require_POST
+def start_upload(request):
+    """Abre uma sessão de upload; espera `filename` e `size` (bytes)"""
+    try:
+        size = int(request.POST.get('size', ''))
+    except ValueError:
+        return JsonResponse({'error': 'Tamanho inválido.'}, status=400)
+    filename = request.POST.get('filename', '').strip()
+    if not filename:
+        return JsonResponse({'error': 'Informe o nome do arquivo.'}, status=400)
+    try:
+        session = sessions.start(request.user, filename, size)
+    except sessions.UploadError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(_session_data(session), status=201)
+
+
+@login_required
+@require_http_methods(['GET', 'PATCH'])
+def upload_chunk(request, upload_id):
+    """GET informa o offset para retomar; PATCH grava o corpo a partir do cabeçalho Upload-Offset"""
+    session = get_object_or_404(UploadSession, id=upload_id, user=request.user)
+    if request.method == 'GET':
+        return JsonResponse(_session_data(session))
+
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        return JsonResponse({'error': 'Cabeçalho Upload-Offset inválido.'}, status=400)
+    try:
+        # O corpo é lido direto do stream da requisição, sem passar por request.body
+        sessions.append(session, request, offset, length)
+    except sessions.OffsetMismatch as e:
+        return JsonResponse({'error': str(e), 'offset': e.offset}, status=409)
+    except sessions.UploadError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(_session_data(session))